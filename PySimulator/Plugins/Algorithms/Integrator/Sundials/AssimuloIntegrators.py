@@ -30,6 +30,32 @@ try:
 except:
     raise ImportError('No module named sundials')
 
+_sparseLinearSolver = None  # Result of hasSparseLinearSolver; None means not yet checked
+
+
+def hasSparseLinearSolver():
+    ''' Returns True, if Assimulo is built with SuperLU, so that CVode can solve
+        the Newton iteration with a sparse Jacobian (linear_solver = 'SPARSE').
+        This is checked once by simulating a small problem.
+    '''
+    global _sparseLinearSolver
+    if _sparseLinearSolver is None:
+        try:
+            import scipy.sparse
+            problem = Explicit_Problem(lambda t, y: -y, np.ones(1))
+            problem.jac = lambda t, y: scipy.sparse.csc_matrix(-np.ones((1, 1)))
+            problem.jac_nnz = 1
+            simulation = CVode(problem)
+            simulation.iter = 'Newton'
+            simulation.usejac = True
+            simulation.linear_solver = 'SPARSE'
+            simulation.verbosity = 50
+            simulation.simulate(0.1)
+            _sparseLinearSolver = True
+        except Exception:
+            _sparseLinearSolver = False
+    return _sparseLinearSolver
+
 
 class AssimuloRK34():
     '''Function for using the RK34 solver of Assimulo.
@@ -118,6 +144,8 @@ class AssimuloCVode():
         self.atol = 1e-6  # Default 1e-6. The absulute tolerance
         self.rtol = 1e-6  # Default 1e-6. The relative tolerance
         self.verbosity = 50  # QUIET = 50 WHISPER = 40 NORMAL = 30 LOUD = 20 SCREAM = 10
+        self.jac = None  # Default None: Jacobian jac(t, y) of rhs for the Newton iteration; None means finite differences of CVode
+        self.jacNnz = None  # Default None: Number of nonzero elements, if jac returns a scipy.sparse.csc_matrix; dense, if not hasSparseLinearSolver()
 
         self.t0 = 0
         self.y0 = None
@@ -152,6 +180,15 @@ class AssimuloCVode():
         problem.handle_event = self.handle_event
         problem.time_events = self.time_events
         problem.finalize = self.finalize
+        sparse = self.jac is not None and self.jacNnz is not None and hasSparseLinearSolver()
+        if self.jac is not None:
+            if self.jacNnz is not None and not sparse:
+                # No SuperLU: the dense linear solver needs a dense Jacobian
+                problem.jac = lambda t, y, sw=None: (self.jac(t, y) if sw is None else self.jac(t, y, sw)).toarray()
+            else:
+                problem.jac = self.jac
+            if sparse:
+                problem.jac_nnz = self.jacNnz
 
         simulation = CVode(problem)
 
@@ -167,6 +204,10 @@ class AssimuloCVode():
             simulation.iter = 'FixedPoint'
         else:
             simulation.iter = 'Newton'
+            if self.jac is not None:
+                simulation.usejac = True
+                if sparse:
+                    simulation.linear_solver = 'SPARSE'
 
         # Sets additional parameters
         simulation.atol = self.atol
@@ -210,6 +251,7 @@ class AssimuloIda():
         self.tout1 = 0.001  # Default 0.001. The value used in the internal Sundials function for determine init. cond.
         # self.suppress_alg = False   #Default False. Indicates that the error-tests are suppressed on algebraic variables
         self.lsoff = False  # Default False. Value to turn OFF Sundials LineSearch when calculating initial conditions.
+        self.jac = None  # Default None: Jacobian jac(c, t, y, yd) = d(rhs)/dy + c*d(rhs)/dyd; None means finite differences of IDA
 
         self.t0 = 0
         self.y0 = None
@@ -245,8 +287,12 @@ class AssimuloIda():
         problem.handle_event = self.handle_event
         problem.time_events = self.time_events
         problem.finalize = self.finalize
+        if self.jac is not None:
+            problem.jac = self.jac
         # Create IDA object and set additional parameters
         simulation = IDA(problem)
+        if self.jac is not None:
+            simulation.usejac = True
         simulation.atol = self.atol
         simulation.rtol = self.rtol
         simulation.verbosity = self.verbosity
@@ -0,0 +1,169 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Jacobians of sparse functions by column compression: the columns of the Jacobian are
+colored such that columns of the same color have no nonzero element in the same row.
+All columns of one color are computed by one perturbation of the arguments (finite
+differences) or by one directional derivative, so that the number of function evaluations
+is the number of colors, which is at least the maximum number of nonzero elements of a row,
+instead of the number of columns.
+'''
+
+import numpy
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+
+def colorColumns(rows, columns, nColumns):
+    ''' Greedy coloring of the columns of a matrix with the nonzero elements (rows[k], columns[k]):
+        Columns of the same color have no nonzero element in the same row.
+        The columns are colored in the order of decreasing number of nonzero elements.
+        Returns the tuple (color, nColors), where color[j] is the color of column j.
+    '''
+    columnRows = [[] for j in xrange(nColumns)]
+    rowColumns = dict()
+    for i, j in zip(rows, columns):
+        columnRows[j].append(i)
+        rowColumns.setdefault(i, []).append(j)
+    color = [-1] * nColumns
+    nColors = 0
+    for j in sorted(xrange(nColumns), key=lambda j: -len(columnRows[j])):
+        forbidden = set()
+        for i in columnRows[j]:
+            for k in rowColumns[i]:
+                forbidden.add(color[k])
+        c = 0
+        while c in forbidden:
+            c += 1
+        color[j] = c
+        nColors = max(nColors, c + 1)
+    return numpy.array(color, dtype=numpy.int), nColors
+
+
+def probeSparsity(f, x, fx=None, scale=None, perturbation=1e-3):
+    ''' Returns the tuple (rows, columns) of the index arrays of the nonzero elements of df/dx,
+        found by changing one element of x after the other by perturbation * max(abs(x[j]), scale[j]).
+        This needs len(x) evaluations of f. Elements that vanish at x for another reason
+        than the structure of f (e.g. a branch of an if-clause) are not found.
+        @param f: function of a numpy array x returning a numpy array
+        @param fx: f(x), if it is already known
+        @param scale: typical magnitude of the elements of x (default: 1)
+    '''
+    x = numpy.array(x, dtype=numpy.float)
+    if fx is None:
+        fx = f(x)
+    fx = numpy.array(fx, dtype=numpy.float)
+    if scale is None:
+        scale = numpy.ones(len(x))
+    rows = []
+    columns = []
+    for j in xrange(len(x)):
+        x1 = x.copy()
+        x1[j] += perturbation * max(abs(x[j]), scale[j])
+        changed = numpy.nonzero(f(x1) != fx)[0]
+        rows.append(changed)
+        columns.append(numpy.repeat(j, len(changed)))
+    if len(x) == 0:
+        return numpy.zeros(0, dtype=numpy.int), numpy.zeros(0, dtype=numpy.int)
+    return numpy.concatenate(rows), numpy.concatenate(columns)
+
+
+class ColoredJacobian:
+    ''' Jacobian J = df/dx of a function f of a vector x with nColumns elements
+        returning a vector with nRows elements. The nonzero elements of J are (rows[k], columns[k]);
+        if rows and columns are None, J is dense and every column has its own color.
+
+        The values of the nonzero elements are returned by finiteDifferences or by expand
+        in the order of self.rows, self.columns (sorted by columns) and are converted
+        by toDense into a numpy array and by toSparse into a scipy.sparse.csc_matrix.
+    '''
+    def __init__(self, nRows, nColumns, rows=None, columns=None):
+        self.nRows = nRows
+        self.nColumns = nColumns
+        if rows is None:
+            keys = numpy.arange(nRows * nColumns)
+        else:
+            keys = numpy.asarray(columns, dtype=numpy.int) * nRows + numpy.asarray(rows, dtype=numpy.int)
+        # Sort the nonzero elements by columns for the compressed column format
+        (self.columns, self.rows) = numpy.divmod(numpy.unique(keys), nRows)
+        self.nnz = len(self.rows)
+        if rows is None:
+            (self.color, self.nColors) = (numpy.arange(nColumns), nColumns)
+        else:
+            (self.color, self.nColors) = colorColumns(self.rows, self.columns, nColumns)
+        # seeds[c][j] = 1 for the columns j of color c, else 0
+        self.seeds = [(self.color == c).astype(numpy.float) for c in xrange(self.nColors)]
+        self._elementColor = self.color[self.columns]
+        self._indptr = numpy.searchsorted(self.columns, numpy.arange(nColumns + 1))
+
+    def expand(self, compressed):
+        ''' Returns the values of the nonzero elements of J from the compressed Jacobian,
+            i.e. the nRows x nColors array with the columns J * seeds[c]
+            (e.g. computed by directional derivatives).
+        '''
+        return compressed[self.rows, self._elementColor]
+
+    def finiteDifferences(self, f, x, fx=None, h=None, scale=None, central=False):
+        ''' Returns the values of the nonzero elements of J at x by one forward difference
+            (f(x + h*s) - f(x))/h or one central difference (f(x + h*s) - f(x - h*s))/(2*h)
+            per color with the seed s of the color.
+            @param f: function of a numpy array x returning a numpy array
+            @param fx: f(x) for forward differences, if it is already known
+            @param h: perturbations of the elements of x; default is
+                      eps**(1/2) (forward) or eps**(1/3) (central) * max(abs(x), scale)
+            @param scale: typical magnitude of the elements of x (default: 1)
+        '''
+        x = numpy.asarray(x, dtype=numpy.float)
+        if h is None:
+            if scale is None:
+                scale = 1.0
+            h = numpy.finfo(numpy.float).eps ** (1.0 / 3.0 if central else 0.5) * numpy.maximum(numpy.abs(x), scale)
+        # Use the perturbations that are exactly representable
+        h = (x + h) - x
+        compressed = numpy.empty((self.nRows, self.nColors))
+        if central:
+            for c in xrange(self.nColors):
+                compressed[:, c] = f(x + h * self.seeds[c])
+                compressed[:, c] -= f(x - h * self.seeds[c])
+            return self.expand(compressed) / (2 * h[self.columns])
+        if fx is None:
+            fx = f(x)
+        fx = numpy.array(fx, dtype=numpy.float)
+        for c in xrange(self.nColors):
+            compressed[:, c] = f(x + h * self.seeds[c])
+        return (self.expand(compressed) - fx[self.rows]) / h[self.columns]
+
+    def toDense(self, values):
+        ''' Returns J with the values of the nonzero elements as numpy array
+        '''
+        J = numpy.zeros((self.nRows, self.nColumns))
+        J[self.rows, self.columns] = values
+        return J
+
+    def toSparse(self, values):
+        ''' Returns J with the values of the nonzero elements as scipy.sparse.csc_matrix
+        '''
+        return scipy.sparse.csc_matrix((values, self.rows, self._indptr), shape=(self.nRows, self.nColumns))
@@ -25,7 +25,8 @@ along with PySimulator. If not, see www.gnu.org/licenses.
 '''
 
 import numpy
-from Plugins.Simulator.FMUSimulator import  FMUSimulator
+from Plugins.Algorithms.Jacobian.ColoredJacobian import ColoredJacobian
+from Plugins.Simulator.FMUSimulator import  FMUSimulator, FMUJacobian
 
 import scipy.io
 
@@ -90,27 +91,19 @@ class LinearizeFMU:
             V = 1
         return numpy.array(V)
     def jacobian(self, x=None, t=0.0, p=None, u_ss=None, tol=6e-6):
-        ''' Calculate the Jacobian at time t, parameter p and state x, input u_ss. Use tolerance tol for FMU and central diff. quotient'''
-        Jacobian = numpy.zeros((self.nx, self.nx))
-        E = numpy.identity(self.nx)
-        for i in range(self.nx):
-            h = tol * max((numpy.abs(x[i]), 1))
-            x1 = x + E[i, :] * h / 2
-            ''' Set values'''
-            for ii in range(self.nx):
-                self.fmu.setValue(self.stateNames[ii], x1[ii])
-            for ii in range(self.nu):
-                self.fmu.setValue(self.inputNames[ii], u_ss[ii])
-            dx1 = numpy.array(self.fmu.getDerivatives(t, x1))
-            x2 = x - E[i, :] * h / 2
-            ''' Set values'''
-            for ii in range(self.nx):
-                self.fmu.setValue(self.stateNames[ii], x2[ii])
-            for ii in range(self.nu):
-                self.fmu.setValue(self.inputNames[ii], u_ss[ii])
-            dx2 = numpy.array(self.fmu.getDerivatives(t, x2))
-            Jacobian[:, i] = (dx1 - dx2) / h
-        return Jacobian
+        ''' Calculate the Jacobian at time t, parameter p and state x, input u_ss. Use tolerance tol for FMU and central diff. quotient.
+            Columns that have no row in common (according to the ModelStructure of FMI 2.0) are computed by one central difference.'''
+        for ii in range(self.nu):
+            self.fmu.setValue(self.inputNames[ii], u_ss[ii])
+        def derivatives(x1):
+            return numpy.array(self.fmu.getDerivatives(t, x1))
+        sparsity = FMUJacobian.getStateSparsity(self.fmu.description)
+        if sparsity is None:
+            jacobian = ColoredJacobian(self.nx, self.nx)
+        else:
+            jacobian = ColoredJacobian(self.nx, self.nx, sparsity[0], sparsity[1])
+        h = tol * numpy.maximum(numpy.abs(x), 1) / 2
+        return jacobian.toDense(jacobian.finiteDifferences(derivatives, x, h=h, central=True))
 
 
     def linearize(self, x=None, t=0.0, p=None, u_ss=None, tol=6e-6):
@@ -40,7 +40,7 @@ class Results(IntegrationResults.Results):
         0.2;20.0;4.0290389058209473e-3;0.7823794579232536e-1
 
     '''
-    def __init__(self, fileName):
+    def __init__(self, fileName, progress=None):
         IntegrationResults.Results.__init__(self)
 
         self.fileName = fileName  # File name of result file
@@ -61,13 +61,13 @@ class Results(IntegrationResults.Results):
         csvfile.close()
         '''
         csvfile = open(self.fileName, 'rb')
-        dialect = csv.Sniffer().sniff(csvfile.readline())
-        csvfile.seek(0)
-        reader = csv.reader(csvfile, dialect)
+        firstLine = csvfile.readline()
+        dialect = csv.Sniffer().sniff(firstLine)
+        reader = csv.reader([firstLine], dialect)
         self._name = reader.next()  # first row contains the variable names
         self._info = len(self._name) * ['']
         self._filterName()
-        data = numpy.loadtxt(csvfile, delimiter=dialect.delimiter)
+        data = IntegrationResults.loadCsvData(csvfile, dialect.delimiter, progress=progress, nColumns=len(self._name))
 
         t = data[:, 0]
         self.timeSeries.append(IntegrationResults.TimeSeries(t, data, "linear"))
@@ -96,20 +96,29 @@ class Results(IntegrationResults.Results):
             self._name[i] = x
 
 
-    def readData(self, variableName):
-        nameIndex = self._name.index(variableName)
-        if nameIndex < 0:
+    def _buildIndex(self):
+        index = dict()
+        for i in xrange(len(self._name) - 1, -1, -1):
+            index[self._name[i]] = (0, i, 1)
+        return index
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        location = self.lookup(variableName)
+        if location is None:
             return None, None, None
-        y = self.timeSeries[0].data[:, nameIndex]
         t = self.timeSeries[0].independentVariable
+        first, last = IntegrationResults.rowRange(t, tStart, tStop)
+        y = self.timeSeries[0].data[first:last, location[1]]
+        if t is not None:
+            t = t[first:last]
         method = self.timeSeries[0].interpolationMethod
         return t, y, method
 
     def data(self, variableName):
-        nameIndex = self._name.index(variableName)
-        if nameIndex < 0:
+        location = self.lookup(variableName)
+        if location is None:
             return None
-        return self.timeSeries[0].data[:, nameIndex]
+        return self.timeSeries[0].data[:, location[1]]
 
 
     def getVariables(self):
@@ -34,19 +34,135 @@ description = 'Dymola Simulation Result File'
 
 
 def charArrayToStrList(charArray):
-    """Transform a numpy character array to a list of strings
+    """Transform a numpy character array to a list of strings (one string per row).
+       Null and non-ASCII characters are removed and trailing white space is stripped.
+       The matrix may hold characters ('S1' or 'U1', e.g. from scipy.io.loadmat)
+       or character codes (e.g. uint8). The matrix is processed with array operations;
+       only rows with null or non-ASCII characters between other characters are
+       handled one by one.
     """
-    strList = []
-    for item in charArray:
-        strList.append(str(string.rstrip(string.join([x for x in item if len(x) > 0 and ord(x) < 128], ""))))
+    charArray = numpy.asarray(charArray)
+    if charArray.ndim != 2 or charArray.dtype.kind not in 'SUui' or (charArray.dtype.kind in 'SU' and charArray.dtype.itemsize != (1 if charArray.dtype.kind == 'S' else 4)):
+        strList = []
+        for item in charArray:
+            strList.append(str(string.rstrip(string.join([x for x in item if len(x) > 0 and ord(x) < 128], ""))))
+        return strList
+    nRows, nColumns = charArray.shape
+    if nColumns == 0:
+        return [''] * nRows
+
+    # Character codes, row by row in memory (the matrices of MAT files are stored column by column)
+    if charArray.dtype.kind == 'S':
+        codes = numpy.ascontiguousarray(charArray).view(numpy.uint8)
+    elif charArray.dtype.kind == 'U':
+        codes = numpy.ascontiguousarray(charArray, dtype='U1').view(numpy.uint32)
+    else:
+        codes = numpy.ascontiguousarray(charArray)
+    invalid = (codes == 0) | (codes >= 128)
+    chars = codes.astype(numpy.uint8)
+    chars[invalid] = 0
+    # Position of the last character of each row that is not white space (-1: none)
+    isSpace = (chars == 32) | ((chars >= 9) & (chars <= 13))
+    isText = (chars != 0) & ~isSpace
+    last = nColumns - 1 - numpy.argmax(isText[:, ::-1], axis=1)
+    last[~isText.any(axis=1)] = -1
+    # Remove trailing white space; trailing nulls are removed by numpy when converting to str
+    beyond = numpy.arange(nColumns) > last[:, numpy.newaxis]
+    chars[beyond] = 0
+    strList = chars.view('S' + str(nColumns)).ravel().tolist()
+    # Rows with removed characters before the last character
+    for i in numpy.nonzero((invalid & ~beyond).any(axis=1))[0]:
+        strList[i] = strList[i].replace('\x00', '')
     return strList
 
 
+# Numeric formats of MAT v4 files (P-digit of the type flag)
+_matV4DataTypes = {0: 'f8', 1: 'f4', 2: 'i4', 3: 'i2', 4: 'u2', 5: 'u1'}
+
+
+class MatrixHeader():
+    """ Location and layout of one matrix in a MAT v4 file
+    """
+    def __init__(self, name, dtype, shape, offset, isText):
+        self.name = name  # String
+        self.dtype = dtype  # numpy.dtype of the stored elements
+        self.shape = shape  # Tuple (mrows, ncols) as stored in the file
+        self.offset = offset  # Byte position of the first element in the file
+        self.isText = isText  # True, if the matrix is a character matrix
+
+
+def readMatHeaders(fileName):
+    """ Parses the headers of all matrices of a MAT v4 file without reading
+        the numeric data. Returns an ordered dictionary with the matrix names
+        as keys and instances of MatrixHeader as values.
+    """
+    headers = collections.OrderedDict()
+    fileSize = os.path.getsize(fileName)
+    f = open(fileName, 'rb')
+    try:
+        position = 0
+        while position + 20 <= fileSize:
+            f.seek(position)
+            raw = f.read(20)
+            head = numpy.frombuffer(raw, dtype='<i4')
+            if head[0] < 0 or head[0] >= 1000:
+                head = numpy.frombuffer(raw, dtype='>i4')
+                byteOrder = '>'
+            else:
+                byteOrder = '<'
+            mopt, mrows, ncols, imagf, namlen = [int(x) for x in head]
+            if mopt < 0 or mopt > 1052 or mrows < 0 or ncols < 0 or namlen < 1:
+                raise WrongDymolaResultFile("File " + fileName + " is not a MAT v4 file")
+            P = (mopt / 10) % 10
+            T = mopt % 10
+            if P not in _matV4DataTypes or T > 1:
+                raise WrongDymolaResultFile("Unsupported matrix type " + str(mopt) + " in file " + fileName)
+            name = f.read(namlen).split('\x00', 1)[0]
+            dtype = numpy.dtype(byteOrder + _matV4DataTypes[P])
+            offset = position + 20 + namlen
+            headers[name] = MatrixHeader(name, dtype, (mrows, ncols), offset, T == 1)
+            position = offset + mrows * ncols * dtype.itemsize * (2 if imagf else 1)
+    finally:
+        f.close()
+    return headers
+
+
+def readMatrix(fileName, header):
+    """ Reads the complete matrix described by header (see readMatHeaders).
+        Character matrices are returned in the same form as
+        scipy.io.loadmat(..., matlab_compatible=True) delivers them.
+    """
+    f = open(fileName, 'rb')
+    try:
+        f.seek(header.offset)
+        data = numpy.fromfile(f, dtype=header.dtype, count=header.shape[0] * header.shape[1])
+    finally:
+        f.close()
+    data = numpy.reshape(data, header.shape, order='F')
+    if header.isText:
+        data = data.astype(numpy.uint8).view('S1')
+    return data
+
+
+def mapMatrix(fileName, header):
+    """ Returns a read-only numpy.memmap of the numeric matrix described by
+        header (see readMatHeaders). No data is read when calling this
+        function; the operating system loads the pages of the file when the
+        values are accessed and shares them between all mappings of the file.
+    """
+    return numpy.memmap(fileName, dtype=header.dtype, mode='r', offset=header.offset, shape=header.shape, order='F')
+
+
 class Results(IntegrationResults.Results):
     """ Result Object to hold a Dymola result file, see also
         class IntegrationResults.Results
     """
-    def __init__(self, fileName):
+    def __init__(self, fileName, lazy=True):
+        """ If lazy is True, only the headers and the small matrices of the
+            result file are read when opening it; data_2 is memory-mapped,
+            so its values are read from the file when they are needed.
+            Otherwise the complete file is loaded into memory.
+        """
         IntegrationResults.Results.__init__(self)
 
         # Not possible to load data from a partially written mat-file
@@ -67,7 +183,14 @@ class Results(IntegrationResults.Results):
         fullFileName = os.path.abspath(fileName)
 
         # Read data from file
-        fileData = scipy.io.loadmat(fullFileName, matlab_compatible=True)
+        if lazy:
+            headers = readMatHeaders(fullFileName)
+            fileData = dict()
+            for matrixName in ["Aclass", "name", "description", "dataInfo", "data_1"]:
+                if matrixName in headers:
+                    fileData[matrixName] = readMatrix(fullFileName, headers[matrixName])
+        else:
+            fileData = scipy.io.loadmat(fullFileName, matlab_compatible=True)
 
         # Check Aclass array
         if not("Aclass" in fileData):
@@ -87,17 +210,21 @@ class Results(IntegrationResults.Results):
             raise WrongDymolaResultFile("Matrix 'dataInfo' is not in result file " + fullFileName)
         if not("data_1" in fileData):
             raise WrongDymolaResultFile("Matrix 'data_1' is not in result file " + fullFileName)
-        if not("data_2" in fileData):
+        if not("data_2" in (headers if lazy else fileData)):
             raise WrongDymolaResultFile("Matrix 'data_2' is not in result file " + fullFileName)
 
         # Get the raw matrices
+        transpose = len(Aclass) > 3 and Aclass[3] == "binTrans"
         name = fileData["name"]
         description = fileData["description"]
         dataInfo = fileData["dataInfo"]
-        data = [ fileData["data_1"], fileData["data_2"][:, :-1] ]
+        if lazy:
+            data = [ fileData["data_1"], mapMatrix(fullFileName, headers["data_2"])[:, :-1] ]
+        else:
+            data = [ fileData["data_1"], fileData["data_2"][:, :-1] ]
 
-        # Transpose the data, if necessary
-        if len(Aclass) > 3 and Aclass[3] == "binTrans":
+        # Transpose the data, if necessary (views only, no copies of data_2)
+        if transpose:
             name = name.T
             description = description.T
             dataInfo = dataInfo.T
@@ -117,6 +244,7 @@ class Results(IntegrationResults.Results):
         unit, description = extractUnits(description)
 
         # Collect data
+        self._nameIndex = None
         self._name = name
         self._description = description
         self._unit = unit
@@ -140,22 +268,33 @@ class Results(IntegrationResults.Results):
                result = loadDymolaResult()
                i_v1   = result.index("a.b.c")   # get index of signal
         """
-        try:
-            nameIndex = self._name.index(name)
-        except ValueError:
-            return -1
-            # print("'" + name + "' is not present in the result")
-        return nameIndex
-
-    def readData(self, variableName):
-        nameIndex = self.index(variableName)
-        if nameIndex < 0:
+        if self._nameIndex is None:
+            self._nameIndex = dict()
+            for i in xrange(len(self._name) - 1, -1, -1):
+                self._nameIndex[self._name[i]] = i
+        return self._nameIndex.get(name, -1)
+
+    def _buildIndex(self):
+        dataInfo = numpy.asarray(self._dataInfo[:, :2], dtype=int)
+        seriesIndex = numpy.where(dataInfo[:, 0] == 1, 0, 1)
+        seriesIndex[:1] = 1  # Time
+        column = numpy.abs(dataInfo[:, 1]) - 1
+        sign = numpy.where(dataInfo[:, 1] >= 0, 1, -1)
+        # Inserted in reverse order, so that the first of several variables with the same name is used
+        locations = zip(seriesIndex.tolist(), column.tolist(), sign.tolist())
+        return dict(zip(reversed(self._name), reversed(locations)))
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        location = self.lookup(variableName)
+        if location is None:
             return None, None, None
 
-        seriesIndex = self._dataInfo[nameIndex, 0] - 1
-
-        y = self.data(variableName)
+        seriesIndex, column, sign = location
         t = self.timeSeries[seriesIndex].independentVariable
+        first, last = IntegrationResults.rowRange(t, tStart, tStop)
+        y = self._signalData(seriesIndex, column, sign, first, last)
+        if t is not None:
+            t = t[first:last]
         method = self.timeSeries[seriesIndex].interpolationMethod
         return t, y, method
 
@@ -173,7 +312,10 @@ class Results(IntegrationResults.Results):
         """
         # Get index of the desired signal and check it
         if isinstance(name, str):
-            nameIndex = self.index(name)
+            location = self.lookup(name)
+            if location is None:
+                return None
+            return self._signalData(*location)
         elif isinstance(name, int):
             if name < 0 or name >= len(self._name):
                 raise UnknownIndex("Index = " + str(name) + " is not correct")
@@ -193,15 +335,31 @@ class Results(IntegrationResults.Results):
                                         ", but must be 1 or 2")
         signalColumn = abs(signalInfo[1]) - 1
         signalSign = +1 if signalInfo[1] >= 0 else -1
-        if signalMatrix == 1:
+        return self._signalData(signalMatrix - 1, signalColumn, signalSign)
+
+    def _signalData(self, seriesIndex, column, sign, first=0, last=None):
+        """ Return the result values in the given column of data_1 (seriesIndex = 0)
+            or in the rows first:last of data_2 (seriesIndex = 1), negated if sign < 0
+        """
+        if seriesIndex == 0:
             # Data consists of constant data, expand data to match abscissa vector
             # n = self._data[1].shape[0]
-            signalData = numpy.array([signalSign * self._data[0][0, signalColumn]])  # *numpy.ones(n)
-        else:  # signalMatrix = 2
-            signalData = signalSign * self._data[1][:, signalColumn]
+            signalData = numpy.array([sign * self._data[0][0, column]])  # *numpy.ones(n)
+        elif sign < 0:
+            signalData = -self._data[1][first:last, column]
+        else:
+            # View on the (possibly memory-mapped) data, no copy
+            signalData = self._data[1][first:last, column]
         return signalData
 
 
+    def close(self):
+        # Release the references to the memory-mapped file
+        self._data = None
+        self.timeSeries = []
+        self.nTimeSeries = 0
+        self.isAvailable = False
+
     def getFileInfos(self):
         # No relevant file infos stored in a Dymola result file
         return dict()
@@ -248,6 +406,8 @@ def extractUnits(description):
     '''
     unit = ['' for i in xrange(len(description))]
     for index, s in enumerate(description):
+        if s[-1:] != ']':
+            continue  # No unit
         t = s.rsplit('[', 1)
         if len(t) > 1:
             if len(t[1]) > 0:
@@ -0,0 +1,286 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Streaming writer for Dymola result files (MAT v4, binTrans).
+The variables are described by the same structures that are used to
+initialize an MTSF result file (see pyMtsf.MTSF and MtsfFmi.convertFromFmi),
+so that a simulator can write either format with the same code.
+'''
+
+import threading
+
+import numpy
+
+import DymolaMat
+from Plugins.SimulationResult import IntegrationResults
+import Plugins.SimulationResult.Mtsf.pyMtsf as pyMtsf
+
+
+def writeMatrixHeader(f, name, mopt, mrows, ncols):
+    """ Writes the header of a matrix of a MAT v4 file (little endian)
+    """
+    f.write(numpy.array([mopt, mrows, ncols, 0, len(name) + 1], dtype='<i4').tostring())
+    f.write(name + '\x00')
+
+
+def writeTextMatrix(f, name, strList, transpose):
+    """ Writes a list of strings as character matrix. If transpose is True, the strings are
+        stored in the columns of the matrix (as for name and description of binTrans files).
+    """
+    n = max([len(x) for x in strList] + [1])
+    chars = numpy.array([x.ljust(n) for x in strList], dtype='S' + str(n)).view('u1').reshape(len(strList), n)
+    if transpose:
+        chars = chars.T
+    writeMatrixHeader(f, name, 51, chars.shape[0], chars.shape[1])
+    f.write(numpy.asfortranarray(chars).tostring(order='F'))
+
+
+class MatWriter():
+    ''' Writes the results of a simulation row by row to a Dymola result file.
+        The categories of the series are the same objects as for an MTSF file (pyMtsf.Results),
+        but their data is written to
+          data_1: series without independent variable (e.g. Fixed); column 1 holds the start and stop time
+          data_2: column 1 holds Time, followed by the columns of all other series.
+        A row of data_2 is written, when all categories of the series 'Continuous' have been written;
+        the columns of the other series (e.g. Discrete) keep their last values.
+        The number of columns of data_2 in the header is updated on flush() and close().
+        The buffer, the number of rows and the position of the file are guarded by a lock,
+        so that a reader in another thread can call rows() while the simulation writes.
+    '''
+    def __init__(self, fileName, modelVariables, experimentSetup, simpleTypes, units, bufferBytes=1048576):
+        self.fileName = fileName
+        self.results = pyMtsf.Results(modelVariables)
+
+        # Columns of the categories in data_1 and data_2 (column 0 is the time in both matrices)
+        nData1 = 1
+        nData2 = 1
+        self._rowSeries = None
+        for seriesName in sorted(self.results.series.keys()):
+            series = self.results.series[seriesName]
+            for categoryName in sorted(series.category.keys()):
+                category = series.category[categoryName]
+                if series.independentVariable is None:
+                    category.matOffset = nData1
+                    nData1 += category.nColumn
+                else:
+                    category.matOffset = nData2
+                    nData2 += category.nColumn
+                category.writeData = self._writeFunction(category)
+            if seriesName == 'Continuous':
+                self._rowSeries = series
+        self._data1 = numpy.zeros((nData1,))
+        self._data1[0] = experimentSetup["startTime"]
+        self._row = numpy.zeros((nData2,))
+        self._nWritten = 0  # Number of categories of the row series written for the current row
+        if self._rowSeries is not None:
+            timeVariable = modelVariables.variable[self._rowSeries.independentVariable]
+            self._timeColumn = timeVariable.category.matOffset + timeVariable.columnIndex
+
+        # Names, descriptions and dataInfo
+        self.name = ['Time']
+        self.description = ['Time in [s]']
+        dataInfo = [[0, 1, 0, -1]]
+        for variableName, variable in modelVariables.variable.iteritems():
+            if self._rowSeries is not None and variableName == self._rowSeries.independentVariable:
+                continue
+            series = variable.category.series
+            if series.independentVariable is not None and series is not self._rowSeries and variableName == series.independentVariable:
+                # e.g. TimeDiscrete
+                continue
+            description = variable.description
+            if 0 <= variable.simpleTypeRow < len(simpleTypes):
+                simpleType = simpleTypes[variable.simpleTypeRow]
+                if simpleType.dataType == pyMtsf.DataType['Real'] and 0 <= simpleType.unitOrEnumerationRow < len(units):
+                    unit = units[simpleType.unitOrEnumerationRow].name
+                    if unit != '':
+                        description += ' [' + unit + ']'
+            column = variable.category.matOffset + variable.columnIndex + 1
+            if variable.aliasNegated:
+                column = -column
+            self.name.append(variableName)
+            self.description.append(description)
+            dataInfo.append([1 if series.independentVariable is None else 2, column, 0, -1])
+        self.dataInfo = numpy.array(dataInfo, dtype=numpy.int32)
+
+        self.bufferRows = max(bufferBytes / (8 * nData2), 1)
+        self._buffer = numpy.zeros((self.bufferRows, nData2))
+        self._bufferRow = 0
+        self.nRows = 0  # Number of rows of data_2 on file
+        self._lock = threading.RLock()
+
+        # Write all matrices except the data of data_2
+        self.file = open(fileName, 'w+b')
+        f = self.file
+        writeTextMatrix(f, 'Aclass', ['Atrajectory', '1.1', '', 'binTrans'], False)
+        writeTextMatrix(f, 'name', self.name, True)
+        writeTextMatrix(f, 'description', self.description, True)
+        writeMatrixHeader(f, 'dataInfo', 20, self.dataInfo.shape[1], self.dataInfo.shape[0])
+        f.write(self.dataInfo.tostring())
+        writeMatrixHeader(f, 'data_1', 0, nData1, 2)
+        self._data1Offset = f.tell()
+        f.write(numpy.concatenate((self._data1, self._data1)).astype('<f8').tostring())
+        self._data2HeaderOffset = f.tell()
+        writeMatrixHeader(f, 'data_2', 0, nData2, 0)
+        self.data2Offset = f.tell()
+
+    def _writeFunction(self, category):
+        return lambda dataMatrix: self.writeData(category, dataMatrix)
+
+    def writeData(self, category, dataMatrix):
+        ''' Writes the values of category (one row or a matrix of rows)
+        '''
+        if dataMatrix.ndim == 2:
+            for row in dataMatrix:
+                self.writeData(category, row)
+            return
+        series = category.series
+        if series.independentVariable is None:
+            with self._lock:
+                self._data1[category.matOffset:category.matOffset + category.nColumn] = dataMatrix
+                self.file.seek(self._data1Offset)
+                self.file.write(numpy.concatenate((self._data1, self._data1)).astype('<f8').tostring())
+                self.file.seek(0, 2)
+            return
+        self._row[category.matOffset:category.matOffset + category.nColumn] = dataMatrix
+        if series is self._rowSeries:
+            self._nWritten += 1
+            if self._nWritten == len(series.category):
+                self._nWritten = 0
+                self._row[0] = self._row[self._timeColumn]
+                self._appendRow(self._row)
+
+    def _appendRow(self, row):
+        with self._lock:
+            if self._bufferRow == self.bufferRows:
+                self.flush()
+            self._buffer[self._bufferRow, :] = row
+            self._bufferRow += 1
+
+    def flush(self):
+        ''' Writes the buffered rows to file and updates the header of data_2
+        '''
+        with self._lock:
+            if self._bufferRow > 0:
+                self.file.write(self._buffer[:self._bufferRow, :].astype('<f8').tostring())
+                self.nRows += self._bufferRow
+                self._bufferRow = 0
+                self.file.seek(self._data2HeaderOffset + 8)
+                self.file.write(numpy.array([self.nRows], dtype='<i4').tostring())
+                self.file.seek(0, 2)
+            self.file.flush()
+
+    def rows(self):
+        ''' Writes the buffered rows to file and returns a consistent state of the data written so far
+            as tuple (number of rows of data_2 on file, copy of the row of data_1).
+            Can be called from another thread than the one that writes the data, also after close().
+        '''
+        with self._lock:
+            if self.file is not None:
+                self.flush()
+            return self.nRows, self._data1.copy()
+
+    def resizeCount(self):
+        ''' The file is only appended, there is nothing to resize
+        '''
+        return 0
+
+    def close(self):
+        ''' Writes the remaining rows and the stop time and closes the file.
+            The last row is written twice, since readers of Dymola result files
+            ignore the last row of data_2.
+        '''
+        with self._lock:
+            if self.nRows + self._bufferRow > 0:
+                if self._bufferRow > 0:
+                    lastRow = self._buffer[self._bufferRow - 1, :].copy()
+                else:
+                    self.file.seek(self.data2Offset + (self.nRows - 1) * self._row.shape[0] * 8)
+                    lastRow = numpy.fromstring(self.file.read(self._row.shape[0] * 8), dtype='<f8')
+                    self.file.seek(0, 2)
+                self._appendRow(lastRow)
+                self.flush()
+                self.file.seek(self._data1Offset + self._data1.shape[0] * 8)
+                self.file.write(numpy.array([lastRow[0]], dtype='<f8').tostring())
+            self.file.close()
+            self.file = None
+
+
+class Results(DymolaMat.Results):
+    ''' Result object for a Dymola result file that is written during a simulation.
+        The arguments are the same as for Mtsf.Results when writing an MTSF file.
+        The results written so far can be read with the methods of DymolaMat.Results.
+    '''
+    def __init__(self, resultFileName, modelDescription=None, modelVariables=None, experimentSetup=None, simpleTypes=None, units=None, enumerations=None):
+        IntegrationResults.Results.__init__(self)
+        self.fileName = resultFileName
+        self.canLoadPartialData = True
+        try:
+            self._writer = MatWriter(resultFileName, modelVariables, experimentSetup, simpleTypes, units)
+        except IOError:
+            self._writer = None
+            return
+        unit, description = DymolaMat.extractUnits(list(self._writer.description))
+        self._nameIndex = None
+        self._name = self._writer.name
+        self._description = description
+        self._unit = unit
+        self._dataInfo = self._writer.dataInfo
+        self._refresh()
+        self.isAvailable = True
+
+    def _refresh(self):
+        ''' Makes the rows written so far available
+        '''
+        writer = self._writer
+        if writer is None:
+            return
+        # Only the rows on file at the time of the snapshot are mapped; the writer may continue meanwhile
+        nRows, data1 = writer.rows()
+        nData2 = writer._row.shape[0]
+        if nRows > 0:
+            data2 = numpy.memmap(writer.fileName, dtype='<f8', mode='r', offset=writer.data2Offset, shape=(nData2, nRows), order='F').T
+        else:
+            data2 = numpy.zeros((0, nData2))
+        data1 = numpy.reshape(data1, (1, data1.shape[0]))
+        self._data = [data1, data2]
+        self.timeSeries = [IntegrationResults.TimeSeries(None, data1, "constant"),
+                           IntegrationResults.TimeSeries(data2[:, 0], data2, "linear")]
+        self.nTimeSeries = len(self.timeSeries)
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        self._refresh()
+        return DymolaMat.Results.readData(self, variableName, tStart, tStop)
+
+    def readDataMulti(self, variableNames, startRow=0):
+        self._refresh()
+        return DymolaMat.Results.readDataMulti(self, variableNames, startRow)
+
+    def data(self, name):
+        self._refresh()
+        return DymolaMat.Results.data(self, name)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        DymolaMat.Results.close(self)
@@ -22,6 +22,11 @@ along with PySimulator. If not, see www.gnu.org/licenses.
 
 
 import os
+import bisect
+import collections
+import hashlib
+import tempfile
+import numpy
 
 
 class TimeSeries():
@@ -45,6 +50,22 @@ class ResultVariable():
         self.sign = sign  # Integer (-1 / +1)
 
 
+def rowRange(t, tStart=None, tStop=None):
+    ''' Returns the tuple (first, last) of the rows t[first:last] of the independent variable t
+        (ascending) that cover the time window tStart ... tStop (None: no limit): all rows with
+        tStart <= t <= tStop and one boundary row on each side for interpolation.
+        The rows are located by binary search, so that only about log2(len(t)) elements of t
+        are accessed (also for memory-mapped arrays and sequences with __getitem__ and __len__).
+        If t is None (parameters), all rows are returned: (0, None).
+    '''
+    if t is None:
+        return 0, None
+    n = len(t)
+    first = 0 if tStart is None else max(bisect.bisect_left(t, tStart) - 1, 0)
+    last = n if tStop is None else min(bisect.bisect_right(t, tStop, first) + 1, n)
+    return first, max(first, last)
+
+
 class Results():
     ''' Base Class for hosting simulation results of each type.
     '''
@@ -57,9 +78,10 @@ class Results():
         #                                  result file although simulation is not finished
         self.nTimeSeries = 0
         self.timeSeries = []
+        self._index = None  # Dictionary: name -> (seriesIndex, column, sign), see lookup()
 
 
-    def readData(self, variableName):
+    def readData(self, variableName, tStart=None, tStop=None):
         ''' Returns numeric data of the variable given by its name variableName.
             The Time vector t is returned as well as the data-vector y. Both
             vectors are numpy vectors.
@@ -67,10 +89,102 @@ class Results():
             result points shall be interpreted. Possible values for method are
             'linear' for linear interpolation, 'constant' for constant interpolation
             and 'clocked' for discrete values only at the time instances.
+            If tStart or tStop is not None, only the rows in the time window
+            tStart ... tStop are returned, see rowRange; plugins should only read
+            these rows from the result file.
         '''
         pass
         # return t, y, method  # Types  numpy-array, numpy-array, String
 
+    def readDataSince(self, variableName, startRow):
+        ''' Returns numeric data of the variable like readData, but only the
+            rows from startRow on. Used to append the new rows of a result
+            that is still being written; t and y are None, if there are no new rows.
+            Results that can be read during writing should override this method,
+            so that only the new rows are read.
+        '''
+        t, y, method = self.readData(variableName)
+        if y is None or len(y) <= startRow:
+            return None, None, method
+        if t is not None:
+            t = t[startRow:]
+        return t, y[startRow:], method
+
+    def readDataMulti(self, variableNames, startRow=0):
+        ''' Returns numeric data of several variables given by the list of
+            names variableNames from row startRow on. The variables are grouped
+            by their time series, so that the data of each time series is accessed only once.
+            The return value is a list with a tuple (t, y, method, names)
+            for each time series containing at least one of the variables:
+               t        numpy vector of the independent variable (shared by all columns of y)
+               y        2-dim. numpy array; column k holds the values of names[k]
+               method   String with the interpolation method, see readData
+               names    List of the variable names in the order of the columns of y
+            Variables that are not contained in the result are ignored.
+        '''
+        groups = collections.OrderedDict()
+        for name in variableNames:
+            location = self.lookup(name)
+            if location is not None:
+                groups.setdefault(location[0], []).append((name, location[1], location[2]))
+
+        result = []
+        for seriesIndex, variables in groups.iteritems():
+            names = [x[0] for x in variables]
+            series = self.timeSeries[seriesIndex] if seriesIndex < len(self.timeSeries) else None
+            if series is not None and series.data is not None:
+                columns = [x[1] for x in variables]
+                signs = numpy.array([x[2] for x in variables])
+                y = series.data[startRow:, columns]
+                if (signs < 0).any():
+                    y = y * signs
+                t = series.independentVariable
+                if t is not None:
+                    t = t[startRow:]
+                result.append((t, y, series.interpolationMethod, names))
+            else:
+                # No data matrix available: read the variables one by one
+                columns = []
+                for name in names:
+                    t, yk, method = self.readDataSince(name, startRow)
+                    if yk is None:
+                        break
+                    columns.append(yk)
+                else:
+                    result.append((t, numpy.column_stack(columns), method, names))
+        return result
+
+    def hasDownsampledData(self, variableName):
+        ''' Returns True, if the result contains downsampled data of the variable,
+            that can be read with readData(variableName, tStart, tStop, nPoints), where
+            the rows in the time window tStart ... tStop (see readData) are
+            combined to at most about nPoints points. Plugins supporting this
+            have to overload this method and readData.
+        '''
+        return False
+
+    def lookup(self, variableName):
+        ''' Returns the tuple (seriesIndex, column, sign) of the variable
+            given by its name variableName or None, if the variable
+            is not in the result. The index is built once at the first call.
+        '''
+        if self._index is None:
+            self._index = self._buildIndex()
+        return self._index.get(variableName)
+
+    def _buildIndex(self):
+        ''' Returns a dictionary with names of variables as keys
+            and tuples (seriesIndex, column, sign) as values.
+            This default implementation uses getVariables(); plugins
+            should overload it, if the index can be built cheaper.
+        '''
+        index = dict()
+        variables = self.getVariables()
+        if variables is not None:
+            for name, variable in variables.iteritems():
+                index[name] = (variable.seriesIndex, variable.column, variable.sign)
+        return index
+
     def getVariables(self):
         ''' Returns a dictionary with names of variables as keys
             and instances of ResultVariable as values. This
@@ -110,3 +224,189 @@ class Results():
             or releasing resources can be done here.
         '''
         pass
+
+
+class ResultCache():
+    ''' On-disk cache for numerical data parsed from text result files.
+        Each entry is a .npy file in directory that is memory-mapped when loaded
+        (mmapMode as for numpy.load; None reads the entry into memory, so that it can be deleted).
+        If the entries take more than maxSize bytes, the least recently used ones are deleted.
+    '''
+    def __init__(self, directory, maxSize=2147483648, mmapMode='c'):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.mmapMode = mmapMode
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def key(self, fileName, *args):
+        ''' Returns the key of the data of file fileName; the key depends on the path, size,
+            modification time and the first and last 64 kB of the file, as well as on args
+            (e.g. position in the file and delimiter)
+        '''
+        stat = os.stat(fileName)
+        h = hashlib.sha1()
+        h.update(os.path.abspath(fileName))
+        h.update(str(stat.st_size))
+        h.update(repr(stat.st_mtime))
+        h.update(repr(args))
+        with open(fileName, 'rb') as f:
+            h.update(f.read(65536))
+            if stat.st_size > 65536:
+                f.seek(max(stat.st_size - 65536, 65536))
+                h.update(f.read())
+        return h.hexdigest()
+
+    def load(self, key):
+        ''' Returns the data stored for key (memory-mapped copy on write by default) or None
+        '''
+        path = os.path.join(self.directory, key + '.npy')
+        if not os.path.exists(path):
+            return None
+        try:
+            data = numpy.load(path, mmap_mode=self.mmapMode)
+            os.utime(path, None)  # Mark as recently used
+        except (IOError, OSError, ValueError):
+            return None
+        return data
+
+    def store(self, key, data):
+        ''' Stores data for key and deletes the least recently used entries if necessary
+        '''
+        try:
+            fd, tempName = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                numpy.save(f, data)
+            path = os.path.join(self.directory, key + '.npy')
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tempName, path)
+        except (IOError, OSError):
+            return
+        finally:
+            # Not renamed on errors (e.g. disk full or the old entry still in use)
+            if os.path.exists(tempName):
+                try:
+                    os.remove(tempName)
+                except OSError:
+                    pass
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for t, size, path in entries)
+        for t, size, path in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+resultCache = None  # ResultCache used by loadCsvData; None means no caching
+
+
+def loadCsvData(csvfile, delimiter, blockSize=4194304, progress=None, nColumns=0):
+    ''' Reads the numerical rows of an open csv file from its current position to its end.
+        The file is read in blocks of about blockSize bytes; each block is parsed at once
+        and appended to a growing array.
+        If progress is not None, it is called with the fraction of the file read so far.
+        If resultCache is set, the data is taken from or stored in the cache.
+        nColumns is the number of columns of the result, if the file has no numerical rows.
+
+        Returns a 2-dim. numpy array of float64 (rows x columns).
+    '''
+    key = None
+    if resultCache is not None and os.path.isfile(getattr(csvfile, 'name', '')):
+        key = resultCache.key(csvfile.name, csvfile.tell(), delimiter)
+        data = resultCache.load(key)
+        if data is not None:
+            if progress is not None:
+                progress(1.0)
+            return data
+    data = _readCsvData(csvfile, delimiter, blockSize, progress, nColumns)
+    if key is not None:
+        resultCache.store(key, data)
+    return data
+
+
+def _readCsvData(csvfile, delimiter, blockSize, progress, nColumns):
+    start = csvfile.tell()
+    csvfile.seek(0, 2)
+    end = csvfile.tell()
+    csvfile.seek(start)
+
+    data = None
+    nRows = 0
+    rest = ''
+    while True:
+        block = csvfile.read(blockSize)
+        if block:
+            text = rest + block
+            k = text.rfind('\n')
+            rest = text[k + 1:]
+            text = text[:k + 1]
+        else:
+            text = rest
+            rest = ''
+        if text.strip():
+            if data is None:
+                nColumns = len(text.lstrip().split('\n', 1)[0].strip().split(delimiter))
+            values = _parseCsvBlock(text, delimiter, nColumns)
+            if data is None:
+                # Estimate the number of rows from the size of the first block
+                estimate = int(values.shape[0] * float(end - start) / max(len(text), 1) * 1.05) + 1
+                data = numpy.empty((max(estimate, values.shape[0]), nColumns))
+            elif nRows + values.shape[0] > data.shape[0]:
+                data.resize((max(nRows + values.shape[0], data.shape[0] * 3 / 2), nColumns), refcheck=False)
+            data[nRows:nRows + values.shape[0], :] = values
+            nRows += values.shape[0]
+        if progress is not None:
+            progress(float(csvfile.tell() - start) / max(end - start, 1))
+        if not block:
+            break
+
+    if data is None:
+        return numpy.zeros((0, nColumns))
+    data.resize((nRows, data.shape[1]), refcheck=False)
+    return data
+
+
+def _parseCsvBlock(text, delimiter, nColumns):
+    ''' Parses complete lines of numbers separated by delimiter
+    '''
+    values = numpy.fromstring(text.replace(delimiter, ' '), sep=' ')
+    nLines = text.count('\n') + (text[-1] != '\n')
+    if values.shape[0] == nLines * nColumns and _hasColumns(text, delimiter, nColumns):
+        return numpy.reshape(values, (nLines, nColumns))
+    # Empty lines, lines with a different number of columns or entries that are not understood by the fast path
+    values = numpy.loadtxt(text.splitlines(), delimiter=delimiter, ndmin=2)
+    if values.shape[1] != nColumns:
+        raise ValueError("Wrong number of columns in csv data")
+    return values
+
+
+def _hasColumns(text, delimiter, nColumns):
+    ''' Returns True, if every line of text contains nColumns - 1 delimiters
+    '''
+    characters = numpy.frombuffer(text, dtype=numpy.uint8)
+    lineEnds = numpy.flatnonzero(characters == ord('\n'))
+    if text[-1] != '\n':
+        lineEnds = numpy.append(lineEnds, len(text) - 1)
+    # Number of delimiters up to the end of each line
+    delimiters = numpy.searchsorted(numpy.flatnonzero(characters == ord(delimiter)), lineEnds)
+    return delimiters[0] == nColumns - 1 and bool(numpy.all(numpy.diff(delimiters) == nColumns - 1))
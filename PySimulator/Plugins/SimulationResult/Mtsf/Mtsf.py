@@ -23,7 +23,7 @@ along with PySimulator. If not, see www.gnu.org/licenses.
 
 import numpy
 import collections
-from operator import itemgetter
+import gc
 import time
 import os
 from Plugins.SimulationResult import IntegrationResults
@@ -35,14 +35,42 @@ import MtsfFmi
 fileExtension = 'mtsf'
 description = 'MA Time Series File Format'
 
+
+class TimeSeries(IntegrationResults.TimeSeries):
+    ''' Time series of an MTSF file. The independent variable and the data are
+        read from the file at the first access of independentVariable or data.
+    '''
+    def __init__(self, mtsf, name, independentVariableRow, method):
+        self.interpolationMethod = method
+        self.name = name  # Name of the dataset in the file
+        self._mtsf = mtsf
+        self._independentVariableRow = independentVariableRow
+
+    def __getattr__(self, name):
+        if name == 'data':
+            category = self._mtsf.file[self.name]
+            if category.size > 5000000:
+                self.data = None  # Memory problem for huge files
+            else:
+                self.data = numpy.array(category)
+            return self.data
+        if name == 'independentVariable':
+            if self._independentVariableRow < 0:
+                self.independentVariable = None
+            else:
+                self.independentVariable, trash, trash = self._mtsf.readData(self._mtsf.fileData.nameList[self._independentVariableRow])
+            return self.independentVariable
+        raise AttributeError(name)
+
+
 class Results(IntegrationResults.Results):
     ''' Result file object for an MTSF file
     '''
 
-    def __init__(self, resultFileName, modelDescription=None, modelVariables=None, experimentSetup=None, simpleTypes=None, units=None, enumerations=None):
+    def __init__(self, resultFileName, modelDescription=None, modelVariables=None, experimentSetup=None, simpleTypes=None, units=None, enumerations=None, layout=None, backgroundBuffers=0):
         IntegrationResults.Results.__init__(self)
 
-        self._mtsf = pyMtsf.MTSF(resultFileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+        self._mtsf = pyMtsf.MTSF(resultFileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations, layout, backgroundBuffers)
 
         self.fileName = self._mtsf.fileName
         self.canLoadPartialData = True
@@ -51,14 +79,23 @@ class Results(IntegrationResults.Results):
     def close(self):
         self._mtsf.close()
 
-    def readData(self, variableName):
-        return self._mtsf.readData(variableName)
+    def readData(self, variableName, tStart=None, tStop=None, nPoints=None):
+        return self._mtsf.readData(variableName, tStart, tStop, nPoints)
+
+    def hasDownsampledData(self, variableName):
+        return self._mtsf.hasPyramid(variableName)
+
+    def readDataSince(self, variableName, startRow):
+        return self._mtsf.readDataSince(variableName, startRow)
+
+    def readDataMulti(self, variableNames, startRow=0):
+        return self._mtsf.readDataMulti(variableNames, startRow)
 
     def getFileInfos(self):
         return self._mtsf.getResultAttributes()
 
     def getVariables(self):
-        self._mtsf.readVariableList()
+        self._mtsf.readVariableDatasets()
         variabilityList = self._mtsf.fileData.variables["variability", :, 0].tolist()
         causalityList = self._mtsf.fileData.variables["causality", :, 0].tolist()
         SimpleTypeRows = self._mtsf.fileData.variables["simpleTypeRow", :, 0].tolist()
@@ -78,73 +115,83 @@ class Results(IntegrationResults.Results):
 
 
         if len(self.timeSeries) == 0:
+            # The data of the time series is read when it is accessed
             for series in self._mtsf.file['/Results'].itervalues():
                 row = series.attrs['independentVariableRow']
                 interpolationMethod = series.attrs['interpolationMethod']
-                if row < 0:
-                    independentVariable = None
-                else:
-                    independentVariable, trash, trash = self.readData(self._mtsf.fileData.nameList[row])
                 for category in series.itervalues():
-                    if category.size > 5000000:
-                        data = None  # Memory problem for huge files
-                    else:
-                        data = numpy.array(category)
-                    self.timeSeries.append(IntegrationResults.TimeSeries(independentVariable, data, interpolationMethod))
-                    self.timeSeries[-1].name = category.name
+                    self.timeSeries.append(TimeSeries(self._mtsf, category.name, row, interpolationMethod))
 
             self.nTimeSeries = len(self.timeSeries)
 
+        timeSeriesIndex = dict((x.name, i) for i, x in enumerate(self.timeSeries))
+        datasetNames = self._mtsf.fileData.datasetNames
+        datasetIndexList = self._mtsf.fileData.datasetIndexList
+        seriesIndexOfDataset = [timeSeriesIndex[name] for name in datasetNames]
 
-        timeSeriesNameList = [x.name for x in self.timeSeries]
+        # Values of fixed variables: the first row of each dataset that contains fixed variables is read once
+        fixed = [pyMtsf.VariabilityType['constant'], pyMtsf.VariabilityType['fixed']]
+        firstRows = [None] * len(datasetNames)
+        for i in xrange(len(self._mtsf.fileData.nameList)):
+            if variabilityList[i] in fixed and firstRows[datasetIndexList[i]] is None:
+                dataset = self._mtsf.file[datasetNames[datasetIndexList[i]]]
+                firstRows[datasetIndexList[i]] = dataset[0, :].tolist() if dataset.shape[0] > 0 else []
 
         # Generate the dict
         variables = dict()
-        # Fill the values of the dict
-        for i in xrange(len(self._mtsf.fileData.nameList)):
-            name = self._mtsf.fileData.nameList[i]
-            simpleTypeRow = SimpleTypeRows[i]
-            unitRow = UnitRows[simpleTypeRow]
-            dataType = DataTypes[simpleTypeRow]
-            if variabilityList[i] in [pyMtsf.VariabilityType['constant'], pyMtsf.VariabilityType['fixed']]:
-                variability = 'fixed'
-            elif variabilityList[i] in [pyMtsf.VariabilityType['tunable'], pyMtsf.VariabilityType['discrete']]:
-                variability = 'discrete'
-            else:
-                variability = 'continuous'
-            value = None
-            if variability == 'fixed':
-                t, y, method = self._mtsf.readData(name)
-                value = y[0]
-                if dataType == pyMtsf.DataType['Boolean']:
-                    if value == 0:
-                        value = 'false'
-                    else:
-                        value = 'true'
-
-            infos = collections.OrderedDict()
-            if self._mtsf.fileData.descriptionList[i] is not None:
-                if len(self._mtsf.fileData.descriptionList[i]) > 0:
-                    infos['Description'] = self._mtsf.fileData.descriptionList[i]
-            infos['Variability'] = variability
-            infos['Causality'] = CausalityStrings[causalityList[i]]
-            infos['Type'] = DataTypeStrings[dataType]
-            if unitRow > -1:
-                unit = Units[unitRow]
-            else:
-                unit = None
+        # The cyclic garbage collector is not needed while the many small objects of the dict are created
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            # Fill the values of the dict
+            for i in xrange(len(self._mtsf.fileData.nameList)):
+                name = self._mtsf.fileData.nameList[i]
+                simpleTypeRow = SimpleTypeRows[i]
+                unitRow = UnitRows[simpleTypeRow]
+                dataType = DataTypes[simpleTypeRow]
+                if variabilityList[i] in [pyMtsf.VariabilityType['constant'], pyMtsf.VariabilityType['fixed']]:
+                    variability = 'fixed'
+                elif variabilityList[i] in [pyMtsf.VariabilityType['tunable'], pyMtsf.VariabilityType['discrete']]:
+                    variability = 'discrete'
+                else:
+                    variability = 'continuous'
+                value = None
+                sign = -1 if self._mtsf.fileData.negatedList[i] else 1
+                column = self._mtsf.fileData.columnList[i]
+                if variability == 'fixed' and column < len(firstRows[datasetIndexList[i]]):
+                    value = sign * firstRows[datasetIndexList[i]][column]
+                    if dataType == pyMtsf.DataType['Boolean']:
+                        if value == 0:
+                            value = 'false'
+                        else:
+                            value = 'true'
+
+                infos = collections.OrderedDict()
+                if self._mtsf.fileData.descriptionList[i] is not None:
+                    if len(self._mtsf.fileData.descriptionList[i]) > 0:
+                        infos['Description'] = self._mtsf.fileData.descriptionList[i]
+                infos['Variability'] = variability
+                infos['Causality'] = CausalityStrings[causalityList[i]]
+                infos['Type'] = DataTypeStrings[dataType]
+                if unitRow > -1:
+                    unit = Units[unitRow]
+                else:
+                    unit = None
 
-            objectId = self._mtsf.fileData.objectIdList[i]
-            seriesIndex = timeSeriesNameList.index(self._mtsf.file[objectId].name)
-            column = self._mtsf.fileData.columnList[i]
-            sign = -1 if self._mtsf.fileData.negatedList[i] else 1
-            variables[name] = IntegrationResults.ResultVariable(value, unit, variability, infos, seriesIndex, column, sign)
+                seriesIndex = seriesIndexOfDataset[datasetIndexList[i]]
+                variables[name] = IntegrationResults.ResultVariable(value, unit, variability, infos, seriesIndex, column, sign)
+        finally:
+            if gcEnabled:
+                gc.enable()
         return variables
 
 
 
-def convertFromDymolaMatFile(matFilename, mtsfFilename=None):
+def convertFromDymolaMatFile(matFilename, mtsfFilename=None, blockBytes=16777216):
     ''' Converts a Dymola result file (in mat-format) into the MTSF format.
+        The result file is memory-mapped and its trajectories are copied
+        in blocks of about blockBytes bytes, so that the memory needed does
+        not depend on the size of the result file.
         Returns the filename of the new result file
     '''
 
@@ -167,75 +214,63 @@ def convertFromDymolaMatFile(matFilename, mtsfFilename=None):
             resultFileName = mtsfFilename + '.mtsf'
 
     import Plugins.SimulationResult.DymolaMat.DymolaMat as DymolaMat
-    # Load mat-file
+    # Open mat-file (data_2 is memory-mapped)
     res = DymolaMat.Results(matFilename)
 
     # Define basic structure of result file
     variable = collections.OrderedDict()
+    nVariables = len(res._name)
+    matrix = numpy.asarray(res._dataInfo[:, 0])
+    signedColumn = numpy.asarray(res._dataInfo[:, 1])
+    column = numpy.abs(signedColumn)
+
+    # Search for aliases: variables with the same matrix and column form a group;
+    # all variables of a group are aliases of the first one (in the order of the file).
+    # lexsort is stable, so the first variable of a group is the one with the smallest index.
+    order = numpy.lexsort((column, matrix))
+    isFirst = numpy.ones((nVariables,), dtype=bool)
+    isFirst[1:] = (matrix[order[1:]] != matrix[order[:-1]]) | (column[order[1:]] != column[order[:-1]])
+    firstPosition = numpy.maximum.accumulate(numpy.where(isFirst, numpy.arange(nVariables), 0))
+    aliasIndex = numpy.empty((nVariables,), dtype=int)
+    aliasIndex[order] = numpy.where(isFirst, -1, order[firstPosition])
+    isOriginal = aliasIndex < 0
+    isFixed = matrix == 1
+    dataIndexFixed = (column[isOriginal & isFixed] - 1).tolist()
+    dataIndexContinuous = (column[isOriginal & ~isFixed] - 1).tolist()
+
+    # Group the units: one unit and one simple type for each different unit (sorted by name)
+    simpleTypes = []
+    units = []
+    enumerations = []
+    simpleTypes.append(pyMtsf.SimpleType('Real without unit', pyMtsf.DataType["Real"], '', False, -1, ''))  # No unit
+    uniqueUnits, unitIndex = numpy.unique(numpy.array(res._unit + ['']), return_inverse=True)
+    # uniqueUnits[0] is '' (variable without unit) that is mapped to simpleTypes[0]
+    simpleTypeRow = unitIndex[:nVariables].tolist()
+    for unit in uniqueUnits[1:].tolist():
+        units.append(pyMtsf.Unit(unit, 1.0, 0.0, 0))
+        simpleTypes.append(pyMtsf.SimpleType('Real, Unit = ' + unit, pyMtsf.DataType["Real"], '', False, len(units) - 1, ''))
 
-    # Search for aliases
-    sortedVariables = [(i, res._dataInfo[i, 0], abs(res._dataInfo[i, 1])) for i in xrange(len(res._name))]
-    sortedVariables.sort(key=itemgetter(2))
-    sortedVariables.sort(key=itemgetter(1))
-    aliasName = [None for i in xrange(len(res._name))]
-    for i, var in enumerate(sortedVariables):
-        index = var[0]
-        alias = None
-        j = i
-        while j > 0:
-            if sortedVariables[j - 1][1] != var[1] or sortedVariables[j - 1][2] != var[2]:
-                break
-            else:
-                j -= 1
-        if j < i:
-            alias = res._name[sortedVariables[j][0]]
-        aliasName[index] = alias
-    dataIndexFixed = []
-    dataIndexContinuous = []
     categoryIndex = pyMtsf.StandardCategoryNames.index(pyMtsf.CategoryMapping['Real'])
-    for index, variableName in enumerate(res._name):        
-        aliasNegated = False
-        if res._dataInfo[index, 0] == 1:
+    aliasIndex = aliasIndex.tolist()
+    isFixed = isFixed.tolist()
+    isNegated = (signedColumn < 0).tolist()
+    for index, variableName in enumerate(res._name):
+        if isFixed[index]:
             variability = 'fixed'
             seriesIndex = 0  # Fixed
         else:
             variability = 'continuous'
             seriesIndex = 1  # Continuous
-        if res._dataInfo[index, 1] < 0:
-            aliasNegated = True
-        if aliasName[index] is None:
-            if variability == 'fixed':
-                dataIndexFixed.append(abs(res._dataInfo[index, 1]) - 1)
-            else:
-                dataIndexContinuous.append(abs(res._dataInfo[index, 1]) - 1)
+        alias = res._name[aliasIndex[index]] if aliasIndex[index] >= 0 else None
         variable[variableName] = pyMtsf.ScalarModelVariable(res._description[index],
                                                     'option',
-                                                    0,  # may be set later
+                                                    simpleTypeRow[index],
                                                     variability,
                                                     seriesIndex, categoryIndex,
-                                                    aliasName[index], aliasNegated)
+                                                    alias, isNegated[index])
     modelVariables = pyMtsf.ModelVariables(variable, MtsfFmi.StandardSeriesForFmi, pyMtsf.StandardCategoryNames)
     timeData = res.data("Time")
     modelVariables.allSeries[1].initialRows = len(timeData)  # Continuous
-    simpleTypes = []
-    units = []
-    enumerations = []
-    simpleTypes.append(pyMtsf.SimpleType('Real without unit', pyMtsf.DataType["Real"], '', False, -1, ''))  # No unit
-
-    unitList = [(index, unit) for index, unit in enumerate(res._unit)]
-    unitList.sort(key=itemgetter(1))
-    preUnit = ''
-    for x in unitList:
-        index = x[0]
-        unit = x[1]
-        if unit != '':
-            if preUnit != unit:
-                units.append(pyMtsf.Unit(unit, 1.0, 0.0, 0))
-                simpleTypes.append(pyMtsf.SimpleType('Real, Unit = ' + unit, pyMtsf.DataType["Real"], '', False, len(units) - 1, ''))
-                preUnit = unit
-                modelVariables.variable[res._name[index]].simpleTypeRow = len(simpleTypes) - 1
-            else:
-                modelVariables.variable[res._name[index]].simpleTypeRow = len(simpleTypes) - 1
     experimentSetup = pyMtsf.ExperimentSetup(startTime=timeData[0], stopTime=timeData[-1], algorithm="",
                         relativeTolerance='', author="", description="",
                         generationDateAndTime=time.strftime("%a, %d %b %Y %H:%M:%S", time.gmtime()),
@@ -243,18 +278,17 @@ def convertFromDymolaMatFile(matFilename, mtsfFilename=None):
                         cpuTime="")
     modelDescription = pyMtsf.ModelDescription(resultFileName[:-5], '', '', '', '', '', 'structured')
     # Create result object
-    mtsf = pyMtsf.MTSF(resultFileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+    mtsf = pyMtsf.MTSF(resultFileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations, pyMtsf.DatasetLayout())
     # Write numeric data
-    fixedValues = numpy.ndarray((len(dataIndexFixed,)))
-    for i, index in enumerate(dataIndexFixed):
-        fixedValues[i] = res._data[0][0, index]
-    continuousValues = numpy.ndarray((len(timeData), len(dataIndexContinuous)))
-    for i, index in enumerate(dataIndexContinuous):
-        continuousValues[:, i] = res._data[1][:, index]
+    fixedValues = res._data[0][0, dataIndexFixed].astype(numpy.float64)
     mtsf.results.series['Fixed'].category[pyMtsf.CategoryMapping['Real']].writeData(fixedValues)
-    mtsf.results.series['Continuous'].category[pyMtsf.CategoryMapping['Real']].writeData(continuousValues)
+    continuous = mtsf.results.series['Continuous'].category[pyMtsf.CategoryMapping['Real']]
+    blockRows = max(blockBytes / (8 * max(len(dataIndexContinuous), 1)), 1)
+    for row in xrange(0, len(timeData), blockRows):
+        continuous.writeData(res._data[1][row:row + blockRows, dataIndexContinuous].astype(numpy.float64))
 
-    # Close file
+    # Close files
     mtsf.close()
+    res.close()
     return resultFileName
 
@@ -0,0 +1,204 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Bulk conversion of Dymola result files (*.mat) into the MTSF format.
+All result files of a directory tree are converted by a pool of processes
+with Mtsf.convertFromDymolaMatFile. Usage from the PySimulator directory:
+
+    python -m Plugins.SimulationResult.Mtsf.MtsfConverter [options] sourceDirectory
+'''
+
+import os
+import sys
+import time
+import argparse
+import traceback
+import multiprocessing
+
+import Mtsf
+
+
+class ConversionStatistics():
+    ''' Summary of a bulk conversion
+    '''
+    def __init__(self):
+        self.nConverted = 0  # Number of converted files
+        self.nSkipped = 0  # Number of files with an up-to-date MTSF file
+        self.nFailed = 0  # Number of files that could not be converted
+        self.failed = []  # List of tuples (matFileName, error message)
+        self.bytesConverted = 0  # Total size of the converted mat-files in bytes
+        self.elapsedTime = 0.0  # Wall clock time in s
+
+    def throughput(self):
+        ''' Returns the tuple (files per second, MB per second) of the converted files
+        '''
+        if self.elapsedTime <= 0.0:
+            return 0.0, 0.0
+        return self.nConverted / self.elapsedTime, self.bytesConverted / 1048576.0 / self.elapsedTime
+
+    def summary(self):
+        filesPerSecond, mbPerSecond = self.throughput()
+        return ("%d converted (%.1f MB), %d up to date, %d failed in %.1f s: %.2f files/s, %.1f MB/s"
+                % (self.nConverted, self.bytesConverted / 1048576.0, self.nSkipped, self.nFailed,
+                   self.elapsedTime, filesPerSecond, mbPerSecond))
+
+
+def findDymolaMatFiles(sourceDirectory, targetDirectory=None, recursive=True):
+    ''' Returns a list of tuples (matFileName, mtsfFileName) for all *.mat files in sourceDirectory
+        (and its subdirectories, if recursive is True). The MTSF file is placed next to the mat-file
+        or, if targetDirectory is not None, at the same relative path in targetDirectory.
+    '''
+    files = []
+    for directory, subDirectories, fileNames in os.walk(sourceDirectory):
+        if not recursive:
+            del subDirectories[:]
+        subDirectories.sort()
+        if targetDirectory is None:
+            outputDirectory = directory
+        else:
+            outputDirectory = os.path.normpath(os.path.join(targetDirectory, os.path.relpath(directory, sourceDirectory)))
+        for fileName in sorted(fileNames):
+            if fileName.lower().endswith('.mat'):
+                files.append((os.path.join(directory, fileName), os.path.join(outputDirectory, fileName[:-4] + '.mtsf')))
+    return files
+
+
+def isUpToDate(matFileName, mtsfFileName):
+    ''' Returns True, if mtsfFileName exists and is not older than matFileName
+    '''
+    return os.path.isfile(mtsfFileName) and os.path.getmtime(mtsfFileName) >= os.path.getmtime(matFileName)
+
+
+def _convertFile(task):
+    ''' Converts one file in a worker process. The MTSF file is written under a temporary
+        name and renamed when it is complete, so that an interrupted conversion is not
+        taken as up to date.
+        Returns the tuple (matFileName, bytes, seconds, error message or None).
+    '''
+    matFileName, mtsfFileName, blockBytes = task
+    startTime = time.time()
+    tempFileName = mtsfFileName[:-5] + '.converting.mtsf'
+    try:
+        outputDirectory = os.path.dirname(mtsfFileName)
+        if outputDirectory != '' and not os.path.isdir(outputDirectory):
+            try:
+                os.makedirs(outputDirectory)
+            except OSError:
+                # Created by another process in the meantime
+                if not os.path.isdir(outputDirectory):
+                    raise
+        Mtsf.convertFromDymolaMatFile(matFileName, tempFileName, blockBytes)
+        if os.path.exists(mtsfFileName):
+            os.remove(mtsfFileName)
+        os.rename(tempFileName, mtsfFileName)
+    except Exception as e:
+        if os.path.exists(tempFileName):
+            try:
+                os.remove(tempFileName)
+            except OSError:
+                pass
+        message = str(e) or traceback.format_exc().strip().splitlines()[-1]
+        return matFileName, 0, time.time() - startTime, message
+    return matFileName, os.path.getsize(matFileName), time.time() - startTime, None
+
+
+def convertDirectory(sourceDirectory, targetDirectory=None, processes=None, force=False, recursive=True, blockBytes=16777216, log=None):
+    ''' Converts all Dymola result files in sourceDirectory into MTSF files, see findDymolaMatFiles.
+        processes is the number of worker processes (default: number of CPUs); with processes=1
+        the files are converted in the calling process. MTSF files that are not older than their
+        mat-file are not converted again, unless force is True. Each worker copies the trajectories
+        in blocks of about blockBytes bytes, see Mtsf.convertFromDymolaMatFile.
+        log is called with a message for each file (e.g. log=sys.stdout.write); None means no messages.
+        Returns an instance of ConversionStatistics.
+    '''
+    statistics = ConversionStatistics()
+    startTime = time.time()
+
+    tasks = []
+    for matFileName, mtsfFileName in findDymolaMatFiles(sourceDirectory, targetDirectory, recursive):
+        if not force and isUpToDate(matFileName, mtsfFileName):
+            statistics.nSkipped += 1
+        else:
+            tasks.append((matFileName, mtsfFileName, blockBytes))
+    # Start with the largest files to balance the load of the workers
+    tasks.sort(key=lambda task: os.path.getsize(task[0]), reverse=True)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(min(processes, len(tasks)), 1)
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_convertFile, tasks)
+    else:
+        results = (_convertFile(task) for task in tasks)
+
+    try:
+        for i, (matFileName, nBytes, seconds, message) in enumerate(results):
+            if message is None:
+                statistics.nConverted += 1
+                statistics.bytesConverted += nBytes
+                text = "converted in %.2f s" % seconds
+            else:
+                statistics.nFailed += 1
+                statistics.failed.append((matFileName, message))
+                text = "failed: " + message
+            if log is not None:
+                log("[%d/%d] %s %s\n" % (i + 1, len(tasks), matFileName, text))
+        if pool is not None:
+            pool.close()
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+
+    statistics.elapsedTime = time.time() - startTime
+    return statistics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Converts the Dymola result files (*.mat) of a directory tree into MTSF files.')
+    parser.add_argument('sourceDirectory', help='directory with Dymola result files')
+    parser.add_argument('-o', '--output', dest='targetDirectory', default=None,
+                        help='directory for the MTSF files (default: next to the mat-files)')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='convert also files with an up-to-date MTSF file')
+    parser.add_argument('-n', '--no-recursive', dest='recursive', action='store_false',
+                        help='do not convert files in subdirectories')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='print only the summary')
+    args = parser.parse_args(argv)
+
+    statistics = convertDirectory(args.sourceDirectory, args.targetDirectory, args.processes, args.force,
+                                  args.recursive, log=None if args.quiet else sys.stdout.write)
+    print statistics.summary()
+    return 1 if statistics.nFailed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -88,7 +88,8 @@ def convertFromFmi(fmuFilename, fmi=None):
         if var.alias is None or var.alias.lower() == "noalias":
             var.alias = 'NOAlias'  # To guarantee that this variable is the first
                                     # one in sorted order
-    referenceList = [(x, y.valueReference, y.alias) for x, y in fmi.scalarVariables.iteritems()]
+    # Value references are unique only for the same base type (Enumerations use the Integer references)
+    referenceList = [(x, ('Integer' if y.type.type == 'Enumeration' else y.type.type, y.valueReference), y.alias) for x, y in fmi.scalarVariables.iteritems()]
     referenceList.sort(key=itemgetter(2))
     referenceList.sort(key=itemgetter(1))
 
@@ -201,7 +202,7 @@ def convertFromFmi(fmuFilename, fmi=None):
     # Iterate over all fmi-variables
     for fmiVariableName, fmiVariable in fmi.scalarVariables.iteritems():
         variableType = fmiVariable.type.type
-        if variableType != "String":  # Do not support strings
+        if variableType != "String" and fmiVariable.causality != 'independent':  # Do not support strings; Time is defined above
             variability = fmiVariable.variability
 
             aliasNegated = 0
@@ -212,9 +213,9 @@ def convertFromFmi(fmuFilename, fmi=None):
                 # Due to possibly insufficient information in xml-file
                 variability = fmi.scalarVariables[aliasName].variability
             categoryIndex = pyMtsf.StandardCategoryNames.index(pyMtsf.CategoryMapping[variableType])
-            if variability in ['constant', 'parameter']:
+            if variability in ['constant', 'parameter', 'fixed']:
                 seriesIndex = allSeriesNames.index('Fixed')
-            elif variability == 'discrete':
+            elif variability in ['discrete', 'tunable']:
                 seriesIndex = allSeriesNames.index('Discrete')
             else:
                 seriesIndex = allSeriesNames.index('Continuous')
@@ -226,7 +227,7 @@ def convertFromFmi(fmuFilename, fmi=None):
             if variability == 'parameter':
                 causality = 'parameter'
                 variability = 'fixed'
-            if causality in ['internal', 'none']:
+            if causality in ['internal', 'none', 'calculatedParameter']:
                 causality = 'local'
 
             simpleTypeRow = rowIndex[fmiVariableName]
@@ -44,6 +44,10 @@ Proc. of 9th International Modelica Conference, Munich, Germany, Sept. 2012.
 
 import h5py
 import numpy
+import math
+import collections
+import threading
+import Queue
 
 
 
@@ -195,6 +199,40 @@ def ExperimentSetup(startTime, stopTime, algorithm, relativeTolerance, author, d
     return ret
 
 
+class DatasetLayout:
+    ''' Class to hold the storage layout (chunking, filters and compression) of the datasets in /Results
+    '''
+    def __init__(self, chunkBytes=65536, chunkColumns=1, shuffle=False, compression='gzip', compressionLevel=None, growthFactor=2.0, pyramidFactor=None):
+        self.chunkBytes = chunkBytes  # Target size of one chunk in bytes; None: chunk shape is chosen by h5py
+        self.chunkColumns = chunkColumns  # Number of columns of one chunk
+        self.shuffle = shuffle  # True, if the shuffle filter shall be applied before compression
+        self.compression = compression  # 'gzip', 'lzf' or None (no compression)
+        self.compressionLevel = compressionLevel  # 0 ... 9 for 'gzip'; None: default level of h5py
+        self.growthFactor = growthFactor  # Minimum factor by which a full dataset is enlarged
+        self.pyramidFactor = pyramidFactor  # Rows per bin factor between the levels of /Pyramid, see buildPyramid; built when the file is closed; None: no /Pyramid
+
+    def compressionOptions(self):
+        ''' Returns the compression options for h5py's create_dataset
+        '''
+        if self.compression == 'gzip':
+            return self.compressionLevel
+        return None
+
+    def chunkShape(self, nRows, nColumn, itemSize, fixedRows):
+        ''' Returns the chunk shape (rows, columns) for a dataset with nColumn columns
+            and elements of itemSize bytes, or None if h5py shall choose the chunk shape.
+            A chunk has at most nRows rows. If fixedRows is True, the dataset does not grow
+            beyond nRows rows and the chunk is widened to the target size instead.
+        '''
+        if self.chunkBytes is None:
+            return None
+        columns = max(min(self.chunkColumns, nColumn), 1)
+        rows = max(min(self.chunkBytes / (itemSize * columns), nRows), 1)
+        if fixedRows:
+            columns = max(min(self.chunkBytes / (itemSize * rows), nColumn), columns)
+        return (rows, columns)
+
+
 class Category:
     ''' Class to handle a category. A category is a dataset of a time series group.
     '''
@@ -204,16 +242,40 @@ class Category:
         self.currentRow = 0
         self.name = name
         self.series = series
+        self._writer = None  # BackgroundWriter or None (synchronous writing)
+        self._pending = []  # Buffers (data, rows) handed over to the background writer, but not yet written
+        self._lock = threading.Lock()
+        self.growthFactor = 1.3
+        self.nResize = 0  # Number of enlargements of the dataset
 
-    def writeInitial(self, host, initialRows):
+    def writeInitial(self, host, initialRows, layout=None):
         # compression = None
         compression = "gzip"
         if self.name != 'H5T_C_S1':
             if self.nColumn >= 8:
                 compression = "gzip"
                 # compression = None
-        self.dataset = host.create_dataset(self.name, shape=(initialRows, self.nColumn), dtype=eval('h5py.h5t.' + self.name[4:]), maxshape=(None, None), compression=compression)  # chunks=(c1,c2))
-        self._data = numpy.zeros((max(min(10000000 / self.nColumn, initialRows), 1), self.nColumn))
+        dtype = eval('h5py.h5t.' + self.name[4:])
+        maxBufferRows = max(10000000 / self.nColumn, 1)
+        bufferRows = max(min(maxBufferRows, initialRows), 1)
+        chunks = None
+        shuffle = False
+        compressionOptions = None
+        if layout is not None:
+            self.growthFactor = layout.growthFactor
+            shuffle = layout.shuffle
+            compression = layout.compression
+            compressionOptions = layout.compressionOptions()
+            if self.series is None or self.series.independentVariable is None:
+                # Number of rows is known in advance (e.g. series Fixed)
+                chunks = layout.chunkShape(initialRows, self.nColumn, dtype.get_size(), True)
+            else:
+                chunks = layout.chunkShape(maxBufferRows, self.nColumn, dtype.get_size(), False)
+                if chunks is not None:
+                    # The buffer holds a multiple of the chunk rows, so that complete chunks are written
+                    bufferRows = max(bufferRows, chunks[0]) / chunks[0] * chunks[0]
+        self.dataset = host.create_dataset(self.name, shape=(initialRows, self.nColumn), dtype=dtype, maxshape=(None, None), compression=compression, compression_opts=compressionOptions, chunks=chunks, shuffle=shuffle)
+        self._data = numpy.zeros((bufferRows, self.nColumn))
         self._currentRow = 0
 
     def writeData(self, dataMatrix):
@@ -230,6 +292,12 @@ class Category:
         else:
             # Enough space?
             if dataMatrix.shape[0] + self._currentRow > self._data.shape[0]:
+                if self._currentRow > 0:
+                    # Fill up the buffer first, so that only complete buffers (i.e. complete chunks) are written
+                    n = self._data.shape[0] - self._currentRow
+                    self._data[self._currentRow:, :] = dataMatrix[:n, :]
+                    self._currentRow += n
+                    dataMatrix = dataMatrix[n:, :]
                 self._writeDataToFile()
             if dataMatrix.shape[0] + self._currentRow > self._data.shape[0]:
                 self._writeDataToFile(dataMatrix)
@@ -240,47 +308,151 @@ class Category:
     def _writeDataToFile(self, dataMatrix=None):
         ''' Write data in a HDF5 dataset
         '''
-        useInternalData = False
         if dataMatrix is None:
-            useInternalData = True
-            dataMatrix = self._data
-        if dataMatrix.ndim == 1:
-            if 1 + self.currentRow > self.dataset.shape[0]:
-                # Increase space about 30%
-                # print "Increasing space"
-                newSize = self.dataset.shape[0] + max(self.dataset.shape[0] * 3 / 10, 1)
-                self.dataset.resize(newSize, axis=0)
-            # Write data
-            if useInternalData:
-                row = self._currentRow
-            else:
-                row = 1
-            if row > 0:
-                self.dataset[self.currentRow:self.currentRow + row, :] = dataMatrix[0:row, :]
+            row = self._currentRow
+            if self._writer is not None:
+                # Hand the buffer over to the background writer and continue with a new one.
+                # Readers see either the old buffer with its rows or the new empty one (see getRows).
+                with self._lock:
+                    data = self._data
+                    self._data = numpy.empty_like(data)
+                    self._currentRow = 0
+                    if row > 0:
+                        self._pending.append((data, row))
+                if row > 0:
+                    self._writer.put(self)
+                return
+            self._writeRows(self._data, row)
+            with self._lock:
+                self.currentRow += row
+                # A reader may still hold the old buffer (see getRows), so it is not reused
+                self._data = numpy.empty_like(self._data)
+                self._currentRow = 0
+            return
         else:
-            if dataMatrix.shape[0] + self.currentRow > self.dataset.shape[0]:
-                # Increase space about 30%
-                # print "Increasing space"
-                newSize = self.dataset.shape[0] + max(self.dataset.shape[0] * 3 / 10, dataMatrix.shape[0])
-                self.dataset.resize(newSize, axis=0)
-            # Write data
-            if useInternalData:
-                row = self._currentRow
+            if self._writer is not None:
+                # Keep the order of the rows
+                self._writer.flush()
+            if dataMatrix.ndim == 1:
+                dataMatrix = numpy.reshape(dataMatrix, (1, dataMatrix.shape[0]))
+                minIncrease = 1
             else:
-                row = dataMatrix.shape[0]
-            if row > 0:
-                self.dataset[self.currentRow:self.currentRow + row, :] = dataMatrix[0:row, :]
+                minIncrease = dataMatrix.shape[0]
+            row = dataMatrix.shape[0]
+            self._writeRows(dataMatrix, row, minIncrease)
 
-        self.currentRow += row
-        # Reset internal data
-        self._currentRow = 0
+        with self._lock:
+            self.currentRow += row
+            # Reset internal data
+            self._currentRow = 0
+
+    def _writeRows(self, dataMatrix, row, minIncrease=None):
+        ''' Write the first row rows of dataMatrix after the rows already in the dataset
+        '''
+        if minIncrease is None:
+            minIncrease = dataMatrix.shape[0]
+        if row + self.currentRow > self.dataset.shape[0]:
+            self._grow(row + self.currentRow, minIncrease)
+        # Write data
+        if row > 0:
+            self.dataset[self.currentRow:self.currentRow + row, :] = dataMatrix[0:row, :]
+
+    def _grow(self, requiredRows, minIncrease):
+        ''' Enlarges the dataset, so that it has space for at least requiredRows rows
+        '''
+        size = self.dataset.shape[0]
+        newSize = max(size + max(int(size * (self.growthFactor - 1.0)), minIncrease), requiredRows)
+        if self.series is not None:
+            # Use the final number of rows estimated from the progress of the series, but do not grow too fast
+            estimate = self.series.estimateRows(requiredRows)
+            if estimate is not None:
+                newSize = max(newSize, min(int(estimate * 1.1), 8 * max(size, minIncrease)))
+        chunks = self.dataset.chunks
+        if chunks is not None:
+            # Align to complete chunks
+            newSize = (newSize + chunks[0] - 1) / chunks[0] * chunks[0]
+        self.dataset.resize(newSize, axis=0)
+        self.nResize += 1
+
+    def _writePending(self):
+        ''' Writes the oldest buffer handed over to the background writer (called by the writer thread)
+        '''
+        data, row = self._pending[0]
+        self._writeRows(data, row)
+        with self._lock:
+            self.currentRow += row
+            del self._pending[0]
+
+    def getRows(self):
+        ''' Returns a consistent state of the rows written so far as tuple
+            (rows in the dataset, list of buffers (data, rows) waiting for the background writer,
+             rows in the buffer, buffer). The first rows of a buffer are not changed any more,
+            so that the caller can read them without holding the lock.
+        '''
+        with self._lock:
+            return self.currentRow, list(self._pending), self._currentRow, self._data
 
     def close(self):
         if self._currentRow > 0:
             self._writeDataToFile()
+        if self._writer is not None:
+            self._writer.flush()
         if self.currentRow < self.dataset.shape[0]:
             self.dataset.resize(self.currentRow, axis=0)
 
+
+class BackgroundWriter(threading.Thread):
+    ''' Thread that writes the full buffers of categories to the HDF5 file,
+        so that the caller of Category.writeData does not wait for resizing,
+        compressing and writing. If more than maxPending buffers are waiting,
+        the caller is blocked until the writer has caught up.
+    '''
+    def __init__(self, maxPending):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._queue = Queue.Queue(max(maxPending, 1))
+        self._error = None
+        self.start()
+
+    def run(self):
+        while True:
+            category = self._queue.get()
+            try:
+                if category is None:
+                    return
+                if self._error is None:
+                    category._writePending()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def put(self, category):
+        ''' Schedules writing the oldest pending buffer of category
+        '''
+        self._checkError()
+        self._queue.put(category)
+
+    def flush(self):
+        ''' Waits until all scheduled buffers are written
+        '''
+        self._queue.join()
+        self._checkError()
+
+    def stop(self):
+        ''' Writes all scheduled buffers and terminates the thread
+        '''
+        self._queue.put(None)
+        self.join()
+        self._checkError()
+
+    def _checkError(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+
 class Series:
     ''' Class to handle a time series. A time series may contain several datasets.
         We call each dataset a category.
@@ -296,13 +468,29 @@ class Series:
         self.handle = None
         self.initialRows = initialRows
         self.independentVariableRow = -2
+        self.startTime = None
+        self.stopTime = None
+        self.reachedTime = None  # Value of the independent variable of the last written row; set by the writer
+
+    def estimateRows(self, rows):
+        ''' Returns the estimated final number of rows, if rows rows are written up to reachedTime;
+            returns None if there is no estimate
+        '''
+        if self.reachedTime is None or self.startTime is None or self.stopTime is None:
+            return None
+        if self.reachedTime <= self.startTime or self.stopTime <= self.reachedTime:
+            return None
+        return int(rows * (self.stopTime - self.startTime) / (self.reachedTime - self.startTime)) + 1
 
     def writeInitial(self, mtfs):
         # Create HDF5 group for series
         self.handle = mtfs.resultsHandle.create_group(self.name)
         self.handle.attrs['interpolationMethod'] = self.interpolationMethod
+        if self.independentVariable is not None and mtfs.experimentSetup is not None:
+            self.startTime = mtfs.experimentSetup.get("startTime")
+            self.stopTime = mtfs.experimentSetup.get("stopTime")
         for category in self.category.values():
-                category.writeInitial(self.handle, self.initialRows)
+                category.writeInitial(self.handle, self.initialRows, mtfs.layout)
 
     def writeIndependentVariable(self, mtfs):
         # Set link to independent variable
@@ -367,17 +555,20 @@ class FileData:
     def __init__(self):
         self.variables = None
         self.nameList = None
+        self.nameIndex = None
         self.objectIdList = None
         self.columnList = None
         self.negatedList = None
         self.descriptionList = None
+        self.datasetNames = None
+        self.datasetIndexList = None
 
 
 
 class MTSF:
     ''' This is the main class to write and read files in MTSF format
     '''
-    def __init__(self, resultFileName, modelDescription=None, modelVariables=None, experimentSetup=None, simpleTypes=None, units=None, enumerations=None):
+    def __init__(self, resultFileName, modelDescription=None, modelVariables=None, experimentSetup=None, simpleTypes=None, units=None, enumerations=None, layout=None, backgroundBuffers=0):
         '''                              Type
             resultFileName               String
             modelDescription             ModelDescription
@@ -386,6 +577,11 @@ class MTSF:
             simpleTypes                  list of SimpleTypes
             units                        list of Units
             enumerations                 list of Enumerations
+            layout                       DatasetLayout       [optional, default: DatasetLayout()]
+            backgroundBuffers            Integer             [optional, default: 0]
+
+            If backgroundBuffers > 0, full write buffers are written to file in a background thread;
+            writeData only waits, if more than backgroundBuffers buffers are not yet written.
 
             If modelDescription is not None then /ModelDescription is written, also the structure of /Results
             Otherwise the file given by resultFileName is opened for reading.
@@ -397,6 +593,7 @@ class MTSF:
         self.readable = False
         self.fileName = resultFileName
         self.file = None
+        self.writer = None
 
         if resultFileName is None:
             return
@@ -418,6 +615,10 @@ class MTSF:
         self.simpleTypes = simpleTypes
         self.units = units
         self.enumerations = enumerations
+        if layout is None:
+            self.layout = DatasetLayout()
+        else:
+            self.layout = layout
 
         # Create hdf5 file
         try:
@@ -438,6 +639,12 @@ class MTSF:
         for series in self.results.series.values():
             series.writeIndependentVariable(self)
 
+        if backgroundBuffers > 0:
+            self.writer = BackgroundWriter(backgroundBuffers)
+            for series in self.results.series.values():
+                for category in series.category.values():
+                    category._writer = self.writer
+
         self.readable = True
 
 
@@ -582,6 +789,13 @@ class MTSF:
         for series in self.results.series.values():
             series.writeInitial(self)
 
+    def resizeCount(self):
+        ''' Returns the number of enlargements of the datasets in /Results during writing
+        '''
+        if self.access != 'write':
+            return 0
+        return sum(category.nResize for series in self.results.series.values() for category in series.category.values())
+
     def close(self):
         ''' Close the HDF5 file.
 
@@ -593,8 +807,15 @@ class MTSF:
             self.access = None
             self.file = None
             if access == 'write':
-                for series in self.results.series.values():
-                    series.close()
+                try:
+                    for series in self.results.series.values():
+                        series.close()
+                finally:
+                    if self.writer is not None:
+                        self.writer.stop()
+                        self.writer = None
+                if self.layout.pyramidFactor is not None:
+                    _buildPyramid(f, self.layout.pyramidFactor, layout=self.layout)
             f.close()
 
     def _openFileForReading(self, fileName):
@@ -615,6 +836,8 @@ class MTSF:
             self.fileData.variables = self.file["ModelDescription/Variables"]
         if self.fileData.nameList is None:
             self.fileData.nameList = self.fileData.variables["name", :, 0].tolist()
+        if self.fileData.nameIndex is None:
+            self.fileData.nameIndex = dict((name, row) for row, name in enumerate(self.fileData.nameList))
         if self.fileData.objectIdList is None:
             self.fileData.objectIdList = self.fileData.variables["objectId", :, 0].tolist()
         if self.fileData.columnList is None:
@@ -624,83 +847,296 @@ class MTSF:
         if self.fileData.descriptionList is None:
             self.fileData.descriptionList = self.fileData.variables["description", :, 0].tolist()
 
-
-    def readData(self, variableName):
+    def readVariableDatasets(self):
+        ''' Determines the dataset of each variable: fileData.datasetNames is the list of the names of
+            the datasets referenced in ModelDescription/Variables and fileData.datasetIndexList[row] is
+            the index in datasetNames of the dataset that holds the variable in the given row.
+            The object references are read and compared as raw addresses, so that each dataset
+            is dereferenced only once and not once for every variable.
+        '''
+        self.readVariableList()
+        if self.fileData.datasetIndexList is None:
+            variables = self.fileData.variables
+            memoryType = h5py.h5t.create(h5py.h5t.COMPOUND, 8)
+            memoryType.insert('objectId', 0, h5py.h5t.STD_REF_OBJ)
+            addresses = numpy.zeros(variables.shape, dtype=numpy.uint64)
+            if addresses.size > 0:
+                variables.id.read(h5py.h5s.ALL, h5py.h5s.ALL, addresses, mtype=memoryType)
+            trash, first, datasetIndex = numpy.unique(addresses.ravel(), return_index=True, return_inverse=True)
+            self.fileData.datasetNames = [self.file[self.fileData.objectIdList[row]].name for row in first.tolist()]
+            self.fileData.datasetIndexList = datasetIndex.tolist()
+
+
+    def readData(self, variableName, tStart=None, tStop=None, nPoints=None):
         ''' Reads numerical data from file for the variable given by its String-name  variableNameIn
 
+            Optional inputs:
+               tStart, tStop  Float     Only the rows in the time window are returned (None: no limit):
+                                        all rows with tStart <= t <= tStop and one boundary row on each side.
+                                        The rows are located by binary search and only they are read.
+               nPoints        Integer   If there are more than nPoints rows in the time window, the
+                                        downsampled data of /Pyramid (see buildPyramid) is returned instead:
+                                        two points (minimum, maximum) per bin of the finest level that
+                                        gives at most nPoints points. Without /Pyramid, every k-th row is returned.
+
             Outputs:
                t        numpy-array       Values of independent variable (normally time)
                y        numpy-array       Values of the given variable
                method   String            Interpolation method, e.g. 'linear', 'constant' or 'clocked'
         '''
+        if tStart is None and tStop is None and nPoints is None:
+            return self.readDataSince(variableName, 0)
+        return self._readDataWindow(variableName, tStart, tStop, nPoints)
+
+    def hasPyramid(self, variableName):
+        ''' Returns True, if there is downsampled data of the variable in /Pyramid
+        '''
+        if not self.readable or self.access != 'read' or 'Pyramid' not in self.file:
+            return False
+        self.readVariableList()
+        variableRowIndex = self.fileData.nameIndex.get(variableName)
+        if variableRowIndex is None:
+            return False
+        dataset = self.file[self.fileData.objectIdList[variableRowIndex]]
+        return dataset.parent.name.split('/')[-1] in self.file['Pyramid']
+
+    def _readDataWindow(self, variableName, tStart, tStop, nPoints):
+        if not self.readable:
+            return None, None, None
+        self.readVariableList()
+        variableRowIndex = self.fileData.nameIndex.get(variableName)
+        if variableRowIndex is None:
+            return None, None, None
+        dataset = self.file[self.fileData.objectIdList[variableRowIndex]]
+        series = dataset.parent
+        method = series.attrs["interpolationMethod"]
+        independentVariableRow = series.attrs["independentVariableRow"]
+        if independentVariableRow < 0 or self.access != 'read':
+            # No time or rows not yet written to the file: select the rows in memory
+            t, y, method = self.readDataSince(variableName, 0)
+            if t is None or y is None:
+                return t, y, method
+            first = 0 if tStart is None else max(numpy.searchsorted(t, tStart, 'left') - 1, 0)
+            last = len(t) if tStop is None else min(numpy.searchsorted(t, tStop, 'right') + 1, len(t))
+            last = max(first, last)
+            k = 1 if nPoints is None else max(int(math.ceil(float(last - first) / max(nPoints, 1))), 1)
+            return t[first:last:k], y[first:last:k], method
+
+        timeDataset = self.file[self.fileData.objectIdList[independentVariableRow]]
+        timeColumn = self.fileData.columnList[independentVariableRow]
+        if self.hasPyramid(variableName):
+            levels = _pyramidLevels(self.file['Pyramid'][series.name.split('/')[-1]])
+        else:
+            levels = []
+        column = self.fileData.columnList[variableRowIndex]
+        nRows = dataset.shape[0]
+        first = 0 if tStart is None else max(_findRow(levels, timeDataset, timeColumn, nRows, tStart, 'left') - 1, 0)
+        last = nRows if tStop is None else min(_findRow(levels, timeDataset, timeColumn, nRows, tStop, 'right') + 1, nRows)
+        last = max(first, last)
+
+        if nPoints is None or last - first <= nPoints:
+            t = timeDataset[first:last, timeColumn]
+            y = dataset[first:last, column]
+        elif len(levels) == 0:
+            # No downsampled data: every k-th row (a strided selection is slower in HDF5 than reading all rows)
+            k = int(math.ceil(float(last - first) / max(nPoints, 1)))
+            t = timeDataset[first:last, timeColumn][::k]
+            y = dataset[first:last, column][::k]
+        else:
+            # Finest level with at most nPoints points (two per bin)
+            for rowsPerBin, level in levels:
+                firstBin = first / rowsPerBin
+                lastBin = (last + rowsPerBin - 1) / rowsPerBin
+                if 2 * (lastBin - firstBin) <= nPoints:
+                    break
+            categoryGroup = level[dataset.name.split('/')[-1]]
+            time = level['time'][firstBin:lastBin, :]
+            yMin = categoryGroup['min'][firstBin:lastBin, column:column + 1]
+            yMax = categoryGroup['max'][firstBin:lastBin, column:column + 1]
+            if 'minFirst' in categoryGroup:
+                minFirst = categoryGroup['minFirst'][firstBin:lastBin, column:column + 1]
+            else:
+                # Pyramid of an older file without the order of the extrema
+                minFirst = numpy.ones(yMin.shape, dtype=bool)
+            k = int(math.ceil(2.0 * (lastBin - firstBin) / max(nPoints, 1)))
+            if k > 1:
+                # Even the coarsest level has too many bins: merge k bins
+                index = numpy.arange(0, lastBin - firstBin, k)
+                time = numpy.column_stack((time[index, 0], time[numpy.minimum(index + k, lastBin - firstBin) - 1, 1]))
+                yMin, yMax, minFirst = _mergeBins(yMin, yMax, minFirst, k)
+            # The extremum of a bin that comes first is placed at its first time instant, the other one at its last one
+            yMin = yMin[:, 0]
+            yMax = yMax[:, 0]
+            minFirst = minFirst[:, 0]
+            t = time.ravel()
+            y = numpy.column_stack((numpy.where(minFirst, yMin, yMax), numpy.where(minFirst, yMax, yMin))).ravel()
+        if self.fileData.negatedList[variableRowIndex] == 1:
+            y = -y
+        return t, y, method
+
+    def readDataSince(self, variableName, startRow):
+        ''' Reads numerical data like readData, but only the rows from startRow on.
+            t and y are None, if there are no such rows.
+        '''
 
         if not self.readable:
             return None, None, None
 
 
         self.readVariableList()
-        variableRowIndex = self.fileData.nameList.index(variableName)
-        seriesOfVariable = self.file[self.fileData.objectIdList[variableRowIndex]].parent.ref
-        method = self.file[seriesOfVariable].attrs["interpolationMethod"]
+        variableRowIndex = self.fileData.nameIndex.get(variableName)
+        if variableRowIndex is None:
+            return None, None, None
+        dataset = self.file[self.fileData.objectIdList[variableRowIndex]]
+        series = dataset.parent
+        method = series.attrs["interpolationMethod"]
+        # Take the rows of the values and the time before reading, so that t and y have the same length,
+        # although the rows of a series are appended to its categories one after the other
+        rows = self._getRows(variableName, dataset)
+        independentVariableRow = series.attrs["independentVariableRow"]
+        if independentVariableRow > -1:
+            timeName = self.fileData.nameList[independentVariableRow]
+            timeDataset = self.file[self.fileData.objectIdList[independentVariableRow]]
+            timeRows = rows if timeDataset.name == dataset.name else self._getRows(timeName, timeDataset)
+            stopRow = min(_numberOfRows(rows), _numberOfRows(timeRows))
+        else:
+            stopRow = None
+        y = self._readColumns(variableName, dataset, [self.fileData.columnList[variableRowIndex]], startRow, rows, stopRow)
+        t = None
+        if y is not None:
+            y = y[:, 0]
+            if self.fileData.negatedList[variableRowIndex] == 1:
+                y = -y
+            if independentVariableRow > -1:
+                t = self._readColumns(timeName, timeDataset, [self.fileData.columnList[independentVariableRow]], startRow, timeRows, stopRow)
+                if t is not None:
+                    t = t[:, 0]
+        return t, y, method
+
+    def readDataMulti(self, variableNames, startRow=0):
+        ''' Reads numerical data from file for several variables given by the list of String-names variableNames.
+            Each dataset is read only once for all requested columns and the independent variable
+            is read only once for each time series. Only the rows from startRow on are returned.
+
+            Output: List of tuples (t, y, method, names), one tuple for each time series:
+               t        numpy-array       Values of independent variable (normally time)
+               y        numpy-array       2-dim. array, column k holds the values of names[k]
+               method   String            Interpolation method, e.g. 'linear', 'constant' or 'clocked'
+               names    list of Strings   Names of the variables in the columns of y
+            Variables that are not in the file are ignored.
+        '''
+        if not self.readable:
+            return []
+
+        self.readVariableList()
+        # Group the variables by series and datasets
+        allSeries = collections.OrderedDict()
+        for variableName in variableNames:
+            variableRowIndex = self.fileData.nameIndex.get(variableName)
+            if variableRowIndex is None:
+                continue
+            dataset = self.file[self.fileData.objectIdList[variableRowIndex]]
+            seriesDatasets = allSeries.setdefault(dataset.parent.name, collections.OrderedDict())
+            if dataset.name not in seriesDatasets:
+                seriesDatasets[dataset.name] = (dataset, [])
+            seriesDatasets[dataset.name][1].append((variableName, variableRowIndex))
+
+        result = []
+        for seriesName, seriesDatasets in allSeries.iteritems():
+            series = self.file[seriesName]
+            method = series.attrs["interpolationMethod"]
+            # Take the rows of all datasets of the series before reading (see readDataSince)
+            independentVariableRow = series.attrs["independentVariableRow"]
+            allRows = dict()
+            for datasetName, (dataset, variables) in seriesDatasets.iteritems():
+                allRows[datasetName] = self._getRows(variables[0][0], dataset)
+            if independentVariableRow > -1:
+                timeName = self.fileData.nameList[independentVariableRow]
+                timeDataset = self.file[self.fileData.objectIdList[independentVariableRow]]
+                if timeDataset.name not in allRows:
+                    allRows[timeDataset.name] = self._getRows(timeName, timeDataset)
+            stopRow = min(_numberOfRows(rows) for rows in allRows.itervalues())
+            names = []
+            yParts = []
+            for datasetName, (dataset, variables) in seriesDatasets.iteritems():
+                variableColumns = [self.fileData.columnList[k] for name, k in variables]
+                columns = sorted(set(variableColumns))
+                data = self._readColumns(variables[0][0], dataset, columns, startRow, allRows[datasetName], stopRow)
+                if data is None:
+                    continue
+                position = dict((column, k) for k, column in enumerate(columns))
+                y = data[:, [position[column] for column in variableColumns]]
+                signs = numpy.array([-1 if self.fileData.negatedList[k] == 1 else 1 for name, k in variables])
+                if (signs < 0).any():
+                    y = y * signs
+                yParts.append(y)
+                names.extend([name for name, k in variables])
+            if len(yParts) == 0:
+                continue
+            t = None
+            if independentVariableRow > -1:
+                timeData = self._readColumns(timeName, timeDataset, [self.fileData.columnList[independentVariableRow]],
+                                             startRow, allRows[timeDataset.name], stopRow)
+                if timeData is not None:
+                    t = timeData[:, 0]
+            y = yParts[0] if len(yParts) == 1 else numpy.hstack(yParts)
+            result.append((t, y, method, names))
+        return result
+
+    def _getRows(self, variableName, dataset):
+        ''' Returns the rows of dataset that contains the variable variableName as tuple
+            (rows in the dataset, list of buffers (data, rows), rows in the buffer, buffer), see Category.getRows.
+            When reading, all rows are in the dataset.
+        '''
         if self.access == 'write':
             scalar = self.modelVariable[variableName]
             seriesName = self.allSeries[scalar.seriesIndex].name
             categoryName = self.allCategories[scalar.categoryIndex]
-            category = self.results.series[seriesName].category[categoryName]
-            row = category.currentRow
-            _row = category._currentRow
-        else:
-            row = self.file[self.fileData.objectIdList[variableRowIndex]].shape[0]
-            _row = 0
-        if row > 0 or _row > 0:
-            variableColumn = self.fileData.columnList[variableRowIndex]
-            independentVariableRow = self.file[seriesOfVariable].attrs["independentVariableRow"]
-            if independentVariableRow > -1:
-                TimeRowIndex = independentVariableRow
-                timeColumn = self.fileData.columnList[TimeRowIndex]
-            else:
-                TimeRowIndex = None
-        y1 = None
-        t1 = None
-        if row > 0:
-            if self.fileData.negatedList[variableRowIndex] == 1:
-                y1 = -self.file[self.fileData.objectIdList[variableRowIndex]][:row, variableColumn]
-            else:
-                y1 = self.file[self.fileData.objectIdList[variableRowIndex]][:row, variableColumn]
-            if TimeRowIndex is not None:
-                t1 = self.file[self.fileData.objectIdList[TimeRowIndex]][:row, timeColumn]
-        y2 = None
-        t2 = None
-        if _row > 0:
-            y2 = category._data[0:_row, variableColumn]
-            if TimeRowIndex is not None:
-                timeName = self.fileData.nameList[TimeRowIndex]
-                scalar = self.modelVariable[timeName]
-                seriesName = self.allSeries[scalar.seriesIndex].name
-                categoryName = self.allCategories[scalar.categoryIndex]
-                category = self.results.series[seriesName].category[categoryName]
-                t2 = category._data[0:_row, timeColumn]
-        if y1 is None:
-            if y2 is None:
-                y = None
-            else:
-                y = y2
-        else:
-            if y2 is None:
-                y = y1
-            else:
-                y = numpy.concatenate((y1, y2))
-        if t1 is None:
-            if t2 is None:
-                t = None
+            return self.results.series[seriesName].category[categoryName].getRows()
+        return dataset.shape[0], [], 0, None
+
+    def _readColumns(self, variableName, dataset, columns, startRow=0, rows=None, stopRow=None):
+        ''' Returns the values in the given columns (sorted, unique) of dataset
+            that contains the variable variableName from row startRow on. When writing,
+            the rows that are not yet written to the file are appended.
+            rows is the result of _getRows (default: the current rows); only the rows
+            before stopRow are returned (default: all rows).
+        '''
+        if rows is None:
+            rows = self._getRows(variableName, dataset)
+        row, pending, _row, buffer = rows
+        if stopRow is not None:
+            # Cut off the rows from stopRow on
+            if row > stopRow:
+                row = stopRow
+            remaining = max(stopRow - row, 0)
+            truncated = []
+            for data, n in pending:
+                truncated.append((data, min(n, remaining)))
+                remaining -= truncated[-1][1]
+            pending = truncated
+            _row = min(_row, remaining)
+        parts = []
+        if row > startRow:
+            if len(columns) == 1:
+                parts.append(dataset[startRow:row, columns[0]:columns[0] + 1])
+            elif 2 * len(columns) > dataset.shape[1]:
+                # Reading complete rows is cheaper than a selection of many columns
+                parts.append(dataset[startRow:row, :][:, columns])
             else:
-                t = t2
+                parts.append(dataset[startRow:row, columns])
+        for data, n in pending:
+            if row + n > startRow:
+                parts.append(data[max(startRow - row, 0):n, columns])
+            row += n
+        if _row > 0 and row + _row > startRow:
+            parts.append(buffer[max(startRow - row, 0):_row, columns])
+        if len(parts) == 0:
+            return None
+        elif len(parts) == 1:
+            return parts[0]
         else:
-            if t2 is None:
-                t = t1
-            else:
-                t = numpy.concatenate((t1, t2))
-        return t, y, method
+            return numpy.concatenate(parts)
 
     def getResultAttributes(self):
         ''' Returns the HDF5 attributes of /Results
@@ -714,6 +1150,260 @@ class MTSF:
 
 
 
+def _numberOfRows(rows):
+    ''' Returns the total number of rows of the result of MTSF._getRows
+    '''
+    row, pending, _row, buffer = rows
+    return row + sum(n for data, n in pending) + _row
+
+
+def rechunk(fileName, newFileName=None, layout=None):
+    ''' Rewrites the datasets in /Results of the MTSF file fileName with the storage layout
+        given by layout (DatasetLayout, default: DatasetLayout()), e.g. to get column chunks
+        or another compression for files that were written with other settings.
+        The new file is newFileName; if newFileName is None, fileName is replaced.
+        Returns the file name of the new file.
+    '''
+    import os
+    import shutil
+    import tempfile
+
+    if layout is None:
+        layout = DatasetLayout()
+    if newFileName is None:
+        handle, targetName = tempfile.mkstemp(suffix='.mtsf', dir=os.path.dirname(os.path.abspath(fileName)))
+        os.close(handle)
+    else:
+        targetName = newFileName
+
+    source = h5py.File(fileName, 'r')
+    target = h5py.File(targetName, 'w', libver='latest')
+    try:
+        for name, value in source.attrs.items():
+            target.attrs[name] = value
+        for name in source.keys():
+            if name != 'Results':
+                source.copy(name, target)
+
+        # Copy the results dataset by dataset in blocks of complete chunks
+        bufferBytes = 67108864
+        results = target.create_group('Results')
+        for name, value in source['Results'].attrs.items():
+            results.attrs[name] = value
+        for seriesName, sourceSeries in source['Results'].iteritems():
+            series = results.create_group(seriesName)
+            for name, value in sourceSeries.attrs.items():
+                series.attrs[name] = value
+            fixedRows = sourceSeries.attrs['independentVariableRow'] < 0
+            for categoryName, sourceDataset in sourceSeries.iteritems():
+                nRows, nColumn = sourceDataset.shape
+                itemSize = sourceDataset.dtype.itemsize
+                chunks = layout.chunkShape(max(nRows, 1) if fixedRows else max(bufferBytes / (itemSize * max(nColumn, 1)), 1), nColumn, itemSize, fixedRows)
+                if nColumn == 0:
+                    chunks = None
+                dataset = series.create_dataset(categoryName, shape=sourceDataset.shape, dtype=sourceDataset.dtype, maxshape=(None, None),
+                                                compression=layout.compression, compression_opts=layout.compressionOptions(),
+                                                chunks=chunks, shuffle=layout.shuffle)
+                if chunks is None:
+                    blockRows, blockColumns = max(nRows, 1), max(nColumn, 1)
+                else:
+                    blockRows = chunks[0]
+                    blockColumns = max(bufferBytes / (itemSize * blockRows) / chunks[1], 1) * chunks[1]
+                for row in xrange(0, nRows, blockRows):
+                    for column in xrange(0, nColumn, blockColumns):
+                        dataset[row:row + blockRows, column:column + blockColumns] = sourceDataset[row:row + blockRows, column:column + blockColumns]
+
+        # Object references must point to the new datasets
+        if 'ModelDescription/Variables' in target:
+            variables = target['ModelDescription/Variables']
+            allData = variables[...]
+            for i in xrange(allData.shape[0]):
+                allData['objectId'][i, 0] = target[source[allData['objectId'][i, 0]].name].ref
+            variables[...] = allData
+    finally:
+        source.close()
+        target.close()
+
+    if newFileName is None:
+        shutil.copymode(fileName, targetName)
+        os.remove(fileName)
+        os.rename(targetName, fileName)
+        targetName = fileName
+    return targetName
+
+
+def buildPyramid(fileName, factor=16, minBins=1024):
+    ''' Stores downsampled data of the time series of the MTSF file fileName in /Pyramid,
+        so that long results can be plotted without reading all rows, see MTSF.readData.
+        For each time series with independent variable, there are levels 1, 2, ... with
+        factor**level rows per bin, as long as a level has at least minBins bins:
+          /Pyramid/<series>/<level>/time                 first and last value of the independent variable of each bin
+          /Pyramid/<series>/<level>/<category>/min, max  minimum and maximum of each column in each bin
+          /Pyramid/<series>/<level>/<category>/minFirst  True, if the minimum comes before the maximum in the bin
+        An existing /Pyramid is replaced.
+    '''
+    f = h5py.File(fileName, 'a')
+    try:
+        _buildPyramid(f, factor, minBins)
+    finally:
+        f.close()
+
+
+def _mergeBins(yMin, yMax, minFirst, factor):
+    ''' Merges each factor consecutive bins (rows) given by their minima yMin, maxima yMax and minFirst
+        (True, if the minimum of a bin comes before its maximum; None: single rows, i.e. yMin is yMax).
+        Returns the tuple (yMin, yMax, minFirst) of the merged bins.
+    '''
+    n, nColumn = yMin.shape
+    nBins = (n + factor - 1) / factor
+    if nBins * factor > n:
+        # Repeat the last bin; argmin and argmax return the first of equal values
+        pad = numpy.repeat(numpy.arange(n - 1, n), nBins * factor - n)
+        yMin = numpy.concatenate((yMin, yMin[pad, :]))
+        yMax = numpy.concatenate((yMax, yMax[pad, :]))
+        if minFirst is not None:
+            minFirst = numpy.concatenate((minFirst, minFirst[pad, :]))
+    yMin = yMin.reshape((nBins, factor, nColumn))
+    yMax = yMax.reshape((nBins, factor, nColumn))
+    iMin = yMin.argmin(axis=1)
+    iMax = yMax.argmax(axis=1)
+    bins = numpy.arange(nBins)[:, numpy.newaxis]
+    columns = numpy.arange(nColumn)
+    if minFirst is None:
+        first = iMin <= iMax
+    else:
+        # Within the same bin, the order of the finer level decides
+        first = (iMin < iMax) | ((iMin == iMax) & minFirst.reshape((nBins, factor, nColumn))[bins, iMin, columns])
+    return yMin[bins, iMin, columns], yMax[bins, iMax, columns], first
+
+
+def _pyramidLevels(seriesGroup):
+    ''' Returns the list of tuples (rowsPerBin, group) of the levels of a series in /Pyramid, finest first
+    '''
+    levels = [(group.attrs['rowsPerBin'], group) for group in seriesGroup.itervalues()]
+    levels.sort(key=lambda x: x[0])
+    return levels
+
 
+def _findRow(levels, timeDataset, timeColumn, nRows, value, side):
+    ''' Returns the first row with t >= value (side='left') or the number of rows with t <= value (side='right').
+        The bin containing the row is searched from the coarsest to the finest level of /Pyramid,
+        so that only the times of a few bins are read from each level. Without levels (or for
+        the rows of the finest bin), the rows are bisected by reading single values of the dataset.
+    '''
+    start = 0
+    stop = None
+    for i in xrange(len(levels) - 1, -1, -1):
+        rowsPerBin, level = levels[i]
+        times = level['time']
+        stop = times.shape[0] if stop is None else min(stop, times.shape[0])
+        if side == 'left':
+            # First bin whose last time is >= value
+            b = start + numpy.searchsorted(times[start:stop, 1], value, 'left')
+            if b >= stop:
+                return min(stop * rowsPerBin, nRows)
+        else:
+            # Last bin whose first time is <= value
+            b = start + numpy.searchsorted(times[start:stop, 0], value, 'right') - 1
+            if b < start:
+                return min(start * rowsPerBin, nRows)
+        # Bins of the next finer level (or rows) in bin b
+        factor = rowsPerBin / (levels[i - 1][0] if i > 0 else 1)
+        start = b * factor
+        stop = (b + 1) * factor
+    stop = nRows if stop is None else min(stop, nRows)
+    while stop - start > 4096:
+        middle = (start + stop) / 2
+        t = timeDataset[middle, timeColumn]
+        if t < value or (side == 'right' and t == value):
+            start = middle + 1
+        else:
+            stop = middle
+    t = timeDataset[start:stop, timeColumn]
+    return start + numpy.searchsorted(t, value, side)
 
 
+def _buildPyramid(f, factor=16, minBins=1024, bufferBytes=67108864, layout=None):
+    ''' Writes /Pyramid of the open MTSF file f, see buildPyramid.
+        The datasets are processed in blocks of about bufferBytes bytes.
+    '''
+    if layout is None:
+        layout = DatasetLayout()
+    if 'Pyramid' in f:
+        del f['Pyramid']
+    variables = f['ModelDescription/Variables']
+    pyramid = None
+    for seriesName, series in f['Results'].iteritems():
+        independentVariableRow = series.attrs['independentVariableRow']
+        if independentVariableRow < 0 or len(series) == 0:
+            continue
+        nRows = min(dataset.shape[0] for dataset in series.itervalues())
+        nLevels = 0
+        while (nRows + factor ** (nLevels + 1) - 1) / factor ** (nLevels + 1) >= minBins:
+            nLevels += 1
+        if nLevels == 0:
+            continue
+        timeDataset = f[variables['objectId', independentVariableRow, 0]]
+        timeColumn = variables['column', independentVariableRow, 0]
+
+        if pyramid is None:
+            pyramid = f.create_group('Pyramid')
+            pyramid.attrs['factor'] = factor
+        seriesGroup = pyramid.create_group(seriesName)
+        levels = []
+        for level in xrange(1, nLevels + 1):
+            rowsPerBin = factor ** level
+            nBins = (nRows + rowsPerBin - 1) / rowsPerBin
+            group = seriesGroup.create_group(str(level))
+            group.attrs['rowsPerBin'] = rowsPerBin
+            group.create_dataset('time', shape=(nBins, 2), dtype=numpy.float64)
+            for categoryName, dataset in series.iteritems():
+                categoryGroup = group.create_group(categoryName)
+                nColumn = dataset.shape[1]
+                chunks = layout.chunkShape(nBins, nColumn, dataset.dtype.itemsize, True) if nColumn > 0 else None
+                for name in ['min', 'max', 'minFirst']:
+                    categoryGroup.create_dataset(name, shape=(nBins, nColumn), dtype=bool if name == 'minFirst' else dataset.dtype,
+                                                 chunks=chunks, compression=layout.compression,
+                                                 compression_opts=layout.compressionOptions(), shuffle=layout.shuffle)
+            levels.append(group)
+
+        # Level 1 from the rows of the datasets, the other levels from the level below
+        for level, group in enumerate(levels):
+            if level == 0:
+                sources = [(categoryName, dataset, dataset, None) for categoryName, dataset in series.iteritems()]
+                sourceTime = None
+                n = nRows
+            else:
+                below = levels[level - 1]
+                sources = [(categoryName, below[categoryName]['min'], below[categoryName]['max'], below[categoryName]['minFirst'])
+                           for categoryName in series.keys()]
+                sourceTime = below['time']
+                n = below['time'].shape[0]
+            for categoryName, sourceMin, sourceMax, sourceMinFirst in sources:
+                nColumn = sourceMin.shape[1]
+                blockRows = max(bufferBytes / (sourceMin.dtype.itemsize * max(nColumn, 1)) / factor, 1) * factor
+                for row in xrange(0, n, blockRows):
+                    rows = min(blockRows, n - row)
+                    b = row / factor
+                    if nColumn > 0:
+                        if sourceMinFirst is None:
+                            # Rows of the datasets: minimum and maximum of a row are the same
+                            values = sourceMin[row:row + rows, :]
+                            yMin, yMax, minFirst = _mergeBins(values, values, None, factor)
+                        else:
+                            yMin, yMax, minFirst = _mergeBins(sourceMin[row:row + rows, :], sourceMax[row:row + rows, :],
+                                                              sourceMinFirst[row:row + rows, :], factor)
+                        group[categoryName]['min'][b:b + yMin.shape[0], :] = yMin
+                        group[categoryName]['max'][b:b + yMax.shape[0], :] = yMax
+                        group[categoryName]['minFirst'][b:b + minFirst.shape[0], :] = minFirst
+            for row in xrange(0, n, factor * 65536):
+                rows = min(factor * 65536, n - row)
+                index = numpy.arange(0, rows, factor)
+                lastIndex = numpy.minimum(index + factor, rows) - 1
+                if sourceTime is None:
+                    t = timeDataset[row:row + rows, timeColumn]
+                    time = numpy.column_stack((t[index], t[lastIndex]))
+                else:
+                    t = sourceTime[row:row + rows, :]
+                    time = numpy.column_stack((t[index, 0], t[lastIndex, 1]))
+                group['time'][row / factor:row / factor + len(index), :] = time
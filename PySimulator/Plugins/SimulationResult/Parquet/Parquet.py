@@ -0,0 +1,401 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Simulation results in Apache Parquet or Arrow IPC (file format) files.
+
+All time series of a result are stored in one table:
+  column '__series__'               index of the time series of the row
+  column '__independentVariable__'  independent variable (e.g. Time) of the row; null for constant series
+  further columns                   one column per stored signal; null in the rows of other series
+Each time series is written to its own row groups (record batches for Arrow files),
+so that the signals of a time series are read from its row groups only.
+Aliases share the column of their original variable. The description of all variables
+(ResultVariable and the file infos) is stored as JSON in the schema metadata (key 'pysimulator');
+unit, variability and description are also stored in the metadata of each column.
+'''
+
+import os
+import json
+import collections
+
+import numpy
+import pyarrow
+import pyarrow.parquet
+
+from Plugins.SimulationResult import IntegrationResults
+
+
+fileExtension = 'parquet'
+description = 'Apache Parquet Result File'
+
+seriesColumn = '__series__'
+independentColumn = '__independentVariable__'
+metadataKey = 'pysimulator'
+
+
+class WrongResultFile(Exception): pass
+
+
+def _toStr(x):
+    ''' Converts the unicode strings delivered by json to str (recursively)
+    '''
+    if isinstance(x, unicode):
+        return x.encode('utf-8')
+    if isinstance(x, list):
+        return [_toStr(y) for y in x]
+    if isinstance(x, collections.OrderedDict):
+        return collections.OrderedDict([(_toStr(key), _toStr(value)) for key, value in x.iteritems()])
+    return x
+
+
+def _toJson(value):
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    return value
+
+
+class Results(IntegrationResults.Results):
+    ''' Result object for a Parquet or Arrow IPC file written by writeResults.
+        The file is memory-mapped; only the columns and row groups of the requested
+        variables are read.
+    '''
+    def __init__(self, fileName):
+        IntegrationResults.Results.__init__(self)
+
+        self.fileName = fileName
+        self._file = None  # pyarrow.parquet.ParquetFile or pyarrow.RecordBatchFileReader
+        self._isParquet = True
+
+        if fileName is None:
+            return
+        if fileName is '':
+            return
+
+        # Determine complete file name
+        fullFileName = os.path.abspath(fileName)
+
+        with open(fullFileName, 'rb') as f:
+            magic = f.read(6)
+        source = pyarrow.memory_map(fullFileName, 'r')
+        if magic[:4] == 'PAR1':
+            self._file = pyarrow.parquet.ParquetFile(source)
+            schema = self._file.schema.to_arrow_schema()
+            nRowGroups = self._file.num_row_groups
+        elif magic == 'ARROW1':
+            self._isParquet = False
+            self._file = pyarrow.ipc.open_file(source)
+            schema = self._file.schema
+            nRowGroups = self._file.num_record_batches
+        else:
+            raise WrongResultFile("File " + fullFileName + " is neither a Parquet nor an Arrow file")
+
+        if schema.metadata is None or metadataKey not in schema.metadata:
+            raise WrongResultFile("File " + fullFileName + " does not contain PySimulator results")
+        info = _toStr(json.loads(schema.metadata[metadataKey], object_pairs_hook=collections.OrderedDict))
+        self._fieldNames = schema.names
+        self._seriesInfo = info['series']
+        self._variables = info['variables']
+        self._fileInfos = info['fileInfos']
+
+        # Row groups of each time series
+        self._rowGroups = [[] for x in self._seriesInfo]
+        self._rowGroupRows = [[] for x in self._seriesInfo]
+        seriesFieldIndex = self._fieldNames.index(seriesColumn)
+        for i in xrange(nRowGroups):
+            if self._isParquet:
+                rowGroup = self._file.metadata.row_group(i)
+                nRows = rowGroup.num_rows
+                statistics = rowGroup.column(seriesFieldIndex).statistics
+                if nRows > 0 and statistics is not None and statistics.has_min_max:
+                    seriesIndex = statistics.min
+                elif nRows > 0:
+                    seriesIndex = self._file.read_row_group(i, columns=[seriesColumn]).column(0).chunk(0)[0].as_py()
+                else:
+                    continue
+            else:
+                batch = self._file.get_batch(i)
+                nRows = batch.num_rows
+                if nRows == 0:
+                    continue
+                seriesIndex = batch.column(seriesFieldIndex)[0].as_py()
+            self._rowGroups[seriesIndex].append(i)
+            self._rowGroupRows[seriesIndex].append(nRows)
+
+        for series in self._seriesInfo:
+            self.timeSeries.append(IntegrationResults.TimeSeries(None, None, series['interpolationMethod']))
+        self.nTimeSeries = len(self.timeSeries)
+        self._independentVariable = [None] * self.nTimeSeries  # Cache of the independent variables
+
+        self.isAvailable = True
+
+    def _readColumns(self, seriesIndex, fieldIndices, startRow=0, stopRow=None):
+        ''' Returns a list with the values of the columns fieldIndices in the rows
+            startRow:stopRow of time series seriesIndex. Only the row groups
+            containing these rows are read.
+        '''
+        rowGroups = []
+        skip = startRow
+        row = 0
+        for rowGroup, nRows in zip(self._rowGroups[seriesIndex], self._rowGroupRows[seriesIndex]):
+            if stopRow is not None and row >= stopRow:
+                break
+            if len(rowGroups) == 0 and skip >= nRows:
+                skip -= nRows
+            else:
+                rowGroups.append(rowGroup)
+            row += nRows
+        if len(rowGroups) == 0:
+            return [numpy.zeros((0,)) for k in fieldIndices]
+
+        if self._isParquet:
+            table = self._file.read_row_groups(rowGroups, columns=[self._fieldNames[k] for k in fieldIndices])
+            columns = [table.column(i).chunks for i in xrange(len(fieldIndices))]
+        else:
+            # Arrays of memory-mapped record batches, no copies
+            batches = [self._file.get_batch(i) for i in rowGroups]
+            columns = [[batch.column(k) for batch in batches] for k in fieldIndices]
+
+        result = []
+        for chunks in columns:
+            arrays = [chunk.to_numpy() for chunk in chunks if len(chunk) > 0]
+            if len(arrays) == 1:
+                y = arrays[0]
+            else:
+                y = numpy.concatenate(arrays)
+            result.append(y[skip:] if stopRow is None else y[skip:skip + stopRow - startRow])
+        return result
+
+    def _readIndependentVariable(self, seriesIndex, startRow=0):
+        if not self._seriesInfo[seriesIndex]['independentVariable']:
+            return None
+        if self._independentVariable[seriesIndex] is None:
+            self._independentVariable[seriesIndex] = self._readColumns(seriesIndex, [self._fieldNames.index(independentColumn)])[0]
+        return self._independentVariable[seriesIndex][startRow:]
+
+    def _buildIndex(self):
+        index = dict()
+        for name, seriesIndex, fieldIndex, sign, unit, variability, value, infos in self._variables:
+            index[name] = (seriesIndex, fieldIndex, sign)
+        return index
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        if tStart is None and tStop is None:
+            return self.readDataSince(variableName, 0)
+        location = self.lookup(variableName)
+        if location is None:
+            return None, None, None
+        seriesIndex, fieldIndex, sign = location
+        method = self.timeSeries[seriesIndex].interpolationMethod
+        t = self._readIndependentVariable(seriesIndex)
+        first, last = IntegrationResults.rowRange(t, tStart, tStop)
+        y = self._readColumns(seriesIndex, [fieldIndex], first, last)[0]
+        if len(y) == 0:
+            return None, None, method
+        if sign < 0:
+            y = -y
+        if t is not None:
+            t = t[first:last]
+        return t, y, method
+
+    def readDataSince(self, variableName, startRow):
+        location = self.lookup(variableName)
+        if location is None:
+            return None, None, None
+        seriesIndex, fieldIndex, sign = location
+        method = self.timeSeries[seriesIndex].interpolationMethod
+        y = self._readColumns(seriesIndex, [fieldIndex], startRow)[0]
+        if len(y) == 0:
+            return None, None, method
+        if sign < 0:
+            y = -y
+        return self._readIndependentVariable(seriesIndex, startRow), y, method
+
+    def readDataMulti(self, variableNames, startRow=0):
+        groups = collections.OrderedDict()
+        for name in variableNames:
+            location = self.lookup(name)
+            if location is not None:
+                groups.setdefault(location[0], []).append((name, location[1], location[2]))
+
+        result = []
+        for seriesIndex, variables in groups.iteritems():
+            # Read each column once, also if it is shared by aliases
+            fieldIndices = list(collections.OrderedDict.fromkeys([x[1] for x in variables]))
+            columns = dict(zip(fieldIndices, self._readColumns(seriesIndex, fieldIndices, startRow)))
+            if len(columns[fieldIndices[0]]) == 0:
+                continue
+            y = numpy.column_stack([columns[x[1]] for x in variables])
+            signs = numpy.array([x[2] for x in variables])
+            if (signs < 0).any():
+                y = y * signs
+            t = self._readIndependentVariable(seriesIndex, startRow)
+            result.append((t, y, self.timeSeries[seriesIndex].interpolationMethod, [x[0] for x in variables]))
+        return result
+
+    def getVariables(self):
+        # Provide the complete time series (as for MTSF files), if they are not too large
+        for seriesIndex, series in enumerate(self.timeSeries):
+            if series.data is None:
+                fieldIndices = sorted(set([x[2] for x in self._variables if x[1] == seriesIndex]))
+                nRows = sum(self._rowGroupRows[seriesIndex])
+                if 0 < len(fieldIndices) and nRows * (fieldIndices[-1] + 1) <= 5000000:
+                    # The columns of data are the columns of the file (see ResultVariable.column)
+                    data = numpy.zeros((nRows, fieldIndices[-1] + 1))
+                    for k, y in zip(fieldIndices, self._readColumns(seriesIndex, fieldIndices)):
+                        data[:, k] = y
+                    series.data = data
+                    series.independentVariable = self._readIndependentVariable(seriesIndex)
+
+        variables = dict()
+        for name, seriesIndex, fieldIndex, sign, unit, variability, value, infos in self._variables:
+            variables[name] = IntegrationResults.ResultVariable(value, unit, variability, infos, seriesIndex, fieldIndex, sign)
+        return variables
+
+    def getFileInfos(self):
+        return self._fileInfos
+
+    def close(self):
+        # Release the memory-mapped file
+        self._file = None
+        self._independentVariable = [None] * self.nTimeSeries
+        for series in self.timeSeries:
+            series.data = None
+            series.independentVariable = None
+        self.isAvailable = False
+
+
+def writeResults(results, fileName, fileFormat=None, rowGroupBytes=67108864):
+    ''' Writes the simulation result results (instance of a class derived from
+        IntegrationResults.Results, e.g. of another plugin) to fileName.
+        fileFormat is 'parquet' or 'arrow' (Arrow IPC file format); if it is None,
+        the format is chosen by the extension of fileName ('.arrow' or otherwise Parquet).
+        The values of each time series are read at once and written in row groups of
+        about rowGroupBytes bytes.
+    '''
+    if fileFormat is None:
+        fileFormat = 'arrow' if fileName.lower().endswith('.arrow') else 'parquet'
+    if fileFormat not in ['parquet', 'arrow']:
+        raise ValueError("Unknown file format " + str(fileFormat))
+
+    variables = results.getVariables()
+    if variables is None:
+        variables = dict()
+    fileInfos = results.getFileInfos()
+    if fileInfos is None:
+        fileInfos = dict()
+    nSeries = max([results.nTimeSeries] + [x.seriesIndex + 1 for x in variables.itervalues()])
+
+    # One column for each column of a time series; it is named like the first of its variables
+    # (preferably one that is not negated), the other variables are stored as aliases
+    seriesColumns = [collections.OrderedDict() for i in xrange(nSeries)]
+    for name in sorted(variables.keys()):
+        variable = variables[name]
+        columns = seriesColumns[variable.seriesIndex]
+        if variable.column not in columns or (variable.sign > 0 and variables[columns[variable.column]].sign < 0):
+            columns[variable.column] = name
+
+    # Read the data of each time series
+    seriesData = []
+    for seriesIndex in xrange(nSeries):
+        names = [seriesColumns[seriesIndex][column] for column in sorted(seriesColumns[seriesIndex].keys())]
+        t, y, method = None, None, 'linear'
+        if seriesIndex < len(results.timeSeries):
+            method = results.timeSeries[seriesIndex].interpolationMethod
+        if len(names) > 0:
+            data = results.readDataMulti(names)
+            if len(data) > 0:
+                t, y, method, names = data[0]
+        seriesData.append((t, y, method, names))
+
+    # Schema
+    fields = [pyarrow.field(seriesColumn, pyarrow.int32()), pyarrow.field(independentColumn, pyarrow.float64())]
+    fieldIndex = dict()
+    for seriesIndex, (t, y, method, names) in enumerate(seriesData):
+        for k, name in enumerate(names):
+            variable = variables[name]
+            metadata = {'unit': variable.unit or '', 'variability': variable.variability or '',
+                        'description': variable.infos.get('Description', '') if variable.infos is not None else ''}
+            fieldIndex[name] = len(fields)
+            fields.append(pyarrow.field(name, pyarrow.from_numpy_dtype(y.dtype), metadata=metadata))
+
+    variableList = []
+    for name in sorted(variables.keys()):
+        variable = variables[name]
+        if variable.seriesIndex >= len(seriesData):
+            continue
+        names = seriesData[variable.seriesIndex][3]
+        if variable.column not in seriesColumns[variable.seriesIndex]:
+            continue
+        original = seriesColumns[variable.seriesIndex][variable.column]
+        if original not in names:
+            continue
+        sign = variable.sign * variables[original].sign
+        variableList.append([name, variable.seriesIndex, fieldIndex[original], sign, variable.unit, variable.variability,
+                             _toJson(variable.value), variable.infos])
+    info = collections.OrderedDict()
+    info['series'] = [collections.OrderedDict([('interpolationMethod', x[2]), ('independentVariable', x[0] is not None)]) for x in seriesData]
+    info['variables'] = variableList
+    info['fileInfos'] = fileInfos
+    schema = pyarrow.schema(fields, metadata={metadataKey: json.dumps(info)})
+
+    # Write each time series in its own row groups
+    if fileFormat == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(fileName, schema, use_dictionary=False)
+    else:
+        sink = pyarrow.OSFile(fileName, 'wb')
+        writer = pyarrow.RecordBatchFileWriter(sink, schema)
+    try:
+        for seriesIndex, (t, y, method, names) in enumerate(seriesData):
+            if y is None:
+                continue
+            nRows = y.shape[0]
+            columnIndex = dict([(name, k) for k, name in enumerate(names)])
+            blockRows = max(rowGroupBytes / (8 * (len(names) + 2)), 1)
+            for row in xrange(0, nRows, blockRows):
+                n = min(blockRows, nRows - row)
+                nulls = dict()  # Null columns of the other series (one per data type)
+                arrays = []
+                for field in fields:
+                    if field.name == seriesColumn:
+                        arrays.append(pyarrow.array(numpy.ones((n,), dtype=numpy.int32) * seriesIndex))
+                    elif field.name == independentColumn and t is not None:
+                        arrays.append(pyarrow.array(numpy.asarray(t[row:row + n], dtype=numpy.float64)))
+                    elif field.name in columnIndex:
+                        arrays.append(pyarrow.array(numpy.ascontiguousarray(y[row:row + n, columnIndex[field.name]])))
+                    else:
+                        if field.type not in nulls:
+                            nulls[field.type] = pyarrow.array(numpy.zeros((n,), dtype=field.type.to_pandas_dtype()),
+                                                              mask=numpy.ones((n,), dtype=bool), type=field.type)
+                        arrays.append(nulls[field.type])
+                batch = pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+                if fileFormat == 'parquet':
+                    writer.write_table(pyarrow.Table.from_batches([batch]), row_group_size=n)
+                else:
+                    writer.write_batch(batch)
+    finally:
+        writer.close()
+        if fileFormat == 'arrow':
+            sink.close()
+    return fileName
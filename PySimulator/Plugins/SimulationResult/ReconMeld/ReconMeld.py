@@ -115,13 +115,22 @@ class Results(IntegrationResults.Results):
             self._name[i] = x
 
 
-    def readData(self, variableName):
-        nameIndex = self.tid[variableName][1]
-        if nameIndex < 0:
+    def _buildIndex(self):
+        index = dict()
+        for name, (i, col) in self.tid.iteritems():
+            index[name] = (i, col, 1)
+        return index
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        location = self.lookup(variableName)
+        if location is None:
             return None, None, None
-        i = self.tid[variableName][0]
-        y = self.timeSeries[i].data[:,nameIndex]
+        i, nameIndex, sign = location
         t = self.timeSeries[i].independentVariable
+        first, last = IntegrationResults.rowRange(t, tStart, tStop)
+        y = self.timeSeries[i].data[first:last, nameIndex]
+        if t is not None:
+            t = t[first:last]
         method = self.timeSeries[i].interpolationMethod
 
         return t, y, method
@@ -42,7 +42,7 @@ class Results(IntegrationResults.Results):
         0.2;20.0;4.0290389058209473e-3;0.7823794579232536e-1
 
     '''
-    def __init__(self, fileName):
+    def __init__(self, fileName, progress=None):
         IntegrationResults.Results.__init__(self)
 
         self.fileName = fileName  # File name of result file
@@ -63,23 +63,22 @@ class Results(IntegrationResults.Results):
 
         # Load main data
         csvfile = open(self.fileName, 'rb')
-        reader = csv.reader(csvfile, delimiter=';')
+        reader = csv.reader([csvfile.readline(), csvfile.readline()], delimiter=';')
         self._name = reader.next()  # first row contains the variable names
         self._unit = reader.next()  # second row contains the units
-        data = numpy.loadtxt(csvfile, delimiter=';')
+        data = IntegrationResults.loadCsvData(csvfile, ';', progress=progress, nColumns=len(self._name))
         csvfile.close()
         self.fileInfo['Rows'] = str(data.shape[0])
         self.fileInfo['Columns'] = str(data.shape[1])
 
         self._isParameter = len(self._name) * [False]
-        if numpy.ndim(data) > 1:
+        if data.shape[1] > 1:
             self.timeSeries.append(IntegrationResults.TimeSeries(data[:, 0], data[:, 1:], "linear"))
 
             self._name = self._name[1:]  # delete 'Time'
             self._unit = self._unit[1:]  # delete unit of 'Time'
             self._isParameter = self._isParameter[1:]  # delete isParameter of 'Time'
         else:
-            data = numpy.reshape(data, (len(data), 1))
             self.timeSeries.append(IntegrationResults.TimeSeries(data, data, "linear"))
 
 
@@ -92,15 +91,13 @@ class Results(IntegrationResults.Results):
 
 
         if parameterFileExists:
-            reader = csv.reader(csvfile, delimiter=';')
+            reader = csv.reader([csvfile.readline(), csvfile.readline()], delimiter=';')
             name2 = reader.next()  # first row contains the variable names
             unit2 = reader.next()  # second row contains the units
-            data = numpy.loadtxt(csvfile, delimiter=';')
+            data = IntegrationResults.loadCsvData(csvfile, ';', nColumns=len(name2))
             csvfile.close()
 
-            if len(numpy.shape(data)) == 0:
-                data = numpy.array([data])
-            data = numpy.reshape(data, (1, len(data)))
+            data = numpy.reshape(data, (1, data.size))
             self.timeSeries.append(IntegrationResults.TimeSeries(None, data, "constant"))
             self._isParameter.extend(len(name2) * [True])
             self._name.extend(name2)
@@ -151,18 +148,30 @@ class Results(IntegrationResults.Results):
             self._name[i] = x
 
 
-    def readData(self, variableName):
-        nameIndex = self._name.index(variableName)
-        if nameIndex < 0:
+    def _buildIndex(self):
+        index = dict()
+        nContinuous = self.timeSeries[0].data.shape[1] if len(self.timeSeries) > 0 else 0
+        for i in xrange(len(self._name) - 1, -1, -1):
+            if self._isParameter[i]:
+                index[self._name[i]] = (1, i - nContinuous, 1)
+            else:
+                index[self._name[i]] = (0, i, 1)
+        return index
+
+    def readData(self, variableName, tStart=None, tStop=None):
+        location = self.lookup(variableName)
+        if location is None:
             return None, None, None
-        if self._isParameter[nameIndex]:
-            y = numpy.array([self.timeSeries[1].data[0, nameIndex - self.timeSeries[0].data.shape[1]]])
-            i = 1
+        i, column, sign = location
+        t = self.timeSeries[i].independentVariable
+        first, last = IntegrationResults.rowRange(t, tStart, tStop)
+        if i == 1:
+            y = numpy.array([self.timeSeries[1].data[0, column]])
         else:
-            y = self.timeSeries[0].data[:, nameIndex]
-            i = 0
+            y = self.timeSeries[0].data[first:last, column]
+        if t is not None:
+            t = t[first:last]
 
-        t = self.timeSeries[i].independentVariable
         method = self.timeSeries[i].interpolationMethod
 
         return t, y, method
@@ -133,12 +133,21 @@ class Results(IntegrationResults.Results):
 			if x == '-':
 				self._unit[i] = None
 
-	def readData(self, variableName):
-		nameIndex = self._name.index(variableName)
-		if nameIndex < 0:
+	def _buildIndex(self):
+		index = dict()
+		for col in xrange(len(self._name) - 1, -1, -1):
+			index[self._name[col]] = (0, col, 1)
+		return index
+
+	def readData(self, variableName, tStart=None, tStop=None):
+		location = self.lookup(variableName)
+		if location is None:
 			return None, None, None
-		y = self.timeSeries[0].data[:, nameIndex]
 		t = self.timeSeries[0].independentVariable
+		first, last = IntegrationResults.rowRange(t, tStart, tStop)
+		y = self.timeSeries[0].data[first:last, location[1]]
+		if t is not None:
+			t = t[first:last]
 		method = self.timeSeries[0].interpolationMethod
 
 		return t, y, method
@@ -110,6 +110,61 @@ class FMIScalarVariable:
         self.variability = 'continuous'
         self.causality = None
         self.alias = None
+        self.directDependency = None
+        self.initial = None  # FMI 2.0 only
+        self.derivative = None  # FMI 2.0 only: index (starting at 1) of the variable, whose derivative this variable is
+
+
+class FMIImplementation:
+    ''' Class for the attributes of the ModelExchange or CoSimulation element
+        of an FMI 2.0 model description
+    '''
+    def __init__(self, element):
+        self.modelIdentifier = element.get('modelIdentifier')
+        self.needsExecutionTool = element.get('needsExecutionTool') == 'true'
+        self.canBeInstantiatedOnlyOncePerProcess = element.get('canBeInstantiatedOnlyOncePerProcess') == 'true'
+        self.canNotUseMemoryManagementFunctions = element.get('canNotUseMemoryManagementFunctions') == 'true'
+        self.canGetAndSetFMUstate = element.get('canGetAndSetFMUstate') == 'true'
+        self.canSerializeFMUstate = element.get('canSerializeFMUstate') == 'true'
+        self.providesDirectionalDerivative = element.get('providesDirectionalDerivative') == 'true'
+        self.completedIntegratorStepNotNeeded = element.get('completedIntegratorStepNotNeeded') == 'true'  # ModelExchange only
+        # CoSimulation only
+        self.canHandleVariableCommunicationStepSize = element.get('canHandleVariableCommunicationStepSize') == 'true'
+        self.canInterpolateInputs = element.get('canInterpolateInputs') == 'true'
+        self.maxOutputDerivativeOrder = int(element.get('maxOutputDerivativeOrder', '0'))
+        self.canRunAsynchronuously = element.get('canRunAsynchronuously') == 'true'
+
+
+class FMIUnknown:
+    ''' Class for an Unknown of the ModelStructure of an FMI 2.0 model description
+    '''
+    def __init__(self, unknown, scalarVariableNames):
+        self.index = int(unknown.get('index'))  # Index (starting at 1) in ModelVariables
+        self.name = scalarVariableNames[self.index - 1]
+        dependencies = unknown.get('dependencies')
+        if dependencies is None:
+            # The unknown may depend on all knowns
+            self.dependencies = None
+        else:
+            self.dependencies = [int(x) for x in dependencies.split()]
+        dependenciesKind = unknown.get('dependenciesKind')
+        if dependenciesKind is None:
+            self.dependenciesKind = None
+        else:
+            self.dependenciesKind = dependenciesKind.split()
+
+
+class FMIModelStructure:
+    ''' Class for the ModelStructure of an FMI 2.0 model description.
+        outputs, derivatives and initialUnknowns are lists of FMIUnknown,
+        states is the list of the names of the continuous states
+        in the order of the derivatives.
+    '''
+    def __init__(self):
+        self.outputs = []
+        self.derivatives = []
+        self.initialUnknowns = []
+        self.states = []
 
 
 class FMIDescription:
@@ -126,6 +181,7 @@ class FMIDescription:
         self.units = {}
         self.types = {}
         self.scalarVariables = {}
+        self.scalarVariableNames = []  # Names of the scalar variables in the order of the XML-file
         self.fmiVersion = ''
         self.modelName = ''
         self.modelIdentifier = ''
@@ -141,6 +197,13 @@ class FMIDescription:
         self.defaultStartTime = 0
         self.defaultStopTime = 1
         self.defaultTolerance = 1e-4
+        # FMI 2.0 only
+        self.copyright = ''
+        self.license = ''
+        self.modelExchange = None  # FMIImplementation
+        self.coSimulation = None  # FMIImplementation
+        self.modelStructure = FMIModelStructure()
+        self.logCategories = []
 
         if xmlFile is None:
             return
@@ -158,10 +221,8 @@ class FMIDescription:
         for desc in self._docroot.keys():
             if desc == 'fmiVersion':
                 self.fmiVersion = self._docroot.get(desc)
-                if self.fmiVersion != '1.0':
-                    '''According to latest standard only version 1.0 is supported
-                    '''
-                    raise FMUError.FMUError('Only FMI v1.0 supported!\n')
+                if self.fmiVersion not in ['1.0', '2.0']:
+                    raise FMUError.FMUError('Only FMI v1.0 and v2.0 supported!\n')
             elif desc == 'modelName':
                 self.modelName = self._docroot.get(desc)
             elif desc == 'modelIdentifier':
@@ -184,9 +245,14 @@ class FMIDescription:
                 self.numberOfContinuousStates = int(self._docroot.get(desc))
             elif desc == 'numberOfEventIndicators':
                 self.numberOfEventIndicators = int(self._docroot.get(desc))
+            elif desc == 'copyright':
+                self.copyright = self._docroot.get(desc)
+            elif desc == 'license':
+                self.license = self._docroot.get(desc)
             else:
                 print('unrecognized model description:\t %s: %s \n' % (desc, self._docroot.get(desc)))
         ''' Child nodes are each parsed by their own subroutine '''
+        modelStructure = None
         for child in self._docroot:
             if child.tag == 'UnitDefinitions':
                 self._parseUnits(child)
@@ -198,9 +264,30 @@ class FMIDescription:
                 self._parseDefaultExperiment(child)
             elif child.tag == 'ModelVariables':
                 self._parseModelVariables(child)
+            elif child.tag == 'ModelExchange':
+                self.modelExchange = FMIImplementation(child)
+            elif child.tag == 'CoSimulation':
+                self.coSimulation = FMIImplementation(child)
+            elif child.tag == 'LogCategories':
+                self.logCategories = [category.get('name') for category in child.findall('Category')]
+            elif child.tag == 'ModelStructure':
+                modelStructure = child
             else:
                 print('Unknown tag in FMI Model: %s\n' % child.tag)
 
+        if self.fmiVersion == '2.0':
+            ''' The model identifier and the number of states are not attributes of fmiModelDescription in FMI 2.0.
+                modelIdentifier is the one of Model Exchange, if it is supported, and otherwise the one of Co-Simulation.
+            '''
+            if self.modelExchange is not None:
+                self.modelIdentifier = self.modelExchange.modelIdentifier
+            elif self.coSimulation is not None:
+                self.modelIdentifier = self.coSimulation.modelIdentifier
+            else:
+                raise FMUError.FMUError('FMU supports neither Model Exchange nor Co-Simulation!\n')
+            self._parseModelStructure(modelStructure)
+            self.numberOfContinuousStates = len(self.modelStructure.derivatives)
+
     def _parseModelVariables(self, varRoot):
         ''' Parse Model Variables
             @type varRoot: ElemenTree Element holding Model Variable definitions
@@ -224,15 +311,65 @@ class FMIDescription:
             s = FMIScalarVariable(type, reference)
             s.description = scalar.get('description')
             s.variability = scalar.get('variability', 'continuous')
-            s.causality = scalar.get('causality')
-            s.alias = scalar.get('alias')
-            s.directDependency = True if scalar.find('DirectDependency') is not None else False
+            if self.fmiVersion == '2.0':
+                s.causality = scalar.get('causality', 'local')
+                s.initial = scalar.get('initial')
+                if scalar[0].get('derivative') is not None:
+                    s.derivative = int(scalar[0].get('derivative'))
+            else:
+                s.causality = scalar.get('causality')
+                s.alias = scalar.get('alias')
+                s.directDependency = True if scalar.find('DirectDependency') is not None else False
             self.scalarVariables[scalarName] = s
+            self.scalarVariableNames.append(scalarName)
+
+        if self.fmiVersion == '2.0':
+            self._setAliases()
+
+    def _setAliases(self):
+        ''' FMI 2.0 has no alias attribute: variables of the same base type with the same value reference
+            are aliases. The first of these variables is marked as 'noAlias', the others as 'alias'
+            like in FMI 1.0. Enumerations have the same value references as Integers.
+        '''
+        origins = set()
+        for name in self.scalarVariableNames:
+            s = self.scalarVariables[name]
+            baseType = 'Integer' if s.type.type == 'Enumeration' else s.type.type
+            if (baseType, s.valueReference) in origins:
+                s.alias = 'alias'
+            else:
+                s.alias = 'noAlias'
+                origins.add((baseType, s.valueReference))
+
+    def _parseModelStructure(self, structureRoot):
+        ''' Parse the ModelStructure of FMI 2.0
+            @type structureRoot: ElemenTree Element holding the ModelStructure or None
+        '''
+        if structureRoot is None:
+            return
+        for child in structureRoot:
+            unknowns = [FMIUnknown(unknown, self.scalarVariableNames) for unknown in child.findall('Unknown')]
+            if child.tag == 'Outputs':
+                self.modelStructure.outputs = unknowns
+            elif child.tag == 'Derivatives':
+                self.modelStructure.derivatives = unknowns
+            elif child.tag == 'InitialUnknowns':
+                self.modelStructure.initialUnknowns = unknowns
+            else:
+                print('Unknown tag in ModelStructure: %s\n' % child.tag)
+        for derivative in self.modelStructure.derivatives:
+            state = self.scalarVariables[derivative.name].derivative
+            if state is None:
+                raise FMUError.FMUError('Derivative ' + derivative.name + ' without derivative attribute.\n')
+            self.modelStructure.states.append(self.scalarVariableNames[state - 1])
 
     def _parseUnits(self, unitsRoot):
         ''' Parse Unit descriptions.
             @param unitsRoot: ElemenTree Element holding unit definitions
         '''
+        if self.fmiVersion == '2.0':
+            self._parseUnits2(unitsRoot)
+            return
         for unit in unitsRoot:
             if unit.tag != 'BaseUnit':
                 ''' According to definition this may only be BaseUnit '''
@@ -253,6 +390,22 @@ class FMIDescription:
                 displayUnit = displayUnitDef.get('displayUnit', '')
                 self.units[unitName][displayUnit] = DISPLAYUnit(gain, offset)
 
+    def _parseUnits2(self, unitsRoot):
+        ''' Parse Unit descriptions of FMI 2.0 into the same dictionary as for FMI 1.0.
+            The factor of a DisplayUnit is the gain of DISPLAYUnit.
+            @param unitsRoot: ElemenTree Element holding unit definitions
+        '''
+        for unit in unitsRoot:
+            if unit.tag != 'Unit':
+                raise FMUError.FMUError('Unknown unit type: ' + unit.tag + '\n')
+            unitName = unit.get('name')
+            self.units[unitName] = dict()
+            for displayUnitDef in unit.findall('DisplayUnit'):
+                gain = displayUnitDef.get('factor', '1')
+                offset = displayUnitDef.get('offset', '0')
+                displayUnit = displayUnitDef.get('name', '')
+                self.units[unitName][displayUnit] = DISPLAYUnit(gain, offset)
+
     def _parseDefaultExperiment(self, child):
         self.defaultStartTime = child.get('startTime')
         self.defaultStopTime = child.get('stopTime')
@@ -266,12 +419,27 @@ class FMIDescription:
             According to standard, type has one and only one child. It can therefore be accessed safely by type[0]
         '''
         for type in typesRoot:
-            if type.tag != 'Type':
-                ''' The current FMI definition only knows type Type '''
+            if type.tag != ('SimpleType' if self.fmiVersion == '2.0' else 'Type'):
+                ''' The current FMI definition only knows type Type (SimpleType in FMI 2.0) '''
                 raise FMUError.FMUError('TypeDefinitions defining non-type.\n')
             if len(type) != 1:
-                raise FMUError.FMUError('Bad type description for: ' + type + '\n')
+                raise FMUError.FMUError('Bad type description for: ' + type.get('name') + '\n')
             self.types[type.get('name')] = FMIType(type[0])
+            if self.fmiVersion == '2.0':
+                self.types[type.get('name')].description = type.get('description')
+
+
+def getFmiVersion(xmlFile):
+    ''' Returns the fmiVersion of an XML-file with a model description
+        without parsing the whole file.
+        @param xmlFile: File object of the describing XML-Document
+    '''
+    try:
+        for event, element in etree.iterparse(xmlFile, events=('start',)):
+            return element.get('fmiVersion')
+    except BaseException as e:
+        raise FMUError.FMUError('Error when parsing FMU\'s xml-file.\n' + str(e) + '\n')
+    return None
 
 
 if __name__ == '__main__':
@@ -34,14 +34,18 @@ EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import _ctypes
 import ctypes
 from ctypes.util import find_library
+import os
 import platform
 import re
+import shutil
 import tempfile
+import urllib
+import urlparse
 import zipfile
 
 import numpy
 
-from FMIDescription import FMIDescription
+from FMIDescription import FMIDescription, getFmiVersion
 import FMUError
 
 
@@ -70,13 +74,25 @@ def createfmiRealVector(n):
 
 
 def createfmiIntegerVector(n):
-    return (numpy.ndarray(n, numpy.int))
+    return (numpy.ndarray(n, numpy.int32))
 
 
 def createfmiBooleanVector(n):
     return (numpy.ndarray(n, numpy.bool))
 
 
+def _checkVector(out, n, dtype):
+    ''' Raises an exception, if out is not a contiguous numpy vector of n values of type dtype,
+        so that it cannot be filled by the fmiGet functions of the model
+    '''
+    if not isinstance(out, numpy.ndarray) or out.dtype != dtype:
+        raise TypeError('out must be a numpy array of type ' + numpy.dtype(dtype).name)
+    if not out.flags.c_contiguous:
+        raise ValueError('out must be C contiguous')
+    if out.shape != (n,):
+        raise IndexError('length of out not corresponding to the number of values')
+
+
 def createfmiStringVector(n):
     return (fmiString * n)()
 
@@ -102,6 +118,68 @@ class _fmiCallbackFunctions(ctypes.Structure):
     _fields_ = [('logger', Logger), ('allocateMemory', AllocateMemory), ('freeMemory', FreeMemory)]
 
 
+def _cFunction(prototype, function):
+    ''' Returns a function pointer of type prototype to the C-function of a library.
+        The address is used directly, since a callback via Python would truncate
+        the pointers returned by calloc to the default result type int.
+    '''
+    return prototype(ctypes.cast(function, ctypes.c_void_p).value)
+
+
+''' Declaration of file-type correspondents for FMI 2.0
+    The mapping is done according to file: fmi2TypesPlatform.h and fmi2FunctionTypes.h
+'''
+fmi2False = 0
+fmi2True = 1
+fmi2Boolean = ctypes.c_int
+fmi2BooleanVector = ctypes.POINTER(fmi2Boolean)
+fmi2ModelExchange = 0
+fmi2CoSimulation = 1
+fmi2DoStepStatus = 0
+fmi2PendingStatus = 1
+fmi2LastSuccessfulTime = 2
+fmi2Terminated = 3
+
+
+def createfmi2BooleanVector(n):
+    return (numpy.ndarray(n, numpy.int32))
+
+
+class fmi2EventInfo(ctypes.Structure):
+    _fields_ = [('newDiscreteStatesNeeded', fmi2Boolean),
+                ('terminateSimulation', fmi2Boolean),
+                ('nominalsOfContinuousStatesChanged', fmi2Boolean),
+                ('valuesOfContinuousStatesChanged', fmi2Boolean),
+                ('nextEventTimeDefined', fmi2Boolean),
+                ('nextEventTime', fmiReal)]
+
+Logger2 = ctypes.CFUNCTYPE(None, ctypes.c_void_p, fmiString, fmiStatus, fmiString, fmiString)
+AllocateMemory2 = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t)
+StepFinished2 = ctypes.CFUNCTYPE(None, ctypes.c_void_p, fmiStatus)
+class _fmi2CallbackFunctions(ctypes.Structure):
+    _fields_ = [('logger', Logger2), ('allocateMemory', AllocateMemory2), ('freeMemory', FreeMemory),
+                ('stepFinished', StepFinished2), ('componentEnvironment', ctypes.c_void_p)]
+
+
+def createFMUInterface(fileName, parent=None, loggingOn=True, fmuType=None):
+    ''' Returns an FMUInterface for an FMU of FMI 1.0 or an FMUInterface2
+        for an FMU of FMI 2.0, depending on the fmiVersion in the FMU's model description
+        @param fileName: complete path and name of FMU-file (.fmu)
+        @param fmuType: fmi2ModelExchange or fmi2CoSimulation for FMI 2.0, see FMUInterface2
+    '''
+    try:
+        fmuFile = zipfile.ZipFile(fileName, 'r')
+        fmiVersion = getFmiVersion(fmuFile.open('modelDescription.xml'))
+        fmuFile.close()
+    except FMUError.FMUError:
+        raise
+    except BaseException as e:
+        raise FMUError.FMUError('Error when reading modelDescription.xml\n' + str(e) + '\n')
+    if fmiVersion == '2.0':
+        return FMUInterface2(fileName, parent, loggingOn, fmuType)
+    return FMUInterface(fileName, parent, loggingOn)
+
+
 
 class FMUInterface:
     ''' This class encapsulates the FMU C-Interface
@@ -135,13 +213,44 @@ class FMUInterface:
             raise FMUError.FMUError('Error when reading modelDescription.xml\n' + str(e) + '\n')
         self.description = FMIDescription(xmlFileName, self)
 
-        ''' Just a little sanity check - standard definition says file name and FMU-name have to be the same '''
-        if re.match(r'.*/(.*?).fmu$', fileName).group(1) != self.description.modelIdentifier:
+        ''' Just a little sanity check - standard definition says file name and FMU-name have to be the same
+            (only in FMI 1.0)
+        '''
+        if self.description.fmiVersion == '1.0' and re.match(r'.*/(.*?).fmu$', fileName).group(1) != self.description.modelIdentifier:
             raise FMUError.FMUError('FMU file corrupted!\nFile name and model identifier differ: ' + re.match(r'.*/(.*?).fmu$', fileName).group(1) + ' vs. ' + self.description.modelIdentifier + '\n')
 
         self._InstantiateModel()
         self._file.close()
         self._createCInterface()
+        self._createBuffers()
+
+    def _createBuffers(self):
+        ''' Creates reusable buffers for the vectors that are exchanged with the model at every
+            step of an integrator together with the pointers to their data, so that
+            fmiSetContinuousStates and fmiGetDerivatives(self.derivatives) etc. do not allocate any arrays.
+        '''
+        self.continuousStates = createfmiRealVector(self.description.numberOfContinuousStates)
+        self.derivatives = createfmiRealVector(self.description.numberOfContinuousStates)
+        self.eventIndicators = createfmiRealVector(self.description.numberOfEventIndicators)
+        self._bufferPointers = dict()
+        for buffer in [self.continuousStates, self.derivatives, self.eventIndicators]:
+            self._bufferPointers[id(buffer)] = buffer.ctypes.data_as(fmiRealVector)
+        # Input of fmiSetContinuousStates
+        self._stateValues = createfmiRealVector(self.description.numberOfContinuousStates)
+        self._stateValuesPointer = self._stateValues.ctypes.data_as(fmiRealVector)
+
+    def _realPointer(self, out, n):
+        ''' Returns the tuple (out, pointer to the data of out) for the fmiGet functions of fmiReal vectors:
+            out is a new vector of length n, if out is None; the pointers of the buffers are cached.
+        '''
+        if out is None:
+            out = createfmiRealVector(n)
+        else:
+            _checkVector(out, n, numpy.float)
+        pointer = self._bufferPointers.get(id(out))
+        if pointer is None:
+            pointer = out.ctypes.data_as(fmiRealVector)
+        return (out, pointer)
 
     def _assembleBinaryName(self, modelName):
         ''' Creates the path within the fmu-file for the binary according to current architecture
@@ -160,7 +269,7 @@ class FMUInterface:
             binaryName += '64/'
         else:
             raise FMUError.FMUError('Unable to detect system architecture or architecture not supported.\n')
-        binaryName += self.description.modelIdentifier
+        binaryName += modelName
         if platform.system() == 'Linux':
             binaryName += '.so'
         elif platform.system() == 'Windows':
@@ -196,14 +305,14 @@ class FMUInterface:
             c_lib = ctypes.cdll.LoadLibrary('libc.so.6')
             self._fmiCallbackFunctions = _fmiCallbackFunctions(
                                      logger=Logger(_Logger),
-                                     allocateMemory=AllocateMemory(c_lib.calloc),
-                                     freeMemory=FreeMemory(c_lib.free))
+                                     allocateMemory=_cFunction(AllocateMemory, c_lib.calloc),
+                                     freeMemory=_cFunction(FreeMemory, c_lib.free))
         elif platform.system() == 'Windows':
             msvcrt_lib = ctypes.CDLL(find_library('c'))
             self._fmiCallbackFunctions = _fmiCallbackFunctions(
                                      logger=Logger(_Logger),
-                                     allocateMemory=AllocateMemory(msvcrt_lib.calloc),
-                                     freeMemory=FreeMemory(msvcrt_lib.free))
+                                     allocateMemory=_cFunction(AllocateMemory, msvcrt_lib.calloc),
+                                     freeMemory=_cFunction(FreeMemory, msvcrt_lib.free))
 
         ''' Load instance of library into memory '''
         try:
@@ -228,7 +337,10 @@ class FMUInterface:
         if hasattr(self, '_library'):
             self.freeModelInstance()
             self._tmpfile.close()
-            _ctypes.FreeLibrary(self._libraryHandle)
+            if platform.system() == 'Windows':
+                _ctypes.FreeLibrary(self._libraryHandle)
+            else:
+                _ctypes.dlclose(self._libraryHandle)
 
     def freeModelInstance(self):
         ''' Call FMU destructor before being destructed. Just cleaning up. '''
@@ -349,7 +461,9 @@ class FMUInterface:
     def fmiSetContinuousStates(self, vector):
         if len(vector) != self.description.numberOfContinuousStates:
             raise IndexError('length of vector not corresponding to length  of models continuous states vector')
-        return self._fmiSetContinuousStates(self._modelInstancePtr, vector.ctypes.data_as(fmiRealVector), len(vector))
+        # Copy the values into a buffer with a cached pointer instead of creating a pointer to vector
+        numpy.copyto(self._stateValues, vector)
+        return self._fmiSetContinuousStates(self._modelInstancePtr, self._stateValuesPointer, len(vector))
 
     def fmiCompletedIntegratorStep(self):
         callEventUpdate = fmiBoolean()
@@ -381,28 +495,40 @@ class FMUInterface:
         status = self._fmiInitialize(self._modelInstancePtr, fmiTrue if toleranceControlled else fmiFalse, relativeTolerance, eventInfo)
         return (eventInfo, status)
 
-    def fmiGetDerivatives(self):
-        ret = createfmiRealVector(self.description.numberOfContinuousStates)
-        self._fmiGetDerivatives(self._modelInstancePtr, ret.ctypes.data_as(fmiRealVector), self.description.numberOfContinuousStates)
-        return ret
+    def fmiGetDerivatives(self, out=None):
+        ''' Returns the derivatives in a new vector or in out (e.g. the buffer self.derivatives)
+        '''
+        (out, pointer) = self._realPointer(out, self.description.numberOfContinuousStates)
+        self._fmiGetDerivatives(self._modelInstancePtr, pointer, len(out))
+        return out
 
-    def fmiGetEventIndicators(self):
-        ret = createfmiRealVector(self.description.numberOfEventIndicators)
-        self._fmiGetEventIndicators(self._modelInstancePtr, ret.ctypes.data_as(fmiRealVector), self.description.numberOfEventIndicators)
-        return ret
+    def fmiGetEventIndicators(self, out=None):
+        ''' Returns the event indicators in a new vector or in out (e.g. the buffer self.eventIndicators)
+        '''
+        (out, pointer) = self._realPointer(out, self.description.numberOfEventIndicators)
+        self._fmiGetEventIndicators(self._modelInstancePtr, pointer, len(out))
+        return out
 
-    def fmiGetReal(self, valueReference):
-        value = createfmiRealVector(len(valueReference))
-        self._fmiGetReal(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), value.ctypes.data_as(fmiRealVector))
+    def fmiGetReal(self, valueReference, out=None):
+        (value, pointer) = self._realPointer(out, len(valueReference))
+        self._fmiGetReal(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), pointer)
         return value
 
-    def fmiGetInteger(self, valueReference):
-        value = createfmiIntegerVector(len(valueReference))
+    def fmiGetInteger(self, valueReference, out=None):
+        if out is None:
+            value = createfmiIntegerVector(len(valueReference))
+        else:
+            _checkVector(out, len(valueReference), numpy.int32)
+            value = out
         self._fmiGetInteger(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), value.ctypes.data_as(fmiIntegerVector))
         return value
 
-    def fmiGetBoolean(self, valueReference):
-        value = createfmiBooleanVector(len(valueReference))
+    def fmiGetBoolean(self, valueReference, out=None):
+        if out is None:
+            value = createfmiBooleanVector(len(valueReference))
+        else:
+            _checkVector(out, len(valueReference), numpy.bool)
+            value = out
         self._fmiGetBoolean(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), value.ctypes.data_as(fmiBooleanVector))
         return value
 
@@ -416,9 +542,11 @@ class FMUInterface:
         self._fmiEventUpdate(self._modelInstancePtr, fmiTrue if intermediateResults else fmiFalse, eventInfo)
         return eventInfo
 
-    def fmiGetContinuousStates(self):
-        value = createfmiRealVector(self.description.numberOfContinuousStates)
-        self._fmiGetContinuousStates(self._modelInstancePtr, value.ctypes.data_as(fmiRealVector), self.description.numberOfContinuousStates)
+    def fmiGetContinuousStates(self, out=None):
+        ''' Returns the states in a new vector or in out (e.g. the buffer self.continuousStates)
+        '''
+        (value, pointer) = self._realPointer(out, self.description.numberOfContinuousStates)
+        self._fmiGetContinuousStates(self._modelInstancePtr, pointer, len(value))
         return value
 
     def fmiGetNominalContinuousStates(self):
@@ -434,6 +562,330 @@ class FMUInterface:
     def fmiTerminate(self):
         self._fmiTerminate(self._modelInstancePtr)
 
+
+class FMUInterface2(FMUInterface):
+    ''' This class encapsulates the C-Interface of an FMU for FMI 2.0 Model Exchange or Co-Simulation.
+        The fmi2* functions are a public interface to the FMU-functions of FMI 2.0.
+        Additionally, the fmi* functions of FMUInterface are provided with the meaning of FMI 1.0,
+        so that an FMUInterface2 can be used in place of an FMUInterface:
+        fmiInitialize and fmiEventUpdate run the event iteration of FMI 2.0 and
+        return an fmiEventInfo of FMI 1.0.
+    '''
+    def __init__(self, fileName, parent=None, loggingOn=True, fmuType=None):
+        ''' Load an FMU-File of FMI 2.0 and start a new instance
+            @param fileName: complete path and name of FMU-file (.fmu)
+            @type fileName: string
+            @param fmuType: fmi2ModelExchange or fmi2CoSimulation; None means Model Exchange,
+                            if the FMU supports it, and otherwise Co-Simulation
+        '''
+        self._modelInstancePtr = None
+        self._startTime = 0.0
+        self._initialized = False
+        self.fmuType = fmuType
+        FMUInterface.__init__(self, fileName, parent, loggingOn)
+
+    def _InstantiateModel(self):
+        ''' unpacks the model binary and the resources of the FMU and loads the binary into memory
+        '''
+        ''' The binaries for Model Exchange and Co-Simulation may have different model identifiers '''
+        if self.fmuType is None:
+            self.fmuType = fmi2ModelExchange if self.description.modelExchange is not None else fmi2CoSimulation
+        if self.fmuType == fmi2ModelExchange:
+            self.implementation = self.description.modelExchange
+        else:
+            self.implementation = self.description.coSimulation
+        if self.implementation is None:
+            raise FMUError.FMUError('FMU does not support ' + ('Model Exchange' if self.fmuType == fmi2ModelExchange else 'Co-Simulation') + '.\n')
+
+        FMUInterface._InstantiateModel(self)
+
+        ''' The resources are extracted into a temporary directory, whose URI is given to fmi2Instantiate '''
+        self._resourceDirectory = tempfile.mkdtemp()
+        for name in self._file.namelist():
+            if name.startswith('resources/') and not name.endswith('/'):
+                self._file.extract(name, self._resourceDirectory)
+        self._resourceLocation = urlparse.urljoin('file:', urllib.pathname2url(os.path.join(self._resourceDirectory, 'resources')))
+
+        def _Logger(c, instanceName, status, category, message):
+            if self._loggingOn:
+                print(message)
+
+        if platform.system() == 'Linux':
+            c_lib = ctypes.cdll.LoadLibrary('libc.so.6')
+        else:
+            c_lib = ctypes.CDLL(find_library('c'))
+        self._fmi2CallbackFunctions = _fmi2CallbackFunctions(
+                                     logger=Logger2(_Logger),
+                                     allocateMemory=_cFunction(AllocateMemory2, c_lib.calloc),
+                                     freeMemory=_cFunction(FreeMemory, c_lib.free),
+                                     stepFinished=StepFinished2(),
+                                     componentEnvironment=None)
+
+    def fmiInstantiateModel(self):
+        self._modelInstancePtr = self._fmi2Instantiate(self.instanceID, self.fmuType, self.description.guid, self._resourceLocation,
+                                                       ctypes.byref(self._fmi2CallbackFunctions), fmi2False, fmi2True if self._loggingOn else fmi2False)
+        if self._modelInstancePtr == None:
+            raise FMUError.FMUError('Instantiation of FMU failed.\n')
+        self._initialized = False
+
+    def _assembleBinaryName(self, modelName):
+        return FMUInterface._assembleBinaryName(self, self.implementation.modelIdentifier)
+
+    def free(self):
+        ''' Call FMU destructor before being destructed. Just cleaning up. '''
+        FMUInterface.free(self)
+        if hasattr(self, '_resourceDirectory'):
+            shutil.rmtree(self._resourceDirectory, ignore_errors=True)
+
+    def freeModelInstance(self):
+        ''' Call FMU destructor before being destructed. Just cleaning up. '''
+        if hasattr(self, '_library') and self._modelInstancePtr is not None:
+            self._fmi2FreeInstance(self._modelInstancePtr)
+            self._modelInstancePtr = None
+
+    def _createCInterface(self):
+        ''' Create interfaces to C-function calls of FMI 2.0 (without prefix of the model identifier).
+            The functions with the same signature as in FMI 1.0 are assigned to the private
+            members of FMUInterface, so that the fmi* functions of FMUInterface can be used.
+            Only the functions of the fmuType are created, since a binary for Co-Simulation
+            does not need to contain the functions for Model Exchange and vice versa.
+            The mapping is done according to file: fmi2FunctionTypes.h
+        '''
+        def function(name, argtypes, restype=fmiStatus):
+            f = getattr(self._library, name)
+            f.argtypes = argtypes
+            f.restype = restype
+            return f
+
+        vrVector = fmiValueReferenceVector
+        size_t = ctypes.c_size_t
+
+        self._fmiGetModelTypesPlatform = function('fmi2GetTypesPlatform', None, fmiString)
+        self._fmiGetVersion = function('fmi2GetVersion', None, fmiString)
+        self._fmi2SetDebugLogging = function('fmi2SetDebugLogging', [fmiComponent, fmi2Boolean, size_t, fmiStringVector])
+        self._fmi2Instantiate = function('fmi2Instantiate', [fmiString, ctypes.c_int, fmiString, fmiString, ctypes.POINTER(_fmi2CallbackFunctions), fmi2Boolean, fmi2Boolean], fmiComponent)
+        self._fmi2FreeInstance = function('fmi2FreeInstance', [fmiComponent], None)
+        self._fmi2SetupExperiment = function('fmi2SetupExperiment', [fmiComponent, fmi2Boolean, fmiReal, fmiReal, fmi2Boolean, fmiReal])
+        self._fmi2EnterInitializationMode = function('fmi2EnterInitializationMode', [fmiComponent])
+        self._fmi2ExitInitializationMode = function('fmi2ExitInitializationMode', [fmiComponent])
+        self._fmiTerminate = function('fmi2Terminate', [fmiComponent])
+        self._fmi2Reset = function('fmi2Reset', [fmiComponent])
+
+        self._fmiGetReal = function('fmi2GetReal', [fmiComponent, vrVector, size_t, fmiRealVector])
+        self._fmiGetInteger = function('fmi2GetInteger', [fmiComponent, vrVector, size_t, fmiIntegerVector])
+        self._fmi2GetBoolean = function('fmi2GetBoolean', [fmiComponent, vrVector, size_t, fmi2BooleanVector])
+        self._fmiGetString = function('fmi2GetString', [fmiComponent, vrVector, size_t, fmiStringVector])
+        self._fmiSetReal = function('fmi2SetReal', [fmiComponent, vrVector, size_t, fmiRealVector])
+        self._fmiSetInteger = function('fmi2SetInteger', [fmiComponent, vrVector, size_t, fmiIntegerVector])
+        self._fmi2SetBoolean = function('fmi2SetBoolean', [fmiComponent, vrVector, size_t, fmi2BooleanVector])
+        self._fmiSetString = function('fmi2SetString', [fmiComponent, vrVector, size_t, fmiStringVector])
+
+        self._fmi2GetDirectionalDerivative = function('fmi2GetDirectionalDerivative', [fmiComponent, vrVector, size_t, vrVector, size_t, fmiRealVector, fmiRealVector])
+
+        if self.fmuType == fmi2CoSimulation:
+            self._fmi2DoStep = function('fmi2DoStep', [fmiComponent, fmiReal, fmiReal, fmi2Boolean])
+            self._fmi2CancelStep = function('fmi2CancelStep', [fmiComponent])
+            self._fmi2GetRealStatus = function('fmi2GetRealStatus', [fmiComponent, ctypes.c_int, ctypes.POINTER(fmiReal)])
+            self._fmi2GetBooleanStatus = function('fmi2GetBooleanStatus', [fmiComponent, ctypes.c_int, ctypes.POINTER(fmi2Boolean)])
+            return
+
+        self._fmi2EnterEventMode = function('fmi2EnterEventMode', [fmiComponent])
+        self._fmi2NewDiscreteStates = function('fmi2NewDiscreteStates', [fmiComponent, ctypes.POINTER(fmi2EventInfo)])
+        self._fmi2EnterContinuousTimeMode = function('fmi2EnterContinuousTimeMode', [fmiComponent])
+        self._fmi2CompletedIntegratorStep = function('fmi2CompletedIntegratorStep', [fmiComponent, fmi2Boolean, ctypes.POINTER(fmi2Boolean), ctypes.POINTER(fmi2Boolean)])
+        self._fmiSetTime = function('fmi2SetTime', [fmiComponent, fmiReal])
+        self._fmiSetContinuousStates = function('fmi2SetContinuousStates', [fmiComponent, fmiRealVector, size_t])
+        self._fmiGetDerivatives = function('fmi2GetDerivatives', [fmiComponent, fmiRealVector, size_t])
+        self._fmiGetEventIndicators = function('fmi2GetEventIndicators', [fmiComponent, fmiRealVector, size_t])
+        self._fmiGetContinuousStates = function('fmi2GetContinuousStates', [fmiComponent, fmiRealVector, size_t])
+        self._fmiGetNominalContinuousStates = function('fmi2GetNominalsOfContinuousStates', [fmiComponent, fmiRealVector, size_t])
+
+    def fmi2SetDebugLogging(self, onOff, categories=None):
+        if categories is None:
+            categories = []
+        vector = createfmiStringVector(len(categories))
+        for i, category in enumerate(categories):
+            vector[i] = category
+        return self._fmi2SetDebugLogging(self._modelInstancePtr, fmi2True if onOff else fmi2False, len(categories), vector)
+
+    def fmi2SetupExperiment(self, toleranceDefined, tolerance, startTime, stopTimeDefined=False, stopTime=0.0):
+        return self._fmi2SetupExperiment(self._modelInstancePtr, fmi2True if toleranceDefined else fmi2False, tolerance,
+                                         startTime, fmi2True if stopTimeDefined else fmi2False, stopTime)
+
+    def fmi2EnterInitializationMode(self):
+        return self._fmi2EnterInitializationMode(self._modelInstancePtr)
+
+    def fmi2ExitInitializationMode(self):
+        return self._fmi2ExitInitializationMode(self._modelInstancePtr)
+
+    def fmi2Reset(self):
+        self._initialized = False
+        return self._fmi2Reset(self._modelInstancePtr)
+
+    def fmi2GetDirectionalDerivative(self, unknownReferences, knownReferences, dvKnown):
+        ''' Returns the directional derivative dvUnknown = d(unknowns)/d(knowns) * dvKnown
+            @param unknownReferences: value references of the unknowns (e.g. derivatives of the states)
+            @param knownReferences: value references of the knowns (e.g. states)
+            @param dvKnown: seed vector with the length of knownReferences
+        '''
+        if len(knownReferences) != len(dvKnown):
+            raise IndexError('length of knownReferences not corresponding to length of dvKnown')
+        dvUnknown = createfmiRealVector(len(unknownReferences))
+        status = self._fmi2GetDirectionalDerivative(self._modelInstancePtr,
+                                                    unknownReferences.ctypes.data_as(fmiValueReferenceVector), len(unknownReferences),
+                                                    knownReferences.ctypes.data_as(fmiValueReferenceVector), len(knownReferences),
+                                                    dvKnown.ctypes.data_as(fmiRealVector), dvUnknown.ctypes.data_as(fmiRealVector))
+        if status > 1:
+            raise FMUError.FMUError('fmi2GetDirectionalDerivative failed.\n')
+        return dvUnknown
+
+    def fmi2DoStep(self, currentCommunicationPoint, communicationStepSize, noSetFMUStatePriorToCurrentPoint=True):
+        return self._fmi2DoStep(self._modelInstancePtr, currentCommunicationPoint, communicationStepSize,
+                                fmi2True if noSetFMUStatePriorToCurrentPoint else fmi2False)
+
+    def fmi2DoSteps(self, startTime, stepSize, firstStep, lastStep):
+        ''' Calls fmi2DoStep for the communication points startTime + i*stepSize, i = firstStep, ..., lastStep - 1,
+            in one Python loop of ctypes calls of the prebound fmi2DoStep, i.e. without the attribute lookups
+            and argument conversions of fmi2DoStep. Returns the tuple (status, i) of the first step
+            that did not return fmi2OK or fmi2Warning, or (status, lastStep) if all steps were successful.
+        '''
+        doStep = self._fmi2DoStep
+        instance = self._modelInstancePtr
+        for i in xrange(firstStep, lastStep):
+            status = doStep(instance, startTime + i * stepSize, stepSize, fmi2True)
+            if status > 1:
+                return (status, i)
+        return (0, lastStep)
+
+    def fmi2CancelStep(self):
+        return self._fmi2CancelStep(self._modelInstancePtr)
+
+    def fmi2GetRealStatus(self, kind):
+        value = fmiReal()
+        self._fmi2GetRealStatus(self._modelInstancePtr, kind, ctypes.byref(value))
+        return value.value
+
+    def fmi2GetBooleanStatus(self, kind):
+        value = fmi2Boolean()
+        self._fmi2GetBooleanStatus(self._modelInstancePtr, kind, ctypes.byref(value))
+        return value.value != fmi2False
+
+    def fmi2EnterEventMode(self):
+        return self._fmi2EnterEventMode(self._modelInstancePtr)
+
+    def fmi2NewDiscreteStates(self):
+        eventInfo = fmi2EventInfo()
+        status = self._fmi2NewDiscreteStates(self._modelInstancePtr, ctypes.byref(eventInfo))
+        return (eventInfo, status)
+
+    def fmi2EnterContinuousTimeMode(self):
+        return self._fmi2EnterContinuousTimeMode(self._modelInstancePtr)
+
+    def fmi2CompletedIntegratorStep(self, noSetFMUStatePriorToCurrentPoint=True):
+        ''' Returns the tuple (enterEventMode, terminateSimulation) of booleans
+        '''
+        enterEventMode = fmi2Boolean()
+        terminateSimulation = fmi2Boolean()
+        self._fmi2CompletedIntegratorStep(self._modelInstancePtr, fmi2True if noSetFMUStatePriorToCurrentPoint else fmi2False,
+                                          ctypes.byref(enterEventMode), ctypes.byref(terminateSimulation))
+        return (enterEventMode.value != fmi2False, terminateSimulation.value != fmi2False)
+
+    def _eventIteration(self):
+        ''' Calls fmi2NewDiscreteStates until no new discrete states are needed
+            and returns the result in an fmiEventInfo of FMI 1.0 and the worst status
+        '''
+        status = 0
+        eventInfo2 = fmi2EventInfo()
+        eventInfo2.newDiscreteStatesNeeded = fmi2True
+        valuesOfContinuousStatesChanged = False
+        while eventInfo2.newDiscreteStatesNeeded != fmi2False and eventInfo2.terminateSimulation == fmi2False:
+            (eventInfo2, s) = self.fmi2NewDiscreteStates()
+            status = max(status, s)
+            valuesOfContinuousStatesChanged = valuesOfContinuousStatesChanged or eventInfo2.valuesOfContinuousStatesChanged != fmi2False
+            if s > 1:
+                break
+        if eventInfo2.terminateSimulation == fmi2False and status <= 1:
+            status = max(status, self.fmi2EnterContinuousTimeMode())
+
+        eventInfo = fmiEventInfo()
+        eventInfo.iterationConverged = fmiTrue
+        eventInfo.stateValueReferencesChanged = fmiFalse
+        eventInfo.stateValuesChanged = fmiTrue if valuesOfContinuousStatesChanged else fmiFalse
+        eventInfo.terminateSimulation = fmiTrue if eventInfo2.terminateSimulation != fmi2False else fmiFalse
+        eventInfo.upcomingTimeEvent = fmiTrue if eventInfo2.nextEventTimeDefined != fmi2False else fmiFalse
+        eventInfo.nextEventTime = eventInfo2.nextEventTime
+        return (eventInfo, status)
+
+    def fmiGetVersion(self):
+        return self._fmiGetVersion()
+
+    def fmiGetModelTypesPlatform(self):
+        return self._fmiGetModelTypesPlatform()
+
+    def fmiSetDebugLogging(self, onOff):
+        return self.fmi2SetDebugLogging(onOff)
+
+    def fmiSetTime(self, time):
+        ''' Before the initialization, the time is only stored as start time for fmi2SetupExperiment
+        '''
+        if not self._initialized:
+            self._startTime = time
+            return 0
+        return self._fmiSetTime(self._modelInstancePtr, time)
+
+    def fmiCompletedIntegratorStep(self):
+        enterEventMode, terminateSimulation = self.fmi2CompletedIntegratorStep(True)
+        return fmiTrue if enterEventMode or terminateSimulation else fmiFalse
+
+    def fmiSetBoolean(self, valueReference, value):
+        if len(valueReference) != len(value):
+            raise IndexError('length of valueReference not corresponding to length of value')
+        value2 = numpy.array(value, dtype=numpy.int32)
+        return self._fmi2SetBoolean(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), value2.ctypes.data_as(fmi2BooleanVector))
+
+    def fmiGetBoolean(self, valueReference, out=None):
+        if out is not None:
+            _checkVector(out, len(valueReference), numpy.bool)
+        value = createfmi2BooleanVector(len(valueReference))
+        self._fmi2GetBoolean(self._modelInstancePtr, valueReference.ctypes.data_as(fmiValueReferenceVector), len(valueReference), value.ctypes.data_as(fmi2BooleanVector))
+        return numpy.not_equal(value, fmi2False, out)
+
+    def fmiInitialize(self, toleranceControlled=False, relativeTolerance=0):
+        ''' Initializes the model at the time given by the last call of fmiSetTime
+            including the event iteration at the start time
+        '''
+        status = self.fmi2SetupExperiment(toleranceControlled, relativeTolerance, self._startTime)
+        if status <= 1:
+            status = max(status, self.fmi2EnterInitializationMode())
+        if status <= 1:
+            status = max(status, self.fmi2ExitInitializationMode())
+        if status > 1:
+            return (fmiEventInfo(), status)
+        self._initialized = True
+        if self.fmuType == fmi2CoSimulation:
+            ''' There is no event iteration in Co-Simulation '''
+            return (fmiEventInfo(), status)
+        (eventInfo, s) = self._eventIteration()
+        return (eventInfo, max(status, s))
+
+    def fmiEventUpdate(self, intermediateResults=False):
+        self.fmi2EnterEventMode()
+        (eventInfo, status) = self._eventIteration()
+        return eventInfo
+
+    def fmiGetStateValueReferences(self):
+        ''' The value references of the states are taken from the ModelStructure
+        '''
+        value = createfmiReferenceVector(self.description.numberOfContinuousStates)
+        for i, name in enumerate(self.description.modelStructure.states):
+            value[i] = self.description.scalarVariables[name].valueReference
+        return value
+
+    def fmiTerminate(self):
+        self._initialized = False
+        self._fmiTerminate(self._modelInstancePtr)
+
+
 '''
 if __name__ == '__main__':
     fmui = FMUInterface('./Capacitor.fmu')
@@ -0,0 +1,163 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Jacobian of the right hand side of an FMU for the Newton iteration of the implicit solvers.
+'''
+
+import numpy
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+from Plugins.Algorithms.Jacobian.ColoredJacobian import ColoredJacobian
+
+
+def getStateSparsity(description):
+    ''' Returns the tuple (rows, columns) of the index arrays of the structurally nonzero
+        elements of d der(x)/dx, taken from the dependencies of the derivatives in the
+        ModelStructure of FMI 2.0. A derivative without dependencies attribute depends on
+        all states; dependencies on other variables than states (e.g. inputs) are ignored.
+        Returns None, if the dependencies of the derivatives are not known (FMI 1.0).
+    '''
+    n = description.numberOfContinuousStates
+    if description.fmiVersion != '2.0' or len(description.modelStructure.derivatives) != n:
+        return None
+    # The states are identified by their value references to cover aliases of states
+    stateColumn = dict()
+    for j, name in enumerate(description.modelStructure.states):
+        stateColumn[description.scalarVariables[name].valueReference] = j
+    rows = []
+    columns = []
+    for i, derivative in enumerate(description.modelStructure.derivatives):
+        if derivative.dependencies is None:
+            rows.extend([i] * n)
+            columns.extend(range(n))
+            continue
+        for index in derivative.dependencies:
+            variable = description.scalarVariables[description.scalarVariableNames[index - 1]]
+            if variable.type.type == 'Real' and variable.valueReference in stateColumn:
+                rows.append(i)
+                columns.append(stateColumn[variable.valueReference])
+    return numpy.array(rows, dtype=numpy.int), numpy.array(columns, dtype=numpy.int)
+
+
+def improvesNewtonIteration(description):
+    ''' Returns True, if FMUJacobian is better than the difference quotients of the solvers:
+        the FMU provides directional derivatives or the sparsity pattern of J is known
+        from its ModelStructure (see getStateSparsity).
+    '''
+    if description.fmiVersion != '2.0':
+        return False
+    implementation = description.modelExchange
+    if implementation is not None and implementation.providesDirectionalDerivative:
+        return True
+    return getStateSparsity(description) is not None
+
+
+class FMUJacobian:
+    ''' Jacobian J[i, j] = d der(x[i]) / d x[j] of the continuous states x of an FMU.
+        It is computed by fmi2GetDirectionalDerivative, if the FMU provides directional derivatives,
+        and by forward differences of fmiGetDerivatives otherwise. Columns of the same color
+        (see ColoredJacobian) are computed together, so that one evaluation is needed per color
+        instead of per state. The sparsity pattern is taken from the ModelStructure (see getStateSparsity).
+        If it is not known, J is taken as dense; then the finite differences are the same
+        as those of the solvers (see improvesNewtonIteration).
+
+        jacobian and jacobianImplicit can be used as jac functions of the Assimulo problems.
+    '''
+    def __init__(self, model, sparse=None):
+        ''' @param model: FMUSimulator.Model with an initialized FMU instance
+            @param sparse: True, if jacobian shall return a scipy.sparse.csc_matrix;
+                           None, if this shall be decided by the size and the density of J
+        '''
+        self.model = model
+        description = model.description
+        n = description.numberOfContinuousStates
+        self.n = n
+        interface = model.interface
+
+        implementation = description.modelExchange if description.fmiVersion == '2.0' else None
+        self.useDirectionalDerivatives = implementation is not None and implementation.providesDirectionalDerivative
+        self._stateReferences = interface.fmiGetStateValueReferences()
+        if self.useDirectionalDerivatives:
+            self._derivativeReferences = numpy.array([description.scalarVariables[derivative.name].valueReference
+                                                      for derivative in description.modelStructure.derivatives], dtype=numpy.uint32)
+        # Scale of the perturbations of the finite differences
+        self._scale = numpy.abs(interface.fmiGetNominalContinuousStates())
+        self._scale[self._scale == 0.0] = 1.0
+
+        sparsity = getStateSparsity(description)
+        if sparsity is None:
+            self.coloredJacobian = ColoredJacobian(n, n)
+        else:
+            # The Newton iteration matrix I - gamma*J needs the diagonal
+            self.coloredJacobian = ColoredJacobian(n, n, numpy.concatenate((sparsity[0], numpy.arange(n))),
+                                                   numpy.concatenate((sparsity[1], numpy.arange(n))))
+        self.nnz = self.coloredJacobian.nnz
+
+        if sparse is None:
+            sparse = n >= 100 and self.nnz <= 0.1 * n * n
+        self.sparse = sparse and scipy is not None
+
+    def _derivatives(self, x):
+        ''' Returns the derivatives of the states x at the current time of the model
+        '''
+        self.model.interface.fmiSetContinuousStates(x)
+        return self.model.interface.fmiGetDerivatives(self.model.interface.derivatives)
+
+    def _values(self, t, x):
+        ''' Returns the values of the nonzero elements of J at time t and states x
+            in the order of self.coloredJacobian.rows, self.coloredJacobian.columns.
+        '''
+        interface = self.model.interface
+        interface.fmiSetTime(t)
+        interface.fmiSetContinuousStates(x)
+        if self.useDirectionalDerivatives:
+            compressed = numpy.empty((self.n, self.coloredJacobian.nColors))
+            for c, seed in enumerate(self.coloredJacobian.seeds):
+                compressed[:, c] = interface.fmi2GetDirectionalDerivative(self._derivativeReferences, self._stateReferences, seed)
+            return self.coloredJacobian.expand(compressed)
+
+        values = self.coloredJacobian.finiteDifferences(self._derivatives, x, interface.fmiGetDerivatives(interface.derivatives), scale=self._scale)
+        # Reset the states of the model
+        interface.fmiSetContinuousStates(x)
+        return values
+
+    def jacobian(self, t, x, sw=None):
+        ''' Returns J at time t and states x as numpy array
+            or as scipy.sparse.csc_matrix, if self.sparse is True
+        '''
+        values = self._values(t, x)
+        if self.sparse:
+            return self.coloredJacobian.toSparse(values)
+        return self.coloredJacobian.toDense(values)
+
+    def jacobianImplicit(self, c, t, x, xd, sw=None):
+        ''' Returns the Jacobian d res/dx + c * d res/dxd = J - c * I of the residual
+            res = der(x) - xd of the implicit solvers as numpy array
+        '''
+        J = self.coloredJacobian.toDense(self._values(t, x))
+        J[numpy.diag_indices(self.n)] -= c
+        return J
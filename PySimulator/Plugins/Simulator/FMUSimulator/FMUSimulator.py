@@ -33,6 +33,7 @@ For documentation of general Simulator plugins, see also SimulatorBase.py
 
 
 import getpass
+import math
 from operator import itemgetter
 import os
 import time
@@ -42,11 +43,13 @@ import numpy
 
 import FMIDescription
 import FMUInterface
+import FMUJacobian
 from Plugins.Algorithms.Integrator.Sundials.AssimuloIntegrators import AssimuloCVode, AssimuloIda
 import Plugins.SimulationResult.IntegrationResults
 import Plugins.SimulationResult.Mtsf.Mtsf as Mtsf
 import Plugins.SimulationResult.Mtsf.MtsfFmi as MtsfFmi
 import Plugins.SimulationResult.Mtsf.pyMtsf as pyMtsf
+import Plugins.SimulationResult.DymolaMat.DymolaMatWriter as DymolaMatWriter
 from Plugins.Simulator.FMUSimulator.FMUInterface import fmiTrue, fmiFalse
 import Plugins.Simulator.SimulatorBase
 # import Plugins.Simulator.FMUSimulator.FMUInterface as FMUInterface
@@ -89,15 +92,19 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                 if description.defaultTolerance is not None:
                     self.integrationSettings.errorToleranceRel = float(description.defaultTolerance)
 
+        self._loggingOn = loggingOn
+        self._interfaces = dict()  # Interfaces of an FMI 2.0 FMU for Model Exchange and Co-Simulation by fmuType
         if modelFileName is None:
             self.interface = None
             self.description = FMIDescription.FMIDescription(None)
         else:
-            self.interface = FMUInterface.FMUInterface(modelFileName[0], self, loggingOn)
+            self.interface = FMUInterface.createFMUInterface(modelFileName[0], self, loggingOn)
             self.description = self.interface.description
+            if self.description.fmiVersion == '2.0':
+                self._interfaces[self.interface.fmuType] = self.interface
 
         # modelName will not be used, because the modelName of FMIDescription is used
-        Plugins.Simulator.SimulatorBase.Model.__init__(self, self.description.modelName, modelFileName, 'FMU1.0', config)
+        Plugins.Simulator.SimulatorBase.Model.__init__(self, self.description.modelName, modelFileName, 'FMU2.0' if self.description.fmiVersion == '2.0' else 'FMU1.0', config)
 
         # Dummy object to get properties
         self.integrationResults = Mtsf.Results('')
@@ -108,6 +115,17 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         self._IntegrationAlgorithmHasFixedStepSize = [False, False, False, True]
         self._IntegrationAlgorithmCanProvideStepSizeResults = [True, True, True, True]
         self._IntegrationAlgorithmSupportsStateEvents = [True, True, True, True]
+        if self.description.coSimulation is not None:
+            # FMI 2.0 Co-Simulation: The FMU integrates with its own solver, the fixed step size is the communication step size
+            if self.description.modelExchange is None:
+                self._availableIntegrationAlgorithms = []
+                self._IntegrationAlgorithmHasFixedStepSize = []
+                self._IntegrationAlgorithmCanProvideStepSizeResults = []
+                self._IntegrationAlgorithmSupportsStateEvents = []
+            self._availableIntegrationAlgorithms.append("Co-Simulation (FMU solver)")
+            self._IntegrationAlgorithmHasFixedStepSize.append(True)
+            self._IntegrationAlgorithmCanProvideStepSizeResults.append(True)
+            self._IntegrationAlgorithmSupportsStateEvents.append(False)
 
         self.integrationSettings.algorithmName = self._availableIntegrationAlgorithms[0]
         self.simulationStopRequest = False
@@ -118,13 +136,27 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         '''
         Plugins.Simulator.SimulatorBase.Model.close(self)
         print "Deleting model instance ", self.description.modelName
-        self.interface.free()
+        if len(self._interfaces) == 0:
+            self.interface.free()
+        for interface in self._interfaces.values():
+            interface.free()
+
+    def _setFmuType(self, fmuType):
+        ''' Uses the interface of an FMI 2.0 FMU for the given fmuType
+            (FMUInterface.fmi2ModelExchange or FMUInterface.fmi2CoSimulation)
+        '''
+        if fmuType not in self._interfaces:
+            self._interfaces[fmuType] = FMUInterface.FMUInterface2(self.fileName[0], self, self._loggingOn, fmuType)
+        self.interface = self._interfaces[fmuType]
 
     def _setDefaultStartValues(self):
         ''' Reads given start values from FMI model description and sets variables accordingly
+            (in FMI 2.0 constants and the independent variable cannot be set)
         '''
         for index in self.description.scalarVariables:
             if self.description.scalarVariables[index].type.start != None:
+                if self.description.fmiVersion == '2.0' and (self.description.scalarVariables[index].variability == 'constant' or self.description.scalarVariables[index].causality == 'independent'):
+                    continue
                 self.setValue(index, self.description.scalarVariables[index].type.start)
 
     def setValue(self, valueName, valueValue):
@@ -173,24 +205,23 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         ''' Returns the right hand side of the dynamic system for
             given time t and state vector x.
             #x is 1d numpy array
+            The returned vector is a buffer of the interface that is overwritten by the next call.
         '''
         self.interface.fmiSetTime(t)
         if self.description.numberOfContinuousStates == 0:
-            dx = numpy.ndarray([1, ])
-        else:
-            self.interface.fmiSetContinuousStates(x)
-            dx = self.interface.fmiGetDerivatives()
-
-        return numpy.array([dx])  # Note that the return must be numpy array
+            return numpy.ndarray([1, ])
+        self.interface.fmiSetContinuousStates(x)
+        return self.interface.fmiGetDerivatives(self.interface.derivatives)
 
     def getEventIndicators(self, t, x):
         ''' Returns the event indicator functions for
             given time t and state vector x.
+            The returned vector is a buffer of the interface that is overwritten by the next call.
         '''
         self.interface.fmiSetTime(t)
         if not self.description.numberOfContinuousStates == 0:
             self.interface.fmiSetContinuousStates(x)
-        return self.interface.fmiGetEventIndicators()
+        return self.interface.fmiGetEventIndicators(self.interface.eventIndicators)
 
     def getValue(self, name):
         ''' Returns the values of the variables given in name;
@@ -366,15 +397,25 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             modelVariables.allSeries[1].initialRows = max(nGridPoints, modelVariables.allSeries[2].initialRows)  # Continuous
 
             # Create result object
-            mtsf = Mtsf.Results(settings.resultFileName,
-                               modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
-            if not mtsf.isAvailable:
+            if settings.resultFileExtension == 'mat':
+                results = DymolaMatWriter.Results(settings.resultFileName,
+                                   modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+                self._resultFile = results._writer
+            else:
+                layout = pyMtsf.DatasetLayout(shuffle=settings.resultFileShuffle, compression=settings.resultFileCompression,
+                                              compressionLevel=settings.resultFileCompressionLevel,
+                                              pyramidFactor=settings.resultFilePyramidFactor)
+                results = Mtsf.Results(settings.resultFileName,
+                                   modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations, layout,
+                                   settings.resultFileBackgroundBuffers)
+                self._resultFile = results._mtsf
+            if not results.isAvailable:
                 print("Result file " + settings.resultFileName + " cannot be opened for write access.\n")
                 self.integrationResults = Plugins.SimulationResult.IntegrationResults.Results()
                 return False
 
             # Create fmi reference lists in categories
-            for series in mtsf._mtsf.results.series.values():
+            for series in self._resultFile.results.series.values():
                 for category in series.category.values():
                     category.references = FMUInterface.createfmiReferenceVector(category.nColumn)
                     category.iReferences = -1
@@ -400,7 +441,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                         variable.category.independentVariableColumn = variable.columnIndex
                         variable.category.references[variable.category.iReferences] = 0
 
-            for series in mtsf._mtsf.results.series.values():
+            for series in self._resultFile.results.series.values():
                 if hasattr(series, 'independentVariableCategory'):
                     category = series.independentVariableCategory
                     column = category.independentVariableColumn
@@ -414,7 +455,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                         category.references = numpy.array([])
                 else:
                     series.independentVariableCategory = None
-            self.integrationResults = mtsf
+            self.integrationResults = results
             return True
 
         def writeResults(seriesName, time):
@@ -423,7 +464,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             '''
             if hasattr(self, 'integrationResultFileSemaphore'):
                 self.integrationResultFileSemaphore.acquire()
-            series = self.integrationResults._mtsf.results.series[seriesName]
+            series = self._resultFile.results.series[seriesName]
             for category in series.category.values():
                 if category.references.shape[0] > 0:
                     values = category.fmiGetValues(category.references)
@@ -434,23 +475,23 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                     index = category.independentVariableColumn
                     values[index] = time
                 category.writeData(values)
+            series.reachedTime = time
             if hasattr(self, 'integrationResultFileSemaphore'):
                 self.integrationResultFileSemaphore.release()
 
         def right_hand_side(t, x, xd=None):
             ''' Returns the right hand side (or the delta to xd for implicit solvers)
             '''
-            dx = self.getDerivatives(t, x)  # dx is returned as matrix with one row [[ 0.1  0.4]]
+            dx = self.getDerivatives(t, x)  # The solvers copy dx, so the buffer of the interface is returned
             if implicitSolver:
-                return dx[0] - xd  # numpy.array(dx - xd)#maybe [dx] #dx - xd
+                return dx - xd
             else:
-                return dx[0]  # return dx as vector
+                return dx
 
         def state_events(t, x, sw):
             ''' Returns event indicator functions at time=t, states=x
             '''
-            test = self.getEventIndicators(t, x)
-            return numpy.array(test)
+            return self.getEventIndicators(t, x)
 
         def state_eventsImplicit(t, x, xd, sw):
             ''' Returns event indicator functions at time=t, states=x
@@ -541,7 +582,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
 
             # handle_result(solver, solver.t, solver.y) here if your solver does not call it by itself(Assimulo does)
 
-            if 'Discrete' in self.integrationResults._mtsf.results.series:
+            if 'Discrete' in self._resultFile.results.series:
                 # Write discrete Variables
                 writeResults('Discrete', solver.t)
 
@@ -550,6 +591,58 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
 
 
 
+        def writeOutput(t):
+            ''' Writes the results of a communication point in Co-Simulation
+            '''
+            self.integrationStatistics.reachedTime = t
+            writeResults('Continuous', t)
+            self.integrationStatistics.nGridPoints += 1
+            if 'Discrete' in self._resultFile.results.series:
+                writeResults('Discrete', t)
+
+        def simulateCoSimulation():
+            ''' Master loop for FMI 2.0 Co-Simulation with a fixed communication step size.
+                The FMU integrates with its own solver from one communication point to the next one.
+                The steps between two output points are done by FMUInterface2.fmi2DoSteps without
+                further Python calls. Output points are rounded to communication points.
+            '''
+            stepSize = self.integrationSettings.fixedStepSize
+            nSteps = max(int(math.ceil((Tend - Tstart) / stepSize - 1e-6)), 1)  # The last step ends at Tend
+            if self.integrationSettings.gridPointsMode == 'NumberOf':
+                outputWidth = (Tend - Tstart) / max(nIntervals, 1)
+            elif self.integrationSettings.gridPointsMode == 'Width':
+                outputWidth = gridWidth
+            else:
+                outputWidth = stepSize
+            outputSteps = max(int(round(outputWidth / stepSize)), 1)
+
+            self.integrationStatistics.reachedTime = Tstart
+            writeResults('Continuous', Tstart)
+            self.integrationStatistics.nGridPoints += 1
+            step = 0
+            while step < nSteps:
+                # Check, if simulation shall be interrupted
+                if self.simulationStopRequest:
+                    finalize(None)
+                    raise(Plugins.Simulator.SimulatorBase.Stopping)
+
+                nextOutputStep = min(step + outputSteps, nSteps)
+                (status, step) = self.interface.fmi2DoSteps(Tstart, stepSize, step, min(nextOutputStep, nSteps - 1))
+                if status <= 1 and step == nSteps - 1 and nextOutputStep == nSteps:
+                    t = Tstart + step * stepSize
+                    status = self.interface.fmi2DoStep(t, Tend - t)
+                    if status <= 1:
+                        step = nSteps
+                if status > 1:
+                    if status == 2 and self.interface.fmi2GetBooleanStatus(FMUInterface.fmi2Terminated):
+                        writeOutput(self.interface.fmi2GetRealStatus(FMUInterface.fmi2LastSuccessfulTime))
+                        print("terminated by model ... ")
+                    else:
+                        print("fmi2DoStep failed at time " + str(Tstart + step * stepSize) + ". fmiStatus = " + str(status))
+                    break
+                writeOutput(Tend if step == nSteps else Tstart + step * stepSize)
+            finalize(None)
+
         def completed_step(solver):
             ''' Function that is called after each successfull integrator step
                 Returns True,  if there was a step event
@@ -567,6 +660,10 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             **********************************
         '''
 
+        coSimulation = 'Co-Simulation' in self.integrationSettings.algorithmName
+        if self.description.fmiVersion == '2.0':
+            self._setFmuType(FMUInterface.fmi2CoSimulation if coSimulation else FMUInterface.fmi2ModelExchange)
+
         # Initialize result file
         if not prepareResultFile():
             return
@@ -594,6 +691,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         self.integrationStatistics.nTimeEvents = 0
         self.integrationStatistics.nStateEvents = 0
         self.integrationStatistics.nGridPoints = 0
+        self.integrationStatistics.nResultFileResizes = 0
         self.integrationStatistics.reachedTime = Tstart
 
         # Run the integration
@@ -604,13 +702,22 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             print("Model initialization failed. fmiStatus = " + str(status))
             return
 
-        if 'Fixed' in self.integrationResults._mtsf.results.series:
+        if 'Fixed' in self._resultFile.results.series:
             # Write parameter values
             writeResults('Fixed', Tstart)
-        if 'Discrete' in self.integrationResults._mtsf.results.series:
+        if 'Discrete' in self._resultFile.results.series:
             # Write discrete variables
             writeResults('Discrete', Tstart)
 
+        if coSimulation:
+            if hasattr(self, 'numberedModelName'):
+                print("Start co-simulation of " + self.numberedModelName + " ... ")
+            else:
+                print("Start co-simulation of " + self.description.modelName + " ... ")
+            simulateCoSimulation()
+            self.integrationStatistics.nResultFileResizes = self._resultFile.resizeCount()
+            return
+
         # Retrieve initial state x
         if self.description.numberOfContinuousStates == 0:
             x0 = numpy.ndarray([1, ])
@@ -633,10 +740,18 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                 dx0 = self.interface.fmiGetDerivatives()
 
             simulator.yd0 = dx0
+            if self.description.numberOfContinuousStates > 0 and FMUJacobian.improvesNewtonIteration(self.description):
+                simulator.jac = FMUJacobian.FMUJacobian(self).jacobianImplicit
         elif "Adams" in IntegrationMethod or "BDF" in IntegrationMethod:  # Use CVode
             simulator = AssimuloCVode()
             simulator.iter = 'Newton'  # Default 'FixedPoint'
             simulator.discr = IntegrationMethod  # Default 'Adams'
+            if self.description.numberOfContinuousStates > 0 and FMUJacobian.improvesNewtonIteration(self.description):
+                # Jacobian for the Newton iteration by directional derivatives or colored finite differences
+                jacobian = FMUJacobian.FMUJacobian(self)
+                simulator.jac = jacobian.jacobian
+                if jacobian.sparse:
+                    simulator.jacNnz = jacobian.nnz
         else:
             simulator = ExplicitEulerSolver()
             simulator.completed_step = completed_step
@@ -680,6 +795,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         else:
             simulator.simulate(Tend, nIntervals, gridWidth)
 
+        self.integrationStatistics.nResultFileResizes = self._resultFile.resizeCount()
 
         return
 
@@ -729,6 +845,8 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                 variableAttribute += '\nVariability:' + chr(9) + v.variability
             if v.causality is not None:
                 variableAttribute += '\nCausality:' + chr(9) + v.causality
+            if v.initial is not None:
+                variableAttribute += '\nInitial:' + chr(9) + v.initial
             if v.alias is not None:
                 if v.alias.lower() is not 'noalias':
                     variableAttribute += '\nAlias:' + chr(9) + v.alias
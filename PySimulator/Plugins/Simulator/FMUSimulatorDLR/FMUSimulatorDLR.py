@@ -47,6 +47,7 @@ import Plugins.SimulationResult.IntegrationResults
 import Plugins.SimulationResult.Mtsf.Mtsf as Mtsf
 import Plugins.SimulationResult.Mtsf.pyMtsf as pyMtsf
 import Plugins.SimulationResult.Mtsf.MtsfFmi as MtsfFmi
+import Plugins.SimulationResult.DymolaMat.DymolaMatWriter as DymolaMatWriter
 
 
 from Plugins.Algorithms.Integrator.Sundials.SundialsIntegrators import SundialsCVode, SundialsIDA
@@ -91,11 +92,11 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             self.interface = None
             self.description = FMIDescription.FMIDescription(None)
         else:
-            self.interface = FMUInterface.FMUInterface(modelFileName[0], self, loggingOn)
+            self.interface = FMUInterface.createFMUInterface(modelFileName[0], self, loggingOn, FMUInterface.fmi2ModelExchange)
             self.description = self.interface.description
 
         # modelName will not be used, because the modelName of FMIDescription is used
-        Plugins.Simulator.SimulatorBase.Model.__init__(self, self.description.modelName, modelFileName, 'FMU1.0', config)
+        Plugins.Simulator.SimulatorBase.Model.__init__(self, self.description.modelName, modelFileName, 'FMU2.0' if self.description.fmiVersion == '2.0' else 'FMU1.0', config)
 
         # Dummy object to get properties
         self.integrationResults = Mtsf.Results('')
@@ -119,9 +120,12 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
 
     def _setDefaultStartValues(self):
         ''' Reads given start values from FMI model description and sets variables accordingly
+            (in FMI 2.0 constants and the independent variable cannot be set)
         '''
         for index in self.description.scalarVariables:
             if self.description.scalarVariables[index].type.start != None:
+                if self.description.fmiVersion == '2.0' and (self.description.scalarVariables[index].variability == 'constant' or self.description.scalarVariables[index].causality == 'independent'):
+                    continue
                 self.setValue(index, self.description.scalarVariables[index].type.start)
 
     def setValue(self, valueName, valueValue):
@@ -348,15 +352,25 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             modelVariables.allSeries[1].initialRows = max(nGridPoints, modelVariables.allSeries[2].initialRows)  # Continuous
 
             # Create result object
-            mtsf = Mtsf.Results(settings.resultFileName,
-                               modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
-            if not mtsf.isAvailable:
+            if settings.resultFileExtension == 'mat':
+                results = DymolaMatWriter.Results(settings.resultFileName,
+                                   modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+                self._resultFile = results._writer
+            else:
+                layout = pyMtsf.DatasetLayout(shuffle=settings.resultFileShuffle, compression=settings.resultFileCompression,
+                                              compressionLevel=settings.resultFileCompressionLevel,
+                                              pyramidFactor=settings.resultFilePyramidFactor)
+                results = Mtsf.Results(settings.resultFileName,
+                                   modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations, layout,
+                                   settings.resultFileBackgroundBuffers)
+                self._resultFile = results._mtsf
+            if not results.isAvailable:
                 print("Result file " + settings.resultFileName + " cannot be opened for write access.\n")
                 self.integrationResults = Plugins.SimulationResult.IntegrationResults.Results()
                 return False
 
             # Create fmi reference lists in categories
-            for series in mtsf._mtsf.results.series.values():
+            for series in self._resultFile.results.series.values():
                 for category in series.category.values():
                     category.references = FMUInterface.createfmiReferenceVector(category.nColumn)
                     category.iReferences = -1
@@ -382,7 +396,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                         variable.category.independentVariableColumn = variable.columnIndex
                         variable.category.references[variable.category.iReferences] = 0
 
-            for series in mtsf._mtsf.results.series.values():
+            for series in self._resultFile.results.series.values():
                 if hasattr(series, 'independentVariableCategory'):
                     category = series.independentVariableCategory
                     column = category.independentVariableColumn
@@ -396,7 +410,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                         category.references = numpy.array([])
                 else:
                     series.independentVariableCategory = None
-            self.integrationResults = mtsf
+            self.integrationResults = results
             return True
 
         def writeResults(seriesName, time):
@@ -405,7 +419,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             '''
             if hasattr(self, 'integrationResultFileSemaphore'):
                 self.integrationResultFileSemaphore.acquire()
-            series = self.integrationResults._mtsf.results.series[seriesName]
+            series = self._resultFile.results.series[seriesName]
             for category in series.category.values():
                 if category.references.shape[0] > 0:
                     values = category.fmiGetValues(category.references)
@@ -416,6 +430,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                     index = category.independentVariableColumn
                     values[index] = time
                 category.writeData(values)
+            series.reachedTime = time
             if hasattr(self, 'integrationResultFileSemaphore'):
                 self.integrationResultFileSemaphore.release()
 
@@ -509,7 +524,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             # so we handle it here after the event updates
             handle_result(solver.t_cur, solver.y_cur)
 
-            if 'Discrete' in self.integrationResults._mtsf.results.series:
+            if 'Discrete' in self._resultFile.results.series:
                 # Write discrete Variables
                 writeResults('Discrete', solver.t_cur)
 
@@ -559,6 +574,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         self.integrationStatistics.nTimeEvents = 0
         self.integrationStatistics.nStateEvents = 0
         self.integrationStatistics.nGridPoints = 0
+        self.integrationStatistics.nResultFileResizes = 0
         self.integrationStatistics.reachedTime = Tstart
 
         # Run the integration
@@ -569,10 +585,10 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
             print("Model initialization failed. fmiStatus = " + str(status))
             return
 
-        if 'Fixed' in self.integrationResults._mtsf.results.series:
+        if 'Fixed' in self._resultFile.results.series:
             # Write parameter values
             writeResults('Fixed', Tstart)
-        if 'Discrete' in self.integrationResults._mtsf.results.series:
+        if 'Discrete' in self._resultFile.results.series:
             # Write discrete variables
             writeResults('Discrete', Tstart)
 
@@ -642,6 +658,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
         else:
             simulator.simulate(Tend, nIntervals, gridWidth)
 
+        self.integrationStatistics.nResultFileResizes = self._resultFile.resizeCount()
         return
 
     def getAvailableIntegrationAlgorithms(self):
@@ -687,6 +704,8 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
                 variableAttribute += '\nVariability:' + chr(9) + v.variability
             if v.causality is not None:
                 variableAttribute += '\nCausality:' + chr(9) + v.causality
+            if v.initial is not None:
+                variableAttribute += '\nInitial:' + chr(9) + v.initial
             if v.alias is not None:
                 if v.alias.lower() is not 'noalias':
                     variableAttribute += '\nAlias:' + chr(9) + v.alias
@@ -337,7 +337,7 @@ class Model(Plugins.Simulator.SimulatorBase.Model):
 
 # Adapted from DymolaMat/DymolaMat.py for OpenModelica #
 
-import scipy.io, string
+import scipy.io
 
 # Exception classes
 class FileDoesNotExist     (Exception): pass
@@ -345,12 +345,9 @@ class WrongResultFile(Exception): pass
 
 
 def charArrayToStrList(charArray):
-    """Transform a numpy character array to a list of strings
+    """Transform a numpy character array to a list of strings, see DymolaMat.charArrayToStrList
     """
-    strList = [];
-    for item in charArray:
-        strList.append(str(string.rstrip(string.join(item, ""))))
-    return strList;
+    return DymolaMat.charArrayToStrList(charArray)
 
 
 def loadResultFileInit(fileName):
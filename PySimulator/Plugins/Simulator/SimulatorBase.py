@@ -71,6 +71,11 @@ class IntegrationSettings():
         self.resultFileName = ''  # e.g. 'Rectifier.mtsf'
         self.resultFileExtension = ''  # e.g. 'mtsf', 'mat'
         self.resultFileFormat = ''  # e.g. 'single', 'double', etc.?
+        self.resultFileCompression = 'gzip'  # or 'lzf' or None; used for 'mtsf'
+        self.resultFileCompressionLevel = None  # 0 ... 9 for 'gzip', None means default level
+        self.resultFileShuffle = False  # Shuffle filter before compression
+        self.resultFileBackgroundBuffers = 2  # Full buffers that may wait for the background writer; 0: write synchronously; used for 'mtsf'
+        self.resultFilePyramidFactor = None  # Rows per bin factor of the min/max levels for plotting long results, e.g. 16; None: no levels; used for 'mtsf'
         self.resultFileIncludeInputs = True
         self.resultFileIncludeOutputs = True
         self.resultFileIncludeStates = True
@@ -92,6 +97,7 @@ class IntegrationStatistics():
         self.nTimeEvents = None  # Integer
         self.nStateEvents = None  # Integer
         self.nGridPoints = None  # Integer
+        self.nResultFileResizes = None  # Integer
         self.cpuTime = None  # Real
         self.finished = None  # Boolean
 
@@ -387,3 +393,25 @@ class Model():
 
 def prepareSimulationList(fileName, name, config):
     pass
+
+
+def readResultVariableTree(fileName, resultCache=None):
+    ''' Opens the result file fileName, generates its variable tree (see Model.setVariableTree)
+        and closes the file again. This is done in worker processes to open several
+        result files in parallel, because the variable tree is picklable, but the result object is not.
+        If resultCache (IntegrationResults.ResultCache) is given, the parsed data of text result files
+        is stored in it, so that the file can be reopened without parsing it again.
+        Returns the tuple (fileName, variableTree, errorMessage); variableTree is None on errors.
+    '''
+    if resultCache is not None:
+        IntegrationResults.resultCache = resultCache
+    try:
+        model = Model(None, None, 'None', None)
+        model.loadResultFile(fileName)
+        model.setVariableTree()
+        model.close()
+    except Exception as e:
+        if hasattr(e, 'msg'):
+            return fileName, None, e.msg
+        return fileName, None, str(e)
+    return fileName, model.variableTree, None
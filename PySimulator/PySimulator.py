@@ -202,6 +202,12 @@ class SimulatorGui(QtGui.QMainWindow):
                 self.config['Plugins'][plugin] = {}
         self.config.write()
 
+        if self.config['PySimulator'].has_key('resultCacheDirectory'):
+            # Cache for the data of text result files
+            import Plugins.SimulationResult.IntegrationResults
+            maxSize = int(self.config['PySimulator'].get('resultCacheSize', 2147483648))
+            Plugins.SimulationResult.IntegrationResults.resultCache = Plugins.SimulationResult.IntegrationResults.ResultCache(self.config['PySimulator']['resultCacheDirectory'], maxSize)
+
         os.chdir(self.config['PySimulator']['workingDirectory'])
 
     def createConsoleWindow(self):
@@ -389,28 +395,96 @@ class SimulatorGui(QtGui.QMainWindow):
     def openResultFile(self, fileName):
         ''' Load a result file and display variables in variable browser '''
 
-        import Plugins.Simulator.SimulatorBase
         if fileName == '':
             return
 
         self.setEnabled(False)
         self._loadingFileInfo()
+        self._addResultFile(fileName)
+        self.setEnabled(True)
+        self._chDir(os.path.dirname(fileName))
+
+    def openResultFiles(self, fileNames):
+        ''' Load several result files in parallel: the files are read and their variable trees
+            are generated by a pool of worker processes. Each result file is added to the
+            variable browser as soon as its worker has finished, see _addLoadedResultFiles.
+        '''
+        import multiprocessing
+        import tempfile
+        import Plugins.Simulator.SimulatorBase
+        import Plugins.SimulationResult.IntegrationResults
+        fileNames = [fileName for fileName in fileNames if fileName != '']
+        if len(fileNames) < 2:
+            for fileName in fileNames:
+                self.openResultFile(fileName)
+            return
+
+        print("Loading " + str(len(fileNames)) + " result files ...")
+        # The workers store the parsed data of text result files in a result cache, so that
+        # reopening the files in _addLoadedResultFiles only loads the cached data. The cache is passed
+        # explicitly, because the workers do not inherit the module state on all platforms.
+        # If no result cache is configured, a private one is used for these files and deleted afterwards.
+        cache = Plugins.SimulationResult.IntegrationResults.resultCache
+        if cache is None:
+            cache = Plugins.SimulationResult.IntegrationResults.ResultCache(tempfile.mkdtemp(prefix='PySimulatorResultCache'), mmapMode=None)
+        pool = multiprocessing.Pool(min(len(fileNames), multiprocessing.cpu_count()))
+        pending = [pool.apply_async(Plugins.Simulator.SimulatorBase.readResultVariableTree, (fileName, cache)) for fileName in fileNames]
+        pool.close()
+        timer = QtCore.QTimer(self)
+        timer.timeout.connect(partial(self._addLoadedResultFiles, pool, pending, timer, cache))
+        timer.start(50)
+        self._chDir(os.path.dirname(fileNames[-1]))
+
+    def _addLoadedResultFiles(self, pool, pending, timer, cache):
+        ''' Adds the result files whose workers have finished (see openResultFiles) to the variable browser.
+            The data parsed by the workers is taken from cache (IntegrationResults.ResultCache).
+        '''
+        import shutil
+        import Plugins.SimulationResult.IntegrationResults
+        configuredCache = Plugins.SimulationResult.IntegrationResults.resultCache
+        Plugins.SimulationResult.IntegrationResults.resultCache = cache
+        try:
+            for asyncResult in [x for x in pending if x.ready()]:
+                pending.remove(asyncResult)
+                try:
+                    fileName, variableTree, message = asyncResult.get()
+                except Exception as e:
+                    print e
+                    continue
+                if variableTree is None:
+                    print message
+                else:
+                    self._addResultFile(fileName, variableTree)
+        finally:
+            Plugins.SimulationResult.IntegrationResults.resultCache = configuredCache
+        if len(pending) == 0:
+            timer.stop()
+            pool.join()
+            if cache is not configuredCache:
+                # Private cache of openResultFiles; its data has been loaded into memory
+                shutil.rmtree(cache.directory, ignore_errors=True)
+            print(" done\n")
+
+    def _addResultFile(self, fileName, variableTree=None):
+        ''' Opens the result file fileName and adds it as a model to the variable browser.
+            variableTree is the already generated variable tree of the result file (None: generate it).
+        '''
+        import Plugins.Simulator.SimulatorBase
         sp = string.rsplit(fileName, '.', 1)
         modelName = string.rsplit(sp[0], '/', 1)[1]
         try:
             model = Plugins.Simulator.SimulatorBase.Model(modelName, None, 'None', self.config)
             model.loadResultFile(fileName)
+            if variableTree is not None:
+                model.variableTree = variableTree
             model.integrationResultFileSemaphore = threading.Semaphore()
-            self._newModel(model)
+            self._newModel(model, variableTree is None)
         except Exception as e:
             if hasattr(e, 'msg'):
                 print e.msg
             else:
                 print e
 
-        self.setEnabled(True)
-        self._chDir(os.path.dirname(fileName))
-
     def _openResultFileMenu(self):
         ''' Load a Result file '''
         formats = 'All formats ('
@@ -423,8 +497,7 @@ class SimulatorGui(QtGui.QMainWindow):
         formats += ');;' + formats2
         (fileNames, trash) = QtGui.QFileDialog().getOpenFileNames(self, 'Open Result File', os.getcwd(), formats)
         import locale
-        for fileName in fileNames:
-            self.openResultFile(fileName.encode(locale.getpreferredencoding()).replace('\\', '/'))
+        self.openResultFiles([fileName.encode(locale.getpreferredencoding()).replace('\\', '/') for fileName in fileNames])
 
     def _loadingFileInfo(self):
         ''' Shows a label 'Loading file...' '''
@@ -505,8 +578,9 @@ class SimulatorGui(QtGui.QMainWindow):
         '''
         for container in self.plotContainers:
             for plotw in container.findChildren(plotWidget.PlotWidget):
-                for var in (x[1] for x in plotw.variables if x[0] == self.models[modelName]):
-                    plotw.updateVariable(self.models[modelName], var)
+                variables = [x[1] for x in plotw.variables if x[0] == self.models[modelName]]
+                if len(variables) > 0:
+                    plotw.updateVariables(self.models[modelName], variables)
 
     def _variableCheckChanged(self, item):
         ''' This function is normally called  when the user checks/unchecks a
@@ -542,7 +616,7 @@ class SimulatorGui(QtGui.QMainWindow):
         model.numberedModelName = '%01i:' % number + model.name
         model.integrationSettings.resultFileName = str(model.name) + '_%01i' % number + '.' + model.integrationSettings.resultFileExtension
 
-    def _newModel(self, model):
+    def _newModel(self, model, generateVariableTree=True):
         ''' Handles to add a new given model into the framework '''
         # Set the numbered model name
         self.setNumberedStuff(model)
@@ -553,7 +627,7 @@ class SimulatorGui(QtGui.QMainWindow):
         # Include the model in the model dictionary
         self.models[model.numberedModelName] = model
         # Add the model to the variables browser
-        self.nvb.addModel(model)
+        self.nvb.addModel(model, generateVariableTree=generateVariableTree)
 
     def duplicateModel(self, modelName):
         ''' Duplicates the given model '''
@@ -653,4 +727,6 @@ def start_PySimulator():
         app.exec_()
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     start_PySimulator()
@@ -0,0 +1,122 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+'''
+Result files with random values for the variables of an example FMU, written like
+the FMU simulators do, for the tests of the result file plugins.
+'''
+
+import os
+import zipfile
+
+import numpy
+
+from Plugins.Simulator.FMUSimulator.FMIDescription import FMIDescription
+import Plugins.SimulationResult.DymolaMat.DymolaMatWriter as DymolaMatWriter
+import Plugins.SimulationResult.Mtsf.MtsfFmi as MtsfFmi
+import Plugins.SimulationResult.Mtsf.pyMtsf as pyMtsf
+
+exampleFmu = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Examples', 'FMU1.0', 'Modelica_Electrical_Analog_Examples_Rectifier.fmu')
+
+
+def createVariables():
+    ''' Returns the tuple (modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+        of the variables of the example FMU (see MtsfFmi.convertFromFmi)
+    '''
+    fmu = zipfile.ZipFile(exampleFmu)
+    try:
+        description = FMIDescription(fmu.open('modelDescription.xml'))
+    finally:
+        fmu.close()
+    (modelDescription, modelVariables, simpleTypes, units, enumerations) = MtsfFmi.convertFromFmi('', description)
+    experimentSetup = pyMtsf.ExperimentSetup(startTime=0.0, stopTime=1.0, algorithm='', relativeTolerance=1e-4,
+                                             author='', description='', generationDateAndTime='',
+                                             generationTool='PySimulator', machine='', cpuTime='')
+    return modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations
+
+
+class ResultWriter:
+    ''' Writes random values of all categories of the result file resultFile (pyMtsf.MTSF or DymolaMatWriter.MatWriter):
+        the series Fixed once, the series Discrete at every 7th row and the series Continuous at every row.
+        The written values are kept to compute the expected results of the variables, see expected.
+    '''
+    def __init__(self, resultFile, modelVariables, seed=0):
+        self.resultFile = resultFile
+        self.modelVariables = modelVariables
+        self.random = numpy.random.RandomState(seed)
+        self.values = dict()  # Category -> list of the rows written
+        self.held = dict()  # Category of a series with independent variable -> its last values at each row of Continuous
+        self.nRows = 0
+
+    def _write(self, seriesName, time):
+        series = self.resultFile.results.series[seriesName]
+        for category in series.category.values():
+            values = numpy.round(self.random.rand(category.nColumn) * 100.0)
+            if series.independentVariable is not None:
+                timeVariable = self.modelVariables.variable[series.independentVariable]
+                if timeVariable.category is category:
+                    values[timeVariable.columnIndex] = time
+            category.writeData(values)
+            self.values.setdefault(category, []).append(values)
+
+    def write(self, nRows):
+        ''' Writes nRows rows of the series Continuous
+        '''
+        series = self.resultFile.results.series
+        if self.nRows == 0:
+            self._write('Fixed', 0.0)
+        for i in xrange(self.nRows, self.nRows + nRows):
+            time = 0.001 * i
+            if 'Discrete' in series and i % 7 == 0:
+                self._write('Discrete', time)
+            self._write('Continuous', time)
+            for seriesName in series:
+                if series[seriesName].independentVariable is not None:
+                    for category in series[seriesName].category.values():
+                        self.held.setdefault(category, []).append(self.values[category][-1])
+        self.nRows += nRows
+
+    def expected(self, variableName, held=True):
+        ''' Returns the values written for the variable: a scalar for the series Fixed, otherwise a vector
+            with the values at the rows of the series Continuous (held=True) or at the rows of its series
+        '''
+        variable = self.modelVariables.variable[variableName]
+        category = variable.category
+        if category.series.independentVariable is None:
+            y = self.values[category][0][variable.columnIndex]
+        elif held:
+            y = numpy.array(self.held[category])[:, variable.columnIndex]
+        else:
+            y = numpy.array(self.values[category])[:, variable.columnIndex]
+        return -y if variable.aliasNegated else y
+
+
+def writeDymolaMatFile(fileName, nRows, seed=0):
+    ''' Writes a Dymola result file with nRows rows of random values of the example FMU
+        by DymolaMatWriter and returns the ResultWriter.
+    '''
+    modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations = createVariables()
+    results = DymolaMatWriter.Results(fileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+    writer = ResultWriter(results._writer, modelVariables, seed)
+    writer.write(nRows)
+    results.close()
+    return writer
@@ -0,0 +1,126 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import unittest
+
+import numpy
+import scipy.sparse
+
+from Plugins.Algorithms.Jacobian.ColoredJacobian import ColoredJacobian, colorColumns, probeSparsity
+
+
+def denseDifferences(f, x, h):
+    ''' Dense forward-difference Jacobian with one evaluation of f per column
+    '''
+    fx = f(x)
+    J = numpy.empty((len(fx), len(x)))
+    for j in xrange(len(x)):
+        x1 = x.copy()
+        x1[j] += h[j]
+        J[:, j] = (f(x1) - fx) / h[j]
+    return J
+
+
+class SparseFunction:
+    ''' Nonlinear function with a random sparsity pattern of its Jacobian
+        and a counter of its evaluations
+    '''
+    def __init__(self, nRows, nColumns, density, seed=0):
+        random = numpy.random.RandomState(seed)
+        mask = random.rand(nRows, nColumns) < density
+        # Every row depends on at least one column
+        mask[numpy.arange(nRows), random.randint(0, nColumns, nRows)] = True
+        (self.rows, self.columns) = numpy.nonzero(mask)
+        self.A = numpy.where(mask, random.randn(nRows, nColumns), 0.0)
+        self.nEvaluations = 0
+
+    def __call__(self, x):
+        self.nEvaluations += 1
+        return numpy.dot(self.A, numpy.sin(x)) + numpy.dot(self.A ** 2, x ** 2)
+
+    def jacobian(self, x):
+        return self.A * numpy.cos(x) + 2.0 * self.A ** 2 * x
+
+
+class ColoredJacobianTest(unittest.TestCase):
+    ''' ColoredJacobian gives the same Jacobian as dense finite differences
+        with fewer evaluations of the function
+    '''
+    def setUp(self):
+        self.f = SparseFunction(60, 50, 0.05)
+        self.x = numpy.random.RandomState(1).randn(50)
+
+    def testColors(self):
+        color, nColors = colorColumns(self.f.rows, self.f.columns, 50)
+        self.assertEqual(len(color), 50)
+        self.assertEqual(nColors, color.max() + 1)
+        # Columns of the same color have no nonzero element in the same row
+        for i in xrange(60):
+            rowColors = color[self.f.columns[self.f.rows == i]]
+            self.assertEqual(len(rowColors), len(numpy.unique(rowColors)))
+        self.assertTrue(nColors < 50)
+
+    def testFiniteDifferences(self):
+        jacobian = ColoredJacobian(60, 50, self.f.rows, self.f.columns)
+        self.assertEqual(jacobian.nnz, len(self.f.rows))
+        h = numpy.finfo(numpy.float).eps ** 0.5 * numpy.maximum(numpy.abs(self.x), 1.0)
+        h = (self.x + h) - self.x
+        expected = denseDifferences(self.f, self.x, h)
+
+        self.f.nEvaluations = 0
+        values = jacobian.finiteDifferences(self.f, self.x)
+        self.assertEqual(self.f.nEvaluations, jacobian.nColors + 1)
+        numpy.testing.assert_allclose(jacobian.toDense(values), expected, rtol=1e-12, atol=1e-12)
+        numpy.testing.assert_allclose(jacobian.toDense(values), self.f.jacobian(self.x), rtol=1e-6, atol=1e-6)
+
+        values = jacobian.finiteDifferences(self.f, self.x, central=True)
+        numpy.testing.assert_allclose(jacobian.toDense(values), self.f.jacobian(self.x), rtol=1e-8, atol=1e-8)
+
+    def testExpand(self):
+        jacobian = ColoredJacobian(60, 50, self.f.rows, self.f.columns)
+        J = self.f.jacobian(self.x)
+        compressed = numpy.column_stack([numpy.dot(J, seed) for seed in jacobian.seeds])
+        values = jacobian.expand(compressed)
+        numpy.testing.assert_array_equal(jacobian.toDense(values), J)
+        sparse = jacobian.toSparse(values)
+        self.assertTrue(scipy.sparse.isspmatrix_csc(sparse))
+        numpy.testing.assert_array_equal(sparse.toarray(), J)
+
+    def testDense(self):
+        # Without a sparsity pattern every column has its own color
+        jacobian = ColoredJacobian(60, 50)
+        self.assertEqual((jacobian.nnz, jacobian.nColors), (60 * 50, 50))
+        h = numpy.finfo(numpy.float).eps ** 0.5 * numpy.maximum(numpy.abs(self.x), 1.0)
+        h = (self.x + h) - self.x
+        values = jacobian.finiteDifferences(self.f, self.x)
+        numpy.testing.assert_allclose(jacobian.toDense(values), denseDifferences(self.f, self.x, h), rtol=1e-12, atol=1e-12)
+
+    def testProbeSparsity(self):
+        rows, columns = probeSparsity(self.f, self.x)
+        jacobian = ColoredJacobian(60, 50, rows, columns)
+        expected = ColoredJacobian(60, 50, self.f.rows, self.f.columns)
+        numpy.testing.assert_array_equal(jacobian.rows, expected.rows)
+        numpy.testing.assert_array_equal(jacobian.columns, expected.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
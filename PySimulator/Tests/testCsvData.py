@@ -0,0 +1,101 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+import numpy
+
+import Plugins.SimulationResult.IntegrationResults as IntegrationResults
+import Plugins.SimulationResult.Csv.Csv as Csv
+
+
+class LoadCsvDataTest(unittest.TestCase):
+    ''' IntegrationResults.loadCsvData gives the same result as numpy.loadtxt
+    '''
+    def load(self, text, delimiter=';', blockSize=64, nColumns=0):
+        return IntegrationResults.loadCsvData(StringIO.StringIO(text), delimiter, blockSize, nColumns=nColumns)
+
+    def assertLikeLoadtxt(self, text, delimiter=';'):
+        expected = numpy.loadtxt(text.splitlines(), delimiter=delimiter, ndmin=2)
+        for blockSize in [1, 7, 64, 4194304]:
+            data = self.load(text, delimiter, blockSize)
+            numpy.testing.assert_array_equal(data, expected)
+
+    def testRandomValues(self):
+        random = numpy.random.RandomState(0)
+        values = random.randn(500, 4) * 10.0 ** random.randint(-20, 20, (500, 4))
+        for delimiter in [';', ',', '\t']:
+            lines = [delimiter.join(repr(x) for x in row) for row in values]
+            self.assertLikeLoadtxt('\n'.join(lines) + '\n', delimiter)
+            self.assertLikeLoadtxt('\r\n'.join(lines), delimiter)
+
+    def testSpecialLines(self):
+        # Empty lines, blanks, integers and exponents
+        self.assertLikeLoadtxt('1;2;3\n\n4; 5 ;6\n\n7;8e-3;-9E+2\n')
+        self.assertLikeLoadtxt('0.5\n1.5\n')
+
+    def testRaggedLines(self):
+        # The same total number of values as 3 lines of 3 columns
+        for text in ['1;2;3\n4;5\n6;7;8;9\n', '1;2;3\n4;5;6;7\n8;9\n', '1;2\n3;4;5\n6;7;8;9\n']:
+            self.assertRaises(ValueError, numpy.loadtxt, text.splitlines(), delimiter=';')
+            for blockSize in [7, 64]:
+                self.assertRaises(ValueError, self.load, text, ';', blockSize)
+
+    def testEmptyData(self):
+        self.assertEqual(self.load('', nColumns=3).shape, (0, 3))
+        self.assertEqual(self.load('\n  \n', nColumns=2).shape, (0, 2))
+
+
+class CsvResultsTest(unittest.TestCase):
+    ''' Csv.Results of files with and without numerical rows
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def results(self, text):
+        fileName = os.path.join(self.directory, 'results.csv')
+        with open(fileName, 'wb') as f:
+            f.write(text)
+        return Csv.Results(fileName)
+
+    def testValues(self):
+        results = self.results('time;x;der(a.y)\n0.0;1.0;2.0\n0.5;3.0;4.0\n')
+        t, y, method = results.readData('a.der(y)')
+        numpy.testing.assert_array_equal(t, [0.0, 0.5])
+        numpy.testing.assert_array_equal(y, [2.0, 4.0])
+
+    def testHeaderOnly(self):
+        results = self.results('time;x;y\n')
+        t, y, method = results.readData('x')
+        self.assertEqual(len(t), 0)
+        self.assertEqual(len(y), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy
+
+import Plugins.SimulationResult.DymolaMat.DymolaMat as DymolaMat
+import Plugins.SimulationResult.DymolaMat.DymolaMatWriter as DymolaMatWriter
+from Tests import ExampleResults
+
+
+class DymolaMatWriterTest(unittest.TestCase):
+    ''' Files written by DymolaMatWriter are read back by DymolaMat.Results
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.directory, 'Rectifier.mat')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertResults(self, results, writer):
+        nVariables = 0
+        for name, variable in writer.modelVariables.variable.iteritems():
+            if name == 'TimeDiscrete':
+                # Not stored, Discrete is sampled at the rows of Continuous
+                continue
+            t, y, method = results.readData(name)
+            expected = writer.expected(name)
+            if variable.category.series.independentVariable is None:
+                self.assertEqual(y[0], expected, name)
+            else:
+                numpy.testing.assert_array_equal(y, expected, name)
+                numpy.testing.assert_array_equal(t, 0.001 * numpy.arange(writer.nRows), name)
+            nVariables += 1
+        self.assertEqual(nVariables, len(results.getVariables()))
+
+    def testRoundTrip(self):
+        writer = ExampleResults.writeDymolaMatFile(self.fileName, 250)
+        self.assertTrue(any(variable.aliasNegated for variable in writer.modelVariables.variable.itervalues()))
+        for lazy in [True, False]:
+            results = DymolaMat.Results(self.fileName, lazy)
+            try:
+                self.assertResults(results, writer)
+            finally:
+                results.close()
+
+    def testReadWhileWriting(self):
+        modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations = ExampleResults.createVariables()
+        results = DymolaMatWriter.Results(self.fileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+        writer = ExampleResults.ResultWriter(results._writer, modelVariables)
+        names = [name for name, variable in modelVariables.variable.iteritems()
+                 if variable.category.series.independentVariable is not None and name != 'TimeDiscrete']
+        # A negated alias and a variable of each category
+        selected = [name for name in names if modelVariables.variable[name].aliasNegated][:1]
+        for category in set(modelVariables.variable[name].category for name in names):
+            selected.extend([name for name in names if modelVariables.variable[name].category is category][:2])
+
+        writer.write(1)
+        # The simulation writes in another thread, while the results are read like by an online plot
+        checkInterval = sys.getcheckinterval()
+        sys.setcheckinterval(10)
+        try:
+            thread = threading.Thread(target=writer.write, args=(20000,))
+            thread.start()
+            read = dict((name, []) for name in selected)
+            while True:
+                finished = not thread.is_alive()
+                for name in selected:
+                    t, y, method = results.readData(name)
+                    self.assertEqual(len(t), len(y))
+                    read[name].append((t.copy(), y.copy()))
+                if finished:
+                    break
+            thread.join()
+        finally:
+            sys.setcheckinterval(checkInterval)
+
+        try:
+            # The values read are the first rows written
+            time = 0.001 * numpy.arange(writer.nRows)
+            for name in selected:
+                expected = writer.expected(name)
+                for t, y in read[name]:
+                    numpy.testing.assert_array_equal(t, time[:len(t)], name)
+                    numpy.testing.assert_array_equal(y, expected[:len(y)], name)
+                self.assertEqual(len(read[name][-1][0]), writer.nRows)
+            self.assertResults(results, writer)
+        finally:
+            results.close()
+        results = DymolaMat.Results(self.fileName)
+        try:
+            self.assertResults(results, writer)
+        finally:
+            results.close()
+
+if __name__ == '__main__':
+    unittest.main()
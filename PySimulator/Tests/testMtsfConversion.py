@@ -0,0 +1,83 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import Plugins.SimulationResult.DymolaMat.DymolaMat as DymolaMat
+import Plugins.SimulationResult.Mtsf.Mtsf as Mtsf
+from Tests import ExampleResults
+
+
+class ConvertFromDymolaMatFileTest(unittest.TestCase):
+    ''' Mtsf.convertFromDymolaMatFile keeps the values, aliases and units of a Dymola result file
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.matFileName = os.path.join(self.directory, 'Rectifier.mat')
+        self.writer = ExampleResults.writeDymolaMatFile(self.matFileName, 300)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testConversion(self):
+        # Small blocks, so that the trajectories are copied in several blocks
+        mtsfFileName = Mtsf.convertFromDymolaMatFile(self.matFileName, os.path.join(self.directory, 'Rectifier.mtsf'), blockBytes=4096)
+        mat = DymolaMat.Results(self.matFileName)
+        mtsf = Mtsf.Results(mtsfFileName)
+        try:
+            matVariables = mat.getVariables()
+            mtsfVariables = mtsf.getVariables()
+            self.assertEqual(sorted(mtsfVariables.keys()), sorted(matVariables.keys()))
+            for name in matVariables:
+                t, y, method = mtsf.readData(name)
+                matT, matY, matMethod = mat.readData(name)
+                numpy.testing.assert_array_equal(y, matY, name)
+                if matT is not None:
+                    numpy.testing.assert_array_equal(t, matT, name)
+                self.assertEqual(mtsfVariables[name].unit, matVariables[name].unit, name)
+        finally:
+            mtsf.close()
+            mat.close()
+
+    def testNegatedAliases(self):
+        mtsfFileName = Mtsf.convertFromDymolaMatFile(self.matFileName)
+        mtsf = Mtsf.Results(mtsfFileName)
+        try:
+            nNegated = 0
+            for name, variable in self.writer.modelVariables.variable.iteritems():
+                if variable.aliasNegated and variable.category.series.independentVariable is not None:
+                    t, y, method = mtsf.readData(name)
+                    numpy.testing.assert_array_equal(y, self.writer.expected(name), name)
+                    numpy.testing.assert_array_equal(y, -mtsf.readData(variable.aliasName)[1], name)
+                    nNegated += 1
+            self.assertTrue(nNegated > 0)
+        finally:
+            mtsf.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy
+
+import Plugins.SimulationResult.Mtsf.Mtsf as Mtsf
+import Plugins.SimulationResult.Mtsf.pyMtsf as pyMtsf
+from Tests import ExampleResults
+
+
+class PyramidTest(unittest.TestCase):
+    ''' Envelopes of the downsampled data in /Pyramid of an MTSF file
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fileName = os.path.join(self.directory, 'Rectifier.mtsf')
+        modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations = ExampleResults.createVariables()
+        results = Mtsf.Results(self.fileName, modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations)
+        self.writer = ExampleResults.ResultWriter(results._mtsf, modelVariables)
+        self.writer.write(5000)
+        results.close()
+
+        # An increasing signal in the column of a variable with a negated alias and a decreasing signal
+        variables = modelVariables.variable
+        self.negated = [name for name, variable in variables.iteritems()
+                        if variable.aliasNegated and variable.category.series.name == 'Continuous'][0]
+        self.increasing = variables[self.negated].aliasName
+        category = variables[self.increasing].category
+        self.decreasing, self.random = [name for name, variable in sorted(variables.iteritems()) if variable.category is category
+                                        and variable.aliasName is None and name not in (self.increasing, 'Time')][:2]
+        f = h5py.File(self.fileName, 'a')
+        try:
+            dataset = f['Results/Continuous'][category.name]
+            dataset[:, variables[self.increasing].columnIndex] = numpy.arange(5000) * 0.5
+            dataset[:, variables[self.decreasing].columnIndex] = numpy.arange(5000) * -0.25
+        finally:
+            f.close()
+        pyMtsf.buildPyramid(self.fileName, factor=4, minBins=16)
+        self.results = Mtsf.Results(self.fileName)
+
+    def tearDown(self):
+        self.results.close()
+        shutil.rmtree(self.directory)
+
+    def testMonotoneSignals(self):
+        self.assertTrue(self.results.hasDownsampledData(self.increasing))
+        for nPoints in [10, 40, 100, 333, 1000, 4000]:
+            for tStart, tStop in [(None, None), (0.1, 4.5), (1.234, 1.9)]:
+                t, y, method = self.results.readData(self.increasing, tStart, tStop, nPoints)
+                self.assertTrue(len(y) <= nPoints + 2)
+                self.assertTrue(numpy.all(numpy.diff(t) >= 0))
+                self.assertTrue(numpy.all(numpy.diff(y) >= 0), (nPoints, tStart, tStop))
+                t2, y2, method = self.results.readData(self.negated, tStart, tStop, nPoints)
+                numpy.testing.assert_array_equal(t2, t)
+                numpy.testing.assert_array_equal(y2, -y)
+                t3, y3, method = self.results.readData(self.decreasing, tStart, tStop, nPoints)
+                numpy.testing.assert_array_equal(t3, t)
+                numpy.testing.assert_array_equal(y3, -0.5 * y)
+
+    def testEnvelope(self):
+        x = self.writer.expected(self.random, False)
+        for nPoints in [10, 100, 1000]:
+            t, y, method = self.results.readData(self.random, None, None, nPoints)
+            self.assertEqual(y.max(), x.max())
+            self.assertEqual(y.min(), x.min())
+            # Each bin gives its minimum and maximum in the order of their rows;
+            # the rows of a bin are found by its first and last time
+            time = 0.001 * numpy.arange(len(x))
+            first = numpy.searchsorted(time, t[0::2])
+            last = numpy.searchsorted(time, t[1::2]) + 1
+            self.assertEqual((first[0], last[-1]), (0, len(x)))
+            numpy.testing.assert_array_equal(first[1:], last[:-1])
+            bins = numpy.reshape(y, (len(first), 2))
+            for k in xrange(len(first)):
+                part = x[first[k]:last[k]]
+                self.assertEqual(bins[k].min(), part.min())
+                self.assertEqual(bins[k].max(), part.max())
+                if part.min() != part.max():
+                    self.assertEqual(bins[k, 0] == part.min(), part.argmin() < part.argmax())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import numpy
+
+import Plugins.SimulationResult.Mtsf.Mtsf as Mtsf
+from Tests import ExampleResults
+
+
+class ReadWhileWritingTest(unittest.TestCase):
+    ''' readDataSince and readDataMulti of an MTSF file that is written by another thread
+        return the rows written so far, with times and values of the same length
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkInterval = sys.getcheckinterval()
+        # Switch threads often
+        sys.setcheckinterval(10)
+
+    def tearDown(self):
+        sys.setcheckinterval(self.checkInterval)
+        shutil.rmtree(self.directory)
+
+    def readWhileWriting(self, backgroundBuffers):
+        modelDescription, modelVariables, experimentSetup, simpleTypes, units, enumerations = ExampleResults.createVariables()
+        # Small buffers, so that they are written often
+        for series in modelVariables.allSeries:
+            series.initialRows = 10
+        results = Mtsf.Results(os.path.join(self.directory, 'Rectifier.mtsf'), modelDescription, modelVariables, experimentSetup,
+                               simpleTypes, units, enumerations, backgroundBuffers=backgroundBuffers)
+        writer = ExampleResults.ResultWriter(results._mtsf, modelVariables)
+        names = [name for name, variable in modelVariables.variable.iteritems()
+                 if variable.category.series.name == 'Continuous' and name != 'Time']
+        # A negated alias and a variable of each category
+        selected = [name for name in names if modelVariables.variable[name].aliasNegated][:1]
+        for category in set(modelVariables.variable[name].category for name in names):
+            selected.extend([name for name in names if modelVariables.variable[name].category is category][:2])
+
+        writer.write(1)
+        thread = threading.Thread(target=writer.write, args=(3000,))
+        thread.start()
+        since = dict((name, []) for name in selected)
+        multi = []
+        while True:
+            finished = not thread.is_alive()
+            for name in selected:
+                startRow = sum(len(y) for t, y in since[name])
+                t, y, method = results.readDataSince(name, startRow)
+                if y is not None:
+                    self.assertEqual(len(t), len(y))
+                    since[name].append((t, y))
+            for t, y, method, multiNames in results.readDataMulti(selected, 5):
+                self.assertEqual(len(t), y.shape[0])
+                multi.append((t, y, multiNames))
+            if finished:
+                break
+        thread.join()
+
+        time = 0.001 * numpy.arange(writer.nRows)
+        for name in selected:
+            numpy.testing.assert_array_equal(numpy.concatenate([t for t, y in since[name]]), time, name)
+            numpy.testing.assert_array_equal(numpy.concatenate([y for t, y in since[name]]), writer.expected(name, False), name)
+        for t, y, multiNames in multi:
+            numpy.testing.assert_array_equal(t, time[5:5 + len(t)])
+            for k, name in enumerate(multiNames):
+                numpy.testing.assert_array_equal(y[:, k], writer.expected(name, False)[5:5 + len(t)], name)
+        self.assertEqual(len(multi[-1][0]), writer.nRows - 5)
+        results.close()
+
+    def testSynchronousWriting(self):
+        self.readWhileWriting(0)
+
+    def testBackgroundWriting(self):
+        self.readWhileWriting(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
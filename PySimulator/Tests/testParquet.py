@@ -0,0 +1,131 @@
+'''
+Copyright (C) 2011-2014 German Aerospace Center DLR
+(Deutsches Zentrum fuer Luft- und Raumfahrt e.V.),
+Institute of System Dynamics and Control
+All rights reserved.
+
+This file is part of PySimulator.
+
+PySimulator is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PySimulator is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with PySimulator. If not, see www.gnu.org/licenses.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import Plugins.SimulationResult.DymolaMat.DymolaMat as DymolaMat
+import Plugins.SimulationResult.Parquet.Parquet as Parquet
+from Tests import ExampleResults
+
+
+class ParquetTest(unittest.TestCase):
+    ''' Results of a Dymola result file written by Parquet.writeResults
+        are read back by Parquet.Results (Parquet and Arrow files)
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        matFileName = os.path.join(self.directory, 'Rectifier.mat')
+        self.writer = ExampleResults.writeDymolaMatFile(matFileName, 1000)
+        self.source = DymolaMat.Results(matFileName)
+        self.names = [name for name in self.writer.modelVariables.variable.keys() if name != 'TimeDiscrete']
+
+    def tearDown(self):
+        self.source.close()
+        shutil.rmtree(self.directory)
+
+    def open(self, fileName, rowGroupBytes=67108864):
+        Parquet.writeResults(self.source, os.path.join(self.directory, fileName), rowGroupBytes=rowGroupBytes)
+        results = Parquet.Results(os.path.join(self.directory, fileName))
+        self.addCleanup(results.close)
+        return results
+
+    def assertSameData(self, actual, expected, name):
+        (t, y, method) = actual
+        (t0, y0, method0) = expected
+        self.assertEqual(method, method0, name)
+        if t0 is None:
+            self.assertTrue(t is None, name)
+        else:
+            numpy.testing.assert_array_equal(t, t0, name)
+        numpy.testing.assert_array_equal(y, y0, name)
+
+    def checkRoundTrip(self, fileName):
+        for rowGroupBytes in [67108864, 4096]:
+            results = self.open(fileName, rowGroupBytes)
+            variables = results.getVariables()
+            self.assertEqual(sorted(variables.keys()), sorted(self.source.getVariables().keys()))
+            for name in self.names:
+                variable = self.writer.modelVariables.variable[name]
+                t, y, method = results.readData(name)
+                expected = self.writer.expected(name)
+                if variable.category.series.independentVariable is None:
+                    # Constant series
+                    self.assertTrue(t is None, name)
+                    self.assertEqual(y[0], expected, name)
+                else:
+                    numpy.testing.assert_array_equal(t, 0.001 * numpy.arange(self.writer.nRows), name)
+                    numpy.testing.assert_array_equal(y, expected, name)
+                if variable.aliasNegated:
+                    self.assertTrue(variables[name].sign < 0, name)
+                self.assertSameData((t, y, method), self.source.readData(name), name)
+        return results
+
+    def testParquet(self):
+        self.checkRoundTrip('Rectifier.parquet')
+
+    def testArrow(self):
+        self.checkRoundTrip('Rectifier.arrow')
+
+    def checkPartialReads(self, fileName):
+        # Small row groups, so that whole row groups are skipped
+        results = self.open(fileName, 4096)
+        self.assertTrue(max(len(x) for x in results._rowGroups) > 10)
+        # Negated aliases and variables of each category, including the constant series
+        variables = self.writer.modelVariables.variable
+        selected = [name for name in sorted(self.names) if variables[name].aliasNegated][:2]
+        for category in set(variables[name].category for name in self.names):
+            selected.extend([name for name in sorted(self.names) if variables[name].category is category][:2])
+        for name in selected:
+            for tStart, tStop in [(0.0, 0.0), (0.1234, 0.4567), (0.5, None), (None, 0.3), (0.9995, 2.0), (2.0, 3.0)]:
+                self.assertSameData(results.readData(name, tStart, tStop), self.source.readData(name, tStart, tStop), name)
+            t0, y0, method0 = results.readData(name)
+            for startRow in [0, 1, 99, 100, 101, 500, 999]:
+                t, y, method = results.readDataSince(name, startRow)
+                if startRow >= len(y0):
+                    self.assertTrue(y is None, name)
+                    continue
+                numpy.testing.assert_array_equal(y, y0[startRow:], name)
+                if t0 is not None:
+                    numpy.testing.assert_array_equal(t, t0[startRow:], name)
+        for startRow in [0, 321]:
+            multi = results.readDataMulti(selected, startRow)
+            self.assertEqual(sorted(sum([names for t, y, method, names in multi], [])),
+                             sorted(name for name in selected if startRow < len(results.readData(name)[1])))
+            for t, y, method, names in multi:
+                for k, name in enumerate(names):
+                    t0, y0, method0 = results.readData(name)
+                    numpy.testing.assert_array_equal(y[:, k], y0[startRow:], name)
+
+    def testParquetPartialReads(self):
+        self.checkPartialReads('Rectifier.parquet')
+
+    def testArrowPartialReads(self):
+        self.checkPartialReads('Rectifier.arrow')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -240,11 +240,13 @@ class VariablesBrowser(QtGui.QTreeWidget):
         self.setUpdatesEnabled(True)
         self.update()
 
-    def addModel(self, model, treeRoot=None):
-        ''' Adds the given model to the variable browser
+    def addModel(self, model, treeRoot=None, generateVariableTree=True):
+        ''' Adds the given model to the variable browser. If generateVariableTree
+            is False, model.variableTree has already been generated.
         '''
         self.itemChanged.disconnect()
-        model.setVariableTree()
+        if generateVariableTree:
+            model.setVariableTree()
 
         if treeRoot is None:
             treeRoot = QtGui.QTreeWidgetItem(self)
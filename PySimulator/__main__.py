@@ -23,4 +23,6 @@ along with PySimulator. If not, see www.gnu.org/licenses.
 import PySimulator
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     PySimulator.start_PySimulator()
@@ -35,7 +35,7 @@ from chaco import ticks
 from chaco.tools.api import ZoomTool
 from chaco.tools.pan_tool import PanTool  # there is some bug in in the default Pantools handling of the event "left_up"...
 from functools import partial
-from numpy import array
+from numpy import array, concatenate
 import math
 import sys
 
@@ -271,6 +271,13 @@ class PlotWidget(QtGui.QWidget):
         '''
         self.variableUpdate.emit((self, model, variable))
 
+    def updateVariables(self, model, variables):
+        ''' Tells the plot, that the data of several variables
+            of the same model has changed and the plot needs to be updated
+        '''
+        for variable in variables:
+            self.updateVariable(model, variable)
+
     @QtCore.Slot()
     def setActive(self):
         ''' Tells widget that is has been selected as
@@ -676,6 +683,19 @@ class DefaultPlotWidget(PlotWidget):
         self.context = context
         # Max. number of points to be displayed in plots
         self.maxDisplayPoints = 5000000
+        # Plot name -> (results, number of result rows, dPoints) of the displayed data, see _appendVariableData
+        self._dataRows = dict()
+        # Max. number of points read from results with downsampled data, see IntegrationResults.hasDownsampledData
+        self.downsampledPoints = 10000
+        # Plot name -> (model, variable) of the variables displayed with downsampled data
+        self._downsampled = dict()
+        # Time range of the downsampled data, see _refineDownsampledData
+        self._downsampledRange = None
+        # The downsampled data is read again when zooming or panning has stopped for a moment
+        self._refineTimer = QtCore.QTimer(self)
+        self._refineTimer.setSingleShot(True)
+        self._refineTimer.setInterval(200)
+        self._refineTimer.timeout.connect(self._refineDownsampledData)
 
     def getData(self):
         ''' Return a list of the variables in the plot and their data elements
@@ -693,6 +713,7 @@ class DefaultPlotWidget(PlotWidget):
         self.plot.overlays.append(Selector(self.plot, self))
         self.plot.value_range.tight_bounds = False
         self.plot.index_range.tight_bounds = True
+        self.plot.index_range.on_trait_change(self._indexRangeChanged, 'updated')
         if self.context:
             self.plot.tools.append(ContextMenu(self.plot, self, self.context))
         self.plotActive = True
@@ -719,9 +740,16 @@ class DefaultPlotWidget(PlotWidget):
         if not self.plotActive:
             self.activatePlot()
         PlotWidget.addVariable(self, model, variable)
+        downsampled = False
         if (model.integrationResults.isAvailable):
-            y, x, interpolationMethod = model.integrationResults.readData(variable)
-            if len(x) > self.maxDisplayPoints:
+            if model.integrationResults.hasDownsampledData(variable):
+                y, x, interpolationMethod = self._readDownsampledData(model, variable)
+                downsampled = True
+                dPoints = 2  # Marks the legend label
+            else:
+                y, x, interpolationMethod = model.integrationResults.readData(variable)
+            nRows = len(x)
+            if not downsampled and len(x) > self.maxDisplayPoints:
                 dPoints = max(1, math.ceil(float(len(x)) / self.maxDisplayPoints))
                 x = x[::dPoints]
                 y = y[::dPoints]
@@ -743,6 +771,10 @@ class DefaultPlotWidget(PlotWidget):
             self.plot.legend.labels.append(legendLabel)
             self.plot.legend.plots = lPlots
             self.plot.legend.plots[legendLabel] = p
+            if downsampled:
+                self._downsampled[name] = (model, variable)
+            else:
+                self._dataRows[name] = (model.integrationResults, nRows, int(dPoints))
         if y == None and not x == None:
             self.plot.data.set_data(model.numberedModelName + ":" + variable + ".values", x)
             self.plot.data.set_data(model.numberedModelName + ":" + variable + ".time", [0])
@@ -772,34 +804,162 @@ class DefaultPlotWidget(PlotWidget):
             self.plot.legend.plots = lPlots
             self.plot.data.del_data(model.numberedModelName + ":" + variable + ".values")
             self.plot.data.del_data(model.numberedModelName + ":" + variable + ".time")
+        self._dataRows.pop(name, None)
+        self._downsampled.pop(name, None)
         self.plot.request_redraw()
 
     def updateVariable(self, model, variable):
         name = self._idVariableUnit(model, variable)
         if not name in self.plot.plots:
             self.addVariable(model, variable)
+        elif self._updateDownsampledData(model, variable):
+            self.plot.request_redraw()
         else:
-            dPoints = 1
-            y, x, interpolationMethod = model.integrationResults.readData(variable)
-            if x is None:
-                return
-            if len(x) > self.maxDisplayPoints:
-                dPoints = max(1, math.ceil(float(len(x)) / self.maxDisplayPoints))
-                x = x[::dPoints]
-                y = y[::dPoints]
-            self.plot.data.set_data(model.numberedModelName + ":" + variable + ".values", x)
-            self.plot.data.set_data(model.numberedModelName + ":" + variable + ".time", y)
-            legendLabel = self._idVariableUnit(model, variable, dPoints)
-            if legendLabel not in self.plot.legend.labels:
-                # Update legend label
-                legendLabelOld = self.plot.legendLabel[name]
-                self.plot.legendLabel[name] = legendLabel
-                index = self.plot.legend.labels.index(legendLabelOld)
-                self.plot.legend.labels[index] = legendLabel
-                self.plot.legend.plots[legendLabel] = self.plot.legend.plots[legendLabelOld]
-                del(self.plot.legend.plots[legendLabelOld])
+            state = self._dataRows.get(name)
+            if state is not None and state[0] is model.integrationResults:
+                # Only read the rows that are new since the last update
+                y, x, interpolationMethod = model.integrationResults.readDataSince(variable, state[1])
+                if x is None or len(x) == 0:
+                    return
+                self._appendVariableData(model, variable, y, x)
+            else:
+                y, x, interpolationMethod = model.integrationResults.readData(variable)
+                if x is None:
+                    return
+                self._setVariableData(model, variable, y, x)
             self.plot.request_redraw()
 
+    def updateVariables(self, model, variables):
+        existing = []
+        for variable in variables:
+            if self._idVariableUnit(model, variable) in self.plot.plots:
+                existing.append(variable)
+            else:
+                self.addVariable(model, variable)
+        existing = [variable for variable in existing if not self._updateDownsampledData(model, variable)]
+        if len(existing) == 0:
+            self.plot.request_redraw()
+            return
+        # Group the variables by the number of rows that are already displayed;
+        # only the new rows are read (0: complete data)
+        groups = dict()
+        for variable in existing:
+            state = self._dataRows.get(self._idVariableUnit(model, variable))
+            if state is not None and state[0] is model.integrationResults:
+                groups.setdefault(state[1], []).append(variable)
+            else:
+                groups.setdefault(0, []).append(variable)
+        # Read the data of all variables at once, grouped by time series
+        for startRow, variables in groups.iteritems():
+            for y, xAll, interpolationMethod, names in model.integrationResults.readDataMulti(variables, startRow):
+                if startRow > 0 and len(xAll) == 0:
+                    continue
+                for k, variable in enumerate(names):
+                    if startRow > 0:
+                        self._appendVariableData(model, variable, y, xAll[:, k])
+                    else:
+                        self._setVariableData(model, variable, y, xAll[:, k])
+        self.plot.request_redraw()
+
+    def _setVariableData(self, model, variable, y, x):
+        name = self._idVariableUnit(model, variable)
+        dPoints = 1
+        nRows = len(x)
+        if len(x) > self.maxDisplayPoints:
+            dPoints = int(max(1, math.ceil(float(len(x)) / self.maxDisplayPoints)))
+            x = x[::dPoints]
+            y = y[::dPoints]
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".values", x)
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".time", y)
+        self._dataRows[name] = (model.integrationResults, nRows, dPoints)
+        self._updateLegendLabel(model, variable, dPoints)
+
+    def _appendVariableData(self, model, variable, y, x):
+        ''' Appends the new result rows (y: time, x: values) to the displayed data of the variable.
+            The displayed points are thinned out by the factor dPoints, that is
+            increased if there are more than maxDisplayPoints points.
+        '''
+        name = self._idVariableUnit(model, variable)
+        results, nRows, dPoints = self._dataRows[name]
+        # Time and values may have been read at slightly different numbers of rows;
+        # the rows beyond the common length are read again by the next update
+        n = min(len(x), len(y))
+        x = x[:n]
+        y = y[:n]
+        # Index of the first new row that is displayed
+        first = (-nRows) % dPoints
+        nRows += len(x)
+        x = concatenate((self.plot.data.get_data(model.numberedModelName + ":" + variable + ".values"), x[first::dPoints]))
+        y = concatenate((self.plot.data.get_data(model.numberedModelName + ":" + variable + ".time"), y[first::dPoints]))
+        if len(x) > self.maxDisplayPoints:
+            k = int(math.ceil(float(len(x)) / self.maxDisplayPoints))
+            x = x[::k]
+            y = y[::k]
+            dPoints *= k
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".values", x)
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".time", y)
+        self._dataRows[name] = (results, nRows, dPoints)
+        self._updateLegendLabel(model, variable, dPoints)
+
+    def _readDownsampledData(self, model, variable):
+        ''' Reads the downsampled data of the variable for the visible time range, extended
+            by its width on both sides for panning, or for the complete time range, if the
+            time axis is scaled automatically.
+        '''
+        indexRange = self.plot.index_range
+        if indexRange.low_setting == 'auto' and indexRange.high_setting == 'auto':
+            return model.integrationResults.readData(variable, None, None, self.downsampledPoints)
+        width = indexRange.high - indexRange.low
+        return model.integrationResults.readData(variable, indexRange.low - width, indexRange.high + width, 3 * self.downsampledPoints)
+
+    def _updateDownsampledData(self, model, variable):
+        ''' Reads the data of a displayed variable again, if the result has downsampled data of it.
+            Returns False, if there is no downsampled data (the data has to be read completely).
+        '''
+        name = self._idVariableUnit(model, variable)
+        if not model.integrationResults.isAvailable or not model.integrationResults.hasDownsampledData(variable):
+            if self._downsampled.pop(name, None) is not None:
+                self._updateLegendLabel(model, variable, 1)
+            return False
+        y, x, interpolationMethod = self._readDownsampledData(model, variable)
+        if x is None:
+            return False
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".values", x)
+        self.plot.data.set_data(model.numberedModelName + ":" + variable + ".time", y)
+        self._downsampled[name] = (model, variable)
+        self._dataRows.pop(name, None)
+        self._updateLegendLabel(model, variable, 2)
+        return True
+
+    def _indexRangeChanged(self):
+        if len(self._downsampled) > 0:
+            self._refineTimer.start()
+
+    def _refineDownsampledData(self):
+        ''' Reads the downsampled data of all variables again for the current time range,
+            so that zooming in shows the details (up to the result rows).
+        '''
+        indexRange = self.plot.index_range
+        timeRange = (indexRange.low_setting, indexRange.high_setting)
+        if timeRange == self._downsampledRange:
+            return
+        self._downsampledRange = timeRange
+        for model, variable in self._downsampled.values():
+            self._updateDownsampledData(model, variable)
+        self.plot.request_redraw()
+
+    def _updateLegendLabel(self, model, variable, dPoints):
+        name = self._idVariableUnit(model, variable)
+        legendLabel = self._idVariableUnit(model, variable, dPoints)
+        if legendLabel not in self.plot.legend.labels:
+            # Update legend label
+            legendLabelOld = self.plot.legendLabel[name]
+            self.plot.legendLabel[name] = legendLabel
+            index = self.plot.legend.labels.index(legendLabelOld)
+            self.plot.legend.labels[index] = legendLabel
+            self.plot.legend.plots[legendLabel] = self.plot.legend.plots[legendLabelOld]
+            del(self.plot.legend.plots[legendLabelOld])
+
 
 if __name__ == "__main__":
     ''' Development and unit test code